@@ -10,23 +10,40 @@ Protocol state machine
 2. Attach    – on server BEGIN, send ATTACH (open receiver link).
 3. Flow      – on server ATTACH, send FLOW (grant link credit).
 4. Receive   – on server TRANSFER, parse Bond payload, close socket.
+
+:func:`fetch_raw_playlist_entries` runs the state machine once per call.
+:class:`LobbySubscriber` keeps the socket open after step 4, tops up link
+credit as TRANSFERs arrive and yields every decoded snapshot.
 """
 
+import asyncio
 import logging
+import os
+import random
 import struct
 import uuid
-from typing import Optional
+from typing import AsyncIterator, Awaitable, Callable, NamedTuple, Optional
 
 import aiohttp
 
+from app import http_pool
+
 logger = logging.getLogger(__name__)
 
 # ── WebSocket constants ──────────────────────────────────────────────────────
-LOBBY_WS_URL = "wss://lobby-hi.svc.halowaypoint.com/"
+# LOBBY_WS_URL can be overridden to point the bot at app.lobby_emulator.
+LOBBY_WS_URL = os.environ.get("LOBBY_WS_URL", "wss://lobby-hi.svc.halowaypoint.com/")
 LOBBY_WS_HOST = "lobby-hi.svc.halowaypoint.com"
 WS_TIMEOUT = 30  # seconds
 _AMQP_PROTOCOL_HEADER = b"AMQP\x00\x01\x00\x00"
 
+# Streaming subscription tuning (see LobbySubscriber)
+_STREAM_LINK_CREDIT = 16         # messages granted per FLOW
+_STREAM_IDLE_TIMEOUT = 900       # seconds without any frame before reconnecting
+_STREAM_MAX_CONNECTION_AGE = 3600  # seconds before reconnecting with fresh tokens
+_STREAM_BACKOFF_INITIAL = 5      # seconds
+_STREAM_BACKOFF_MAX = 300        # seconds
+
 # AMQP source address for the playlist wait-time topic.  Set to the correct
 # queue/topic name if the server requires an explicit source address on ATTACH.
 # Community reverse-engineering suggests "v1/playlist-waittimes"; adjust if needed.
@@ -60,129 +77,248 @@ _BT_WSTRING = 18
 
 
 # ── Bond parser ──────────────────────────────────────────────────────────────
+#
+# The decoder walks the payload in place through a memoryview and only
+# materialises values on the PlaylistResponse schema path; every other field
+# is skipped by advancing the read position.
+
+_VINT_TYPES = frozenset((_BT_UINT16, _BT_UINT32, _BT_UINT64, _BT_INT16, _BT_INT32, _BT_INT64))
+_FIXED_WIDTH = {_BT_BOOL: 1, _BT_UINT8: 1, _BT_INT8: 1, _BT_FLOAT: 4, _BT_DOUBLE: 8}
+_BT_STOP_TYPES = (0, 1)  # BT_STOP, BT_STOP_BASE
 
-def _read_vint(buf: bytes, pos: int) -> tuple[int, int]:
+
+class _BondDecodeError(ValueError):
+    """Raised when a Bond payload is truncated or uses an unknown wire type."""
+
+
+def _read_vint(buf: memoryview, pos: int) -> tuple[int, int]:
     """Decode a Bond variable-length unsigned integer; return (value, new_pos)."""
     v, shift = 0, 0
-    while pos < len(buf):
+    while True:
         b = buf[pos]; pos += 1
         v |= (b & 0x7F) << shift
         if not (b & 0x80):
-            break
+            return v, pos
         shift += 7
-    return v, pos
 
 
-def _read_bond_value(buf: bytes, pos: int, wtype: int) -> tuple:
-    """Decode one Bond value of the given wire type; return (value, new_pos)."""
-    try:
-        if wtype == _BT_BOOL:
-            return bool(buf[pos]), pos + 1
-        if wtype == _BT_UINT8:
-            return buf[pos], pos + 1
-        if wtype == _BT_INT8:
-            return struct.unpack_from('b', buf, pos)[0], pos + 1
-        if wtype in (_BT_UINT16, _BT_INT16, _BT_UINT32, _BT_INT32, _BT_UINT64, _BT_INT64):
-            return _read_vint(buf, pos)
-        if wtype == _BT_FLOAT:
-            return struct.unpack_from('<f', buf, pos)[0], pos + 4
-        if wtype == _BT_DOUBLE:
-            return struct.unpack_from('<d', buf, pos)[0], pos + 8
-        if wtype == _BT_STRING:
-            length, p = _read_vint(buf, pos)
-            return buf[p:p + length].decode('utf-8', errors='replace'), p + length
-        if wtype == _BT_WSTRING:
-            length, p = _read_vint(buf, pos)
-            return buf[p:p + length * 2].decode('utf-16-le', errors='replace'), p + length * 2
-        if wtype == _BT_STRUCT:
-            return _parse_bond_struct_v2(buf, pos)
-        if wtype in (_BT_LIST, _BT_SET):
-            if pos >= len(buf):
-                return [], pos
-            elem_type = buf[pos]; pos += 1
-            count, pos = _read_vint(buf, pos)
-            items = []
-            for _ in range(count):
-                v, pos = _read_bond_value(buf, pos, elem_type)
-                items.append(v)
-            return items, pos
-        if wtype == _BT_MAP:
-            if pos + 2 > len(buf):
-                return {}, pos
-            key_t = buf[pos]; val_t = buf[pos + 1]; pos += 2
-            count, pos = _read_vint(buf, pos)
-            m = {}
-            for _ in range(count):
-                k, pos = _read_bond_value(buf, pos, key_t)
-                v, pos = _read_bond_value(buf, pos, val_t)
-                m[k] = v
-            return m, pos
-    except Exception as exc:
-        logger.debug("Bond read error (wtype=%d, pos=%d): %s", wtype, pos, exc)
-    return None, len(buf)
+def _skip_vint(buf: memoryview, pos: int) -> int:
+    """Advance past a Bond variable-length integer without decoding it."""
+    while buf[pos] & 0x80:
+        pos += 1
+    return pos + 1
 
 
-def _parse_bond_struct_v2(buf: bytes, pos: int = 0) -> tuple[dict, int]:
-    """Parse a Bond CompactBinary v2 struct.
+def _read_field_header(buf: memoryview, pos: int, last_ordinal: int) -> tuple[int, int, int]:
+    """Read a CompactBinary v2 field header; return (wire_type, ordinal, new_pos).
 
-    In v2, explicit field ordinals are encoded as 2-byte uint16 LE (instead of
-    varint in v1).  Returns (fields_dict, new_pos) where keys are ordinals.
+    The top three bits hold the ordinal delta from the previous field; a
+    delta of zero means an explicit 2-byte uint16 LE ordinal follows.
     """
-    fields: dict[int, object] = {}
+    type_byte = buf[pos]; pos += 1
+    wtype = type_byte & 0x1F
+    if wtype in _BT_STOP_TYPES:
+        return wtype, last_ordinal, pos
+    delta = (type_byte >> 5) & 0x07
+    if delta:
+        return wtype, last_ordinal + delta, pos
+    if pos + 2 > len(buf):
+        raise _BondDecodeError(f"truncated field ordinal at {pos}")
+    return wtype, buf[pos] | (buf[pos + 1] << 8), pos + 2
+
+
+def _skip_bond_value(buf: memoryview, pos: int, wtype: int) -> int:
+    """Return the position just past one Bond value of the given wire type."""
+    width = _FIXED_WIDTH.get(wtype)
+    if width is not None:
+        return pos + width
+    if wtype in _VINT_TYPES:
+        return _skip_vint(buf, pos)
+    if wtype == _BT_STRING:
+        length, pos = _read_vint(buf, pos)
+        return pos + length
+    if wtype == _BT_WSTRING:
+        length, pos = _read_vint(buf, pos)
+        return pos + length * 2
+    if wtype == _BT_STRUCT:
+        return _skip_bond_struct(buf, pos)
+    if wtype in (_BT_LIST, _BT_SET):
+        elem_type = buf[pos]
+        count, pos = _read_vint(buf, pos + 1)
+        width = _FIXED_WIDTH.get(elem_type)
+        if width is not None:
+            return pos + count * width
+        for _ in range(count):
+            pos = _skip_bond_value(buf, pos, elem_type)
+        return pos
+    if wtype == _BT_MAP:
+        key_t = buf[pos]; val_t = buf[pos + 1]
+        count, pos = _read_vint(buf, pos + 2)
+        for _ in range(count):
+            pos = _skip_bond_value(buf, pos, key_t)
+            pos = _skip_bond_value(buf, pos, val_t)
+        return pos
+    raise _BondDecodeError(f"unknown wire type {wtype} at {pos}")
+
+
+def _skip_bond_struct(buf: memoryview, pos: int) -> int:
+    """Return the position just past a struct (its BT_STOP or end of buffer)."""
+    end = len(buf)
     last_ordinal = 0
-    while pos < len(buf):
+    while pos < end:
+        wtype, last_ordinal, pos = _read_field_header(buf, pos, last_ordinal)
+        if wtype in _BT_STOP_TYPES:
+            break
+        pos = _skip_bond_value(buf, pos, wtype)
+    return pos
+
+
+def _read_bond_number(buf: memoryview, pos: int, wtype: int) -> tuple[Optional[float], int]:
+    """Decode a numeric Bond value; non-numeric values are skipped as ``None``."""
+    if wtype == _BT_DOUBLE:
+        return struct.unpack_from('<d', buf, pos)[0], pos + 8
+    if wtype == _BT_FLOAT:
+        return struct.unpack_from('<f', buf, pos)[0], pos + 4
+    if wtype in _VINT_TYPES:
+        return _read_vint(buf, pos)
+    if wtype in (_BT_UINT8, _BT_BOOL):
+        return buf[pos], pos + 1
+    if wtype == _BT_INT8:
+        return struct.unpack_from('b', buf, pos)[0], pos + 1
+    return None, _skip_bond_value(buf, pos, wtype)
+
+
+def _decode_guid(buf: memoryview, pos: int) -> tuple[bytes, int]:
+    """Decode a GUID struct (4 × uint32 fields 0-3) to its 16-byte ``bytes_le`` form.
+
+    This is the innermost loop of the playlist decoder, so the field header
+    and varint reads are inlined.
+    """
+    parts = [0, 0, 0, 0]
+    end = len(buf)
+    last_ordinal = 0
+    while pos < end:
         type_byte = buf[pos]; pos += 1
         wtype = type_byte & 0x1F
-        if wtype in (0, 1):  # BT_STOP or BT_STOP_BASE
+        if wtype in _BT_STOP_TYPES:
             break
-        delta = (type_byte >> 5) & 0x07
-        if delta == 0:
-            if pos + 2 > len(buf):
-                break
-            ordinal = struct.unpack_from('<H', buf, pos)[0]
+        delta = type_byte >> 5
+        if delta:
+            last_ordinal += delta
+        else:
+            last_ordinal = buf[pos] | (buf[pos + 1] << 8)
             pos += 2
+        if last_ordinal <= 3 and wtype in _VINT_TYPES:
+            v, shift = 0, 0
+            while True:
+                b = buf[pos]; pos += 1
+                v |= (b & 0x7F) << shift
+                if b < 0x80:
+                    break
+                shift += 7
+            parts[last_ordinal] = v
         else:
-            ordinal = last_ordinal + delta
-        last_ordinal = ordinal
-        v, pos = _read_bond_value(buf, pos, wtype)
-        fields[ordinal] = v
-    return fields, pos
-
-
-def _bond_guid_to_str(guid_fields: dict) -> str:
-    """Convert a parsed Bond GUID struct (4 × uint32 fields 0-3) to a UUID string."""
-    d1 = guid_fields.get(0, 0)
-    d2 = guid_fields.get(1, 0)
-    d3 = guid_fields.get(2, 0)
-    d4 = guid_fields.get(3, 0)
+            pos = _skip_bond_value(buf, pos, wtype)
     try:
-        raw = struct.pack('<IIII', d1, d2, d3, d4)
-        return str(uuid.UUID(bytes_le=raw))
-    except Exception:
-        return f"{d1:08x}{d2:08x}{d3:08x}{d4:08x}"
+        return struct.pack('<IIII', *parts), pos
+    except struct.error as exc:
+        raise _BondDecodeError(f"GUID component out of range before {pos}") from exc
+
+
+def _decode_playlist_info(buf: memoryview, pos: int) -> tuple[bytes, bytes, int]:
+    """Decode PlaylistInformation; return (asset_guid, version_guid, new_pos).
+
+    A missing GUID is returned as ``b""``.
+    """
+    asset_guid = version_guid = b""
+    end = len(buf)
+    last_ordinal = 0
+    while pos < end:
+        wtype, last_ordinal, pos = _read_field_header(buf, pos, last_ordinal)
+        if wtype in _BT_STOP_TYPES:
+            break
+        if last_ordinal == 1 and wtype == _BT_STRUCT:
+            asset_guid, pos = _decode_guid(buf, pos)
+        elif last_ordinal == 2 and wtype == _BT_STRUCT:
+            version_guid, pos = _decode_guid(buf, pos)
+        else:
+            pos = _skip_bond_value(buf, pos, wtype)
+    return asset_guid, version_guid, pos
+
+
+def _decode_playlist_container(buf: memoryview, pos: int) -> tuple[Optional[tuple], int]:
+    """Decode PlaylistContainer; return ((wait_s, asset_guid, version_guid) | None, new_pos).
+
+    Raises :class:`_BondDecodeError` if the buffer ends before the container's
+    BT_STOP, so a truncated container is never returned as an entry.
+    """
+    wait_time_s: Optional[float] = 0.0
+    asset_guid = version_guid = b""
+    end = len(buf)
+    last_ordinal = 0
+    while pos < end:
+        wtype, last_ordinal, pos = _read_field_header(buf, pos, last_ordinal)
+        if wtype in _BT_STOP_TYPES:
+            break
+        if last_ordinal == 2:
+            wait_time_s, pos = _read_bond_number(buf, pos, wtype)
+        elif last_ordinal == 3 and wtype == _BT_STRUCT:
+            asset_guid, version_guid, pos = _decode_playlist_info(buf, pos)
+        else:
+            pos = _skip_bond_value(buf, pos, wtype)
+    else:
+        raise _BondDecodeError(f"truncated PlaylistContainer at {pos}")
+    if wait_time_s is None or wait_time_s < 0:
+        return None, pos
+    return (wait_time_s, asset_guid, version_guid), pos
 
 
-def _extract_bond_data_from_frame(frame: bytes) -> Optional[bytes]:
-    """Locate Bond payload within a raw AMQP TRANSFER frame.
+def _decode_playlist_response(buf: memoryview, out: list[tuple]) -> None:
+    """Append (wait_s, asset_guid, version_guid) for every container in *buf* to *out*.
 
-    Searches for the AMQP data-section descriptor (0x00 0x53 0x75) and returns
-    the enclosed binary content.  If the descriptor is not found the raw frame
-    is returned as-is so the caller can still attempt parsing.
+    Results are appended as they are decoded so a truncated payload still
+    yields every container before the damage.
     """
-    _DATA_SECTION = b'\x00\x53\x75'
-    idx = frame.find(_DATA_SECTION)
-    if idx != -1:
-        pos = idx + 3
-        if pos < len(frame):
-            prefix = frame[pos]; pos += 1
-            if prefix == 0xa0 and pos < len(frame):      # vbin8
-                length = frame[pos]; pos += 1
-                return frame[pos:pos + length]
-            if prefix == 0xb0 and pos + 4 <= len(frame):  # vbin32
-                length = struct.unpack_from('>I', frame, pos)[0]
-                pos += 4
-                return frame[pos:pos + length]
-    return frame if len(frame) > 8 else None
+    end = len(buf)
+    pos = 0
+    last_ordinal = 0
+    while pos < end:
+        wtype, last_ordinal, pos = _read_field_header(buf, pos, last_ordinal)
+        if wtype in _BT_STOP_TYPES:
+            return
+        if last_ordinal != 51 or wtype not in (_BT_LIST, _BT_SET):
+            pos = _skip_bond_value(buf, pos, wtype)
+            continue
+
+        outer_type = buf[pos]
+        outer_count, pos = _read_vint(buf, pos + 1)
+        for _ in range(outer_count):
+            if outer_type not in (_BT_LIST, _BT_SET):
+                pos = _skip_bond_value(buf, pos, outer_type)
+                continue
+            inner_type = buf[pos]
+            inner_count, pos = _read_vint(buf, pos + 1)
+            for _ in range(inner_count):
+                if inner_type != _BT_STRUCT:
+                    pos = _skip_bond_value(buf, pos, inner_type)
+                    continue
+                entry, pos = _decode_playlist_container(buf, pos)
+                if entry is not None:
+                    out.append(entry)
+        return
+    logger.debug("Field 51 not found in Bond response")
+
+
+def _guid_to_str(raw: bytes) -> str:
+    """Format a 16-byte ``bytes_le`` GUID as a UUID string ("" when absent).
+
+    Equivalent to ``str(uuid.UUID(bytes_le=raw))`` without the UUID object.
+    """
+    if not raw:
+        return ""
+    d1, d2 = struct.unpack_from('<II', raw)
+    tail = raw[8:].hex()
+    return f"{d1:08x}-{d2 & 0xFFFF:04x}-{d2 >> 16:04x}-{tail[:4]}-{tail[4:]}"
 
 
 def parse_playlist_bond(bond_bytes: bytes) -> list[dict]:
@@ -196,44 +332,274 @@ def parse_playlist_bond(bond_bytes: bytes) -> list[dict]:
                           [2] → GUID  VersionId
       GUID               [0..3] → uint32 Data1..Data4
 
+    Only fields on that path are decoded; everything else is skipped in
+    place.  On a malformed payload the entries decoded so far are returned.
+
     Returns a list of dicts with keys 'wait_time_ms', 'asset_id', 'version_id'.
     """
-    results: list[dict] = []
+    decoded: list[tuple] = []
     try:
-        top, _ = _parse_bond_struct_v2(bond_bytes, 0)
-        containers = top.get(51)
-        if not isinstance(containers, list):
-            logger.debug("Field 51 not found or is not a list in Bond response")
-            return results
-
-        for container_list in containers:
-            if not isinstance(container_list, list):
+        _decode_playlist_response(memoryview(bond_bytes), decoded)
+    except (_BondDecodeError, IndexError, struct.error) as exc:
+        logger.warning(
+            "Error parsing playlist Bond data after %d entries: %s", len(decoded), exc or "truncated"
+        )
+
+    return [
+        {
+            "wait_time_ms": int(wait_time_s * 1000),
+            "asset_id": _guid_to_str(asset_guid),
+            "version_id": _guid_to_str(version_guid),
+        }
+        for wait_time_s, asset_guid, version_guid in decoded
+    ]
+
+
+# ── AMQP 1.0 frame decoding ──────────────────────────────────────────────────
+#
+# WebSocket message boundaries carry no meaning in AMQPWSB10: one message may
+# hold several frames or only part of one.  AmqpFrameDecoder buffers partial
+# frames across messages and TransferAssembler joins multi-part deliveries
+# (TRANSFER ``more`` flag) before the message sections are unpacked.
+
+_AMQP_FRAME_HEADER = struct.Struct('>IBBH')  # size, doff, type, channel
+_AMQP_FRAME_TYPE_AMQP = 0x00
+_AMQP_FRAME_SIZE_LIMIT = 1 << 24  # sanity bound; anything larger means a desync
+
+# BEGIN / ATTACH field indices
+_BEGIN_NEXT_OUTGOING_ID = 1
+_ATTACH_INITIAL_DELIVERY_COUNT = 9
+
+# TRANSFER field indices
+_TRANSFER_DELIVERY_ID = 1
+_TRANSFER_SETTLED = 4
+_TRANSFER_MORE = 5
+_TRANSFER_ABORTED = 9
+
+# Message section descriptors
+_AMQP_SECTION_DATA = 0x75
+_AMQP_SECTION_VALUE = 0x77
+
+# Fixed-width primitive constructors → payload width
+_AMQP_FIXED_WIDTH = {
+    0x40: 0, 0x41: 0, 0x42: 0, 0x43: 0, 0x44: 0, 0x45: 0,
+    0x50: 1, 0x51: 1, 0x52: 1, 0x53: 1, 0x54: 1, 0x55: 1, 0x56: 1,
+    0x60: 2, 0x61: 2,
+    0x70: 4, 0x71: 4, 0x72: 4, 0x73: 4, 0x74: 4,
+    0x80: 8, 0x81: 8, 0x82: 8, 0x83: 8, 0x84: 8,
+    0x94: 16, 0x98: 16,
+}
+_AMQP_UNSIGNED = {0x50: '>B', 0x52: '>B', 0x53: '>B', 0x60: '>H', 0x70: '>I', 0x80: '>Q'}
+
+
+class AmqpFrameError(ValueError):
+    """Raised when the AMQP byte stream cannot be decoded."""
+
+
+class AmqpFrame(NamedTuple):
+    """One decoded AMQP frame.
+
+    *descriptor* is the 3-byte performative descriptor (``_AMQP_DESC_*``) or
+    ``None`` for empty (heartbeat) frames.  *fields* holds the decoded
+    performative list and *payload* the bytes that follow it, which for a
+    TRANSFER are (part of) the message.
+    """
+
+    channel: int
+    descriptor: Optional[bytes]
+    fields: list
+    payload: memoryview
+
+
+def _read_amqp_value(buf: memoryview, pos: int) -> tuple[object, int]:
+    """Decode one AMQP-encoded value; return (value, new_pos).
+
+    Composite (described) values decode to their inner value; binary, string
+    and symbol values stay as memoryview slices until a caller needs them.
+    """
+    code = buf[pos]; pos += 1
+    if code == 0x00:
+        _, pos = _read_amqp_value(buf, pos)  # descriptor
+        return _read_amqp_value(buf, pos)
+    if code == 0x40:
+        return None, pos
+    if code in (0x41, 0x42):
+        return code == 0x41, pos
+    if code in (0x43, 0x44):
+        return 0, pos
+    if code == 0x45:
+        return [], pos
+    if code == 0x56:
+        return buf[pos] != 0, pos + 1
+    fmt = _AMQP_UNSIGNED.get(code)
+    if fmt is not None:
+        return struct.unpack_from(fmt, buf, pos)[0], pos + _AMQP_FIXED_WIDTH[code]
+    width = _AMQP_FIXED_WIDTH.get(code)
+    if width is not None:
+        return bytes(buf[pos:pos + width]), pos + width
+    if code in (0xa0, 0xa1, 0xa3, 0xb0, 0xb1, 0xb3):
+        if code < 0xb0:
+            length = buf[pos]; pos += 1
+        else:
+            length = struct.unpack_from('>I', buf, pos)[0]; pos += 4
+        if pos + length > len(buf):
+            raise AmqpFrameError(f"truncated variable-width value at {pos}")
+        return buf[pos:pos + length], pos + length
+    if code in (0xc0, 0xc1, 0xd0, 0xd1):
+        if code < 0xd0:
+            count = buf[pos + 1]; pos += 2
+        else:
+            count = struct.unpack_from('>I', buf, pos + 4)[0]; pos += 8
+        items = []
+        for _ in range(count):
+            v, pos = _read_amqp_value(buf, pos)
+            items.append(v)
+        return items, pos
+    if code in (0xe0, 0xf0):
+        if code == 0xe0:
+            size = buf[pos]; pos += 1
+        else:
+            size = struct.unpack_from('>I', buf, pos)[0]; pos += 4
+        return None, pos + size
+    raise AmqpFrameError(f"unknown AMQP constructor 0x{code:02x} at {pos - 1}")
+
+
+def _read_descriptor(buf: memoryview, pos: int) -> tuple[Optional[bytes], int]:
+    """Read a ``0x00``-prefixed numeric descriptor as ``b'\\x00\\x53' + code``."""
+    if buf[pos] != 0x00:
+        return None, pos
+    code, pos = _read_amqp_value(buf, pos + 1)
+    if not isinstance(code, int) or code > 0xFF:
+        return None, pos
+    return b'\x00\x53' + bytes([code]), pos
+
+
+class AmqpFrameDecoder:
+    """Split an AMQPWSB10 byte stream into :class:`AmqpFrame` objects.
+
+    Feed every binary WebSocket message to :meth:`feed`; frames are returned
+    as soon as they are complete and partial frames are kept for the next
+    call.  Frames decoded straight from one message reference that message's
+    bytes, so only a frame split across messages is ever copied.
+    """
+
+    def __init__(self) -> None:
+        self._pending = bytearray()
+
+    def feed(self, data: bytes) -> list[AmqpFrame]:
+        """Consume *data* and return every frame it completes."""
+        if self._pending:
+            self._pending += data
+            if (len(self._pending) >= 8 and self._pending[:4] != b"AMQP"
+                    and len(self._pending) < int.from_bytes(self._pending[:4], 'big')):
+                return []  # still inside the first frame; wait before copying
+            data = bytes(self._pending)
+            self._pending.clear()
+
+        buf = memoryview(data)
+        end = len(buf)
+        pos = 0
+        frames: list[AmqpFrame] = []
+        while end - pos >= 8:
+            if buf[pos:pos + 4] == b"AMQP":
+                pos += 8  # protocol header echo
                 continue
-            for entry in container_list:
-                if not isinstance(entry, dict):
-                    continue
-                wait_time_s = entry.get(2, 0.0)
-                info = entry.get(3)
-
-                asset_id = ""
-                version_id = ""
-                if isinstance(info, dict):
-                    asset_guid = info.get(1)
-                    if isinstance(asset_guid, dict):
-                        asset_id = _bond_guid_to_str(asset_guid)
-                    version_guid = info.get(2)
-                    if isinstance(version_guid, dict):
-                        version_id = _bond_guid_to_str(version_guid)
-
-                if isinstance(wait_time_s, (int, float)) and wait_time_s >= 0:
-                    results.append({
-                        "wait_time_ms": int(wait_time_s * 1000),
-                        "asset_id": asset_id,
-                        "version_id": version_id,
-                    })
-    except Exception as exc:
-        logger.warning("Error parsing playlist Bond data: %s", exc)
-    return results
+            size, doff, ftype, channel = _AMQP_FRAME_HEADER.unpack_from(buf, pos)
+            if size < 8 or doff < 2 or doff * 4 > size or size > _AMQP_FRAME_SIZE_LIMIT:
+                raise AmqpFrameError(f"invalid frame header (size={size}, doff={doff})")
+            if end - pos < size:
+                break
+            if ftype == _AMQP_FRAME_TYPE_AMQP:
+                frames.append(self._decode_frame(buf[pos + doff * 4:pos + size], channel))
+            pos += size
+
+        if pos < end:
+            self._pending += buf[pos:]
+        return frames
+
+    @staticmethod
+    def _decode_frame(body: memoryview, channel: int) -> AmqpFrame:
+        if not body:
+            return AmqpFrame(channel, None, [], body)
+        descriptor, pos = _read_descriptor(body, 0)
+        if descriptor is None:
+            raise AmqpFrameError("frame body does not start with a performative")
+        fields, pos = _read_amqp_value(body, pos)
+        return AmqpFrame(channel, descriptor, fields if isinstance(fields, list) else [], body[pos:])
+
+
+def _frame_field(frame: AmqpFrame, index: int, default=None):
+    """Return performative field *index*, or *default* when absent or null."""
+    if index < len(frame.fields) and frame.fields[index] is not None:
+        return frame.fields[index]
+    return default
+
+
+class TransferAssembler:
+    """Join multi-frame TRANSFER deliveries into complete messages."""
+
+    def __init__(self) -> None:
+        self._parts: list[memoryview] = []
+
+    def add(self, frame: AmqpFrame) -> Optional[memoryview]:
+        """Add a TRANSFER frame; return the full message once its last part arrives."""
+        if _frame_field(frame, _TRANSFER_ABORTED, False):
+            self._parts.clear()
+            return None
+        if _frame_field(frame, _TRANSFER_MORE, False):
+            self._parts.append(frame.payload)
+            return None
+        if not self._parts:
+            return frame.payload
+        self._parts.append(frame.payload)
+        message = memoryview(b"".join(self._parts))
+        self._parts.clear()
+        return message
+
+
+def _message_body(message: memoryview) -> Optional[memoryview]:
+    """Return the binary body of an AMQP message, skipping the other sections.
+
+    Multiple data sections are concatenated; an ``amqp-value`` section
+    holding binary is accepted as well.
+    """
+    chunks: list[memoryview] = []
+    pos = 0
+    end = len(message)
+    while pos < end:
+        descriptor, pos = _read_descriptor(message, pos)
+        if descriptor is None:
+            raise AmqpFrameError(f"expected message section at {pos}")
+        value, pos = _read_amqp_value(message, pos)
+        if descriptor[2] in (_AMQP_SECTION_DATA, _AMQP_SECTION_VALUE) and isinstance(value, memoryview):
+            chunks.append(value)
+    if not chunks:
+        return None
+    return chunks[0] if len(chunks) == 1 else memoryview(b"".join(chunks))
+
+
+def _transfer_entries(message: memoryview) -> list[dict]:
+    """Decode the playlist entries carried by one complete TRANSFER message."""
+    try:
+        body = _message_body(message)
+    except (AmqpFrameError, IndexError, struct.error) as exc:
+        logger.warning("Malformed TRANSFER message: %s", exc)
+        return []
+    if body is None:
+        logger.debug("TRANSFER message has no binary body")
+        return []
+    return parse_playlist_bond(body)
+
+
+def _frame_error(frame: AmqpFrame) -> str:
+    """Describe the error condition carried by an END or CLOSE frame."""
+    error = frame.fields[0] if frame.fields else None
+    if not isinstance(error, list) or not error:
+        return "no error"
+    return " – ".join(
+        bytes(part).decode('utf-8', errors='replace') for part in error[:2]
+        if isinstance(part, memoryview)
+    ) or "unknown error"
 
 
 # ── AMQP 1.0 frame builders ──────────────────────────────────────────────────
@@ -243,24 +609,20 @@ def _make_amqp_frame(channel: int, payload: bytes) -> bytes:
     return struct.pack('>IBBH', 8 + len(payload), 2, 0x00, channel) + payload
 
 
+def _encode_uint_amqp(value: int) -> bytes:
+    """Encode an AMQP ``uint`` using the smallest available constructor."""
+    if value == 0:
+        return b'\x43'                      # uint0
+    if value < 256:
+        return b'\x52' + bytes([value])     # smalluint
+    return b'\x70' + struct.pack('>I', value)
+
+
 def _encode_str_amqp(s: str) -> bytes:
     b = s.encode()
     return (b'\xa1' + bytes([len(b)]) + b) if len(b) < 256 else (b'\xb1' + struct.pack('>I', len(b)) + b)
 
 
-def _classify_amqp_frame(data: bytes) -> Optional[bytes]:
-    """Return the 3-byte AMQP performative descriptor found in *data*, or None."""
-    if len(data) < 11:
-        return None
-    doff = data[4]
-    body_start = doff * 4
-    if body_start + 3 > len(data):
-        return None
-    if data[body_start] == 0x00 and data[body_start + 1] == 0x53:
-        return bytes(data[body_start:body_start + 3])
-    return None
-
-
 def _encode_amqp_open(container_id: str = "halobotti") -> bytes:
     """Encode an AMQP OPEN performative (descriptor 0x10).
 
@@ -311,23 +673,61 @@ def _encode_amqp_attach(name: str = "halobotti-wt") -> bytes:
     return _make_amqp_frame(0, b'\x00\x53\x12' + list_enc)
 
 
-def _encode_amqp_flow(link_credit: int = 1) -> bytes:
-    """Encode an AMQP FLOW performative (descriptor 0x13) to request messages."""
-    items = (b'\x43'
+def _encode_amqp_flow(link_credit: int = 1, delivery_count: int = 0,
+                      next_incoming_id: int = 0) -> bytes:
+    """Encode an AMQP FLOW performative (descriptor 0x13) to request messages.
+
+    *delivery_count* starts at the server ATTACH's ``initial-delivery-count``
+    and *next_incoming_id* at the server BEGIN's ``next-outgoing-id``; both
+    then advance with every delivery and TRANSFER frame received (modulo
+    2**32, as AMQP sequence numbers).
+    """
+    items = (_encode_uint_amqp(next_incoming_id)
              + b'\x70' + struct.pack('>I', 0x7FFFFFFF)
              + b'\x43'
              + b'\x43'
              + b'\x43'
-             + b'\x43'
-             + b'\x52' + bytes([link_credit]))
+             + _encode_uint_amqp(delivery_count)
+             + _encode_uint_amqp(link_credit))
     list_body = struct.pack('>I', 7) + items
     list_enc = b'\xd0' + struct.pack('>I', len(list_body)) + list_body
     return _make_amqp_frame(0, b'\x00\x53\x13' + list_enc)
 
 
+def _encode_amqp_disposition(delivery_id: int) -> bytes:
+    """Encode an AMQP DISPOSITION (descriptor 0x15) settling one delivery as accepted."""
+    items = (b'\x41'                           # role    = true (receiver)
+             + _encode_uint_amqp(delivery_id)  # first
+             + b'\x40'                         # last    = first
+             + b'\x41'                         # settled = true
+             + b'\x00\x53\x24\x45')            # state   = accepted
+    list_body = struct.pack('>I', 5) + items
+    list_enc = b'\xd0' + struct.pack('>I', len(list_body)) + list_body
+    return _make_amqp_frame(0, b'\x00\x53\x15' + list_enc)
+
+
+def _lobby_headers(spartan_token: str, clearance_token: str) -> dict[str, str]:
+    """Return the WebSocket upgrade headers expected by the lobby service."""
+    if not spartan_token.startswith("v4="):
+        spartan_token = f"v4={spartan_token}"
+
+    return {
+        "Accept": "application/x-bond-compact-binary",
+        "Accept-Language": "en-US",
+        "User-Agent": "SHIVA-2043073184/6.10025.12948.0 (release; PC)",
+        "343-Telemetry-Session-Id": str(uuid.uuid4()),
+        "X-343-Authorization-Spartan": spartan_token,
+        "343-clearance": clearance_token,
+    }
+
+
 # ── Public API ───────────────────────────────────────────────────────────────
 
-async def fetch_raw_playlist_entries(spartan_token: str, clearance_token: str) -> list[dict]:
+async def fetch_raw_playlist_entries(
+    spartan_token: str,
+    clearance_token: str,
+    url: Optional[str] = None,
+) -> list[dict]:
     """Connect to the Halo Infinite lobby WebSocket and return raw playlist entries.
 
     Implements the full AMQPWSB10 state machine:
@@ -339,109 +739,293 @@ async def fetch_raw_playlist_entries(spartan_token: str, clearance_token: str) -
     Args:
         spartan_token:   Spartan V4 JWT (must include ``v4=`` prefix).
         clearance_token: 343 clearance token.
+        url:             WebSocket URL; defaults to :data:`LOBBY_WS_URL`.
 
     Returns:
         List of dicts with keys ``asset_id``, ``version_id``, ``wait_time_ms``.
         Returns an empty list on any failure.
     """
-    if not spartan_token.startswith("v4="):
-        spartan_token = f"v4={spartan_token}"
-
-    headers = {
-        "Accept": "application/x-bond-compact-binary",
-        "Accept-Language": "en-US",
-        "User-Agent": "SHIVA-2043073184/6.10025.12948.0 (release; PC)",
-        "343-Telemetry-Session-Id": str(uuid.uuid4()),
-        "X-343-Authorization-Spartan": spartan_token,
-        "343-clearance": clearance_token,
-    }
+    headers = _lobby_headers(spartan_token, clearance_token)
+    url = url or LOBBY_WS_URL
 
     playlist_entries: list[dict] = []
-    logger.debug("Connecting to lobby WebSocket at %s", LOBBY_WS_URL)
+    logger.debug("Connecting to lobby WebSocket at %s", url)
 
     try:
-        import asyncio
         async with asyncio.timeout(WS_TIMEOUT):
-            async with aiohttp.ClientSession() as session:
-                async with session.ws_connect(
-                    LOBBY_WS_URL,
-                    protocols=["AMQPWSB10"],
-                    headers=headers,
-                ) as ws:
-                    logger.debug("Sending AMQP bootstrap (header + OPEN + BEGIN)")
-                    await ws.send_bytes(_AMQP_PROTOCOL_HEADER)
-                    await ws.send_bytes(_encode_amqp_open())
-                    await ws.send_bytes(_encode_amqp_begin())
-
-                    async for msg in ws:
-                        if msg.type == aiohttp.WSMsgType.BINARY:
-                            data: bytes = msg.data
-                            logger.debug("Received binary frame: %d bytes", len(data))
-
-                            if data[:4] == b"AMQP":
-                                logger.debug("Skipping AMQP protocol header echo")
-                                continue
-
-                            frame_class = _classify_amqp_frame(data)
-
-                            if frame_class == _AMQP_DESC_BEGIN:
+            async with http_pool.get_session().ws_connect(
+                url,
+                protocols=["AMQPWSB10"],
+                headers=headers,
+            ) as ws:
+                logger.debug("Sending AMQP bootstrap (header + OPEN + BEGIN)")
+                await ws.send_bytes(_AMQP_PROTOCOL_HEADER)
+                await ws.send_bytes(_encode_amqp_open())
+                await ws.send_bytes(_encode_amqp_begin())
+
+                decoder = AmqpFrameDecoder()
+                transfers = TransferAssembler()
+                first_transfer_id = 0
+                done = False
+                async for msg in ws:
+                    if msg.type == aiohttp.WSMsgType.BINARY:
+                        logger.debug("Received binary message: %d bytes", len(msg.data))
+
+                        for frame in decoder.feed(msg.data):
+                            if frame.descriptor == _AMQP_DESC_BEGIN:
                                 logger.info("Server BEGIN received; sending ATTACH")
+                                first_transfer_id = _frame_field(frame, _BEGIN_NEXT_OUTGOING_ID, 0)
                                 await ws.send_bytes(_encode_amqp_attach())
 
-                            elif frame_class == _AMQP_DESC_ATTACH:
+                            elif frame.descriptor == _AMQP_DESC_ATTACH:
                                 logger.info("Server ATTACH received; sending FLOW")
-                                await ws.send_bytes(_encode_amqp_flow())
-
-                            elif frame_class == _AMQP_DESC_TRANSFER:
-                                logger.debug("TRANSFER received; extracting Bond payload")
-                                bond_bytes = _extract_bond_data_from_frame(data)
-                                if bond_bytes is not None:
-                                    entries = parse_playlist_bond(bond_bytes)
-                                    if entries:
-                                        logger.info(
-                                            "Parsed %d playlist entries from Bond message",
-                                            len(entries),
-                                        )
-                                        playlist_entries.extend(entries)
-                                        try:
-                                            await ws.close()
-                                        except Exception:
-                                            pass
-                                        break
-
-                            elif frame_class == _AMQP_DESC_END:
+                                await ws.send_bytes(_encode_amqp_flow(
+                                    delivery_count=_frame_field(frame, _ATTACH_INITIAL_DELIVERY_COUNT, 0),
+                                    next_incoming_id=first_transfer_id,
+                                ))
+
+                            elif frame.descriptor == _AMQP_DESC_TRANSFER:
+                                message = transfers.add(frame)
+                                if message is None:
+                                    logger.debug("Partial TRANSFER received; waiting for more")
+                                    continue
+                                entries = _transfer_entries(message)
+                                if entries:
+                                    logger.info(
+                                        "Parsed %d playlist entries from Bond message",
+                                        len(entries),
+                                    )
+                                    playlist_entries.extend(entries)
+                                    done = True
+                                    break
+
+                            elif frame.descriptor == _AMQP_DESC_END:
                                 logger.warning(
-                                    "Server sent AMQP END (session closed); "
-                                    "frame: %s", data[:32].hex()
+                                    "Server sent AMQP END (session closed): %s",
+                                    _frame_error(frame),
                                 )
+                                done = True
                                 break
 
-                            elif frame_class == _AMQP_DESC_CLOSE:
+                            elif frame.descriptor == _AMQP_DESC_CLOSE:
                                 logger.warning(
-                                    "Server sent AMQP CLOSE (connection closed); "
-                                    "frame: %s", data[:32].hex()
+                                    "Server sent AMQP CLOSE (connection closed): %s",
+                                    _frame_error(frame),
                                 )
+                                done = True
                                 break
 
-                            elif frame_class is not None:
+                            elif frame.descriptor is not None:
                                 logger.debug(
-                                    "Unhandled AMQP performative %s", frame_class.hex()
+                                    "Unhandled AMQP performative %s", frame.descriptor.hex()
                                 )
 
-                        elif msg.type == aiohttp.WSMsgType.ERROR:
-                            logger.error("WebSocket error: %s", ws.exception())
-                            break
-                        elif msg.type == aiohttp.WSMsgType.CLOSED:
-                            logger.info("WebSocket closed by server")
+                        if done:
+                            try:
+                                await ws.close()
+                            except Exception:
+                                pass
                             break
 
+                    elif msg.type == aiohttp.WSMsgType.ERROR:
+                        logger.error("WebSocket error: %s", ws.exception())
+                        break
+                    elif msg.type == aiohttp.WSMsgType.CLOSED:
+                        logger.info("WebSocket closed by server")
+                        break
+
     except TimeoutError:
         logger.error("WebSocket connection timed out after %ds", WS_TIMEOUT)
     except aiohttp.ClientConnectorError as exc:
         logger.error("Cannot connect to lobby WebSocket: %s", exc)
     except aiohttp.WSServerHandshakeError as exc:
         logger.error("WebSocket handshake failed (status %s): %s", exc.status, exc)
+    except AmqpFrameError as exc:
+        logger.error("Undecodable AMQP stream from lobby WebSocket: %s", exc)
     except Exception as exc:
         logger.exception("Unexpected error fetching playlist wait times: %s", exc)
 
     return playlist_entries
+
+
+# ── Streaming subscription ───────────────────────────────────────────────────
+
+TokenProvider = Callable[[], Awaitable[tuple[str, str]]]
+
+
+class LobbySubscriber:
+    """Long-lived lobby subscription that yields every playlist snapshot.
+
+    One AMQPWSB10 connection is kept open for as long as the server allows.
+    Link credit is granted :data:`_STREAM_LINK_CREDIT` messages at a time and
+    topped up once half of it has been consumed, so the server can keep
+    pushing without a round-trip per message.
+
+    The connection is re-established with exponential backoff after errors,
+    END/CLOSE or an idle period of :data:`_STREAM_IDLE_TIMEOUT` seconds, and
+    right away once it is older than *max_connection_age*.  *token_provider*
+    is awaited on every (re)connect and must return ``(spartan_token,
+    clearance_token)``, which keeps the socket authenticated with fresh tokens.
+
+    Usage::
+
+        subscriber = LobbySubscriber(get_tokens)
+        async for entries in subscriber.snapshots():
+            ...
+    """
+
+    def __init__(
+        self,
+        token_provider: TokenProvider,
+        *,
+        link_credit: int = _STREAM_LINK_CREDIT,
+        idle_timeout: float = _STREAM_IDLE_TIMEOUT,
+        max_connection_age: float = _STREAM_MAX_CONNECTION_AGE,
+        url: Optional[str] = None,
+    ) -> None:
+        self._token_provider = token_provider
+        self._url = url
+        self._link_credit = max(2, link_credit)
+        self._idle_timeout = idle_timeout
+        self._max_connection_age = max_connection_age
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._closed = False
+        self._rotating = False  # the current connection ended at its planned max age
+
+    async def close(self) -> None:
+        """Stop the subscription and close the current socket, if any."""
+        self._closed = True
+        if self._ws is not None and not self._ws.closed:
+            await self._ws.close()
+
+    async def snapshots(self) -> AsyncIterator[list[dict]]:
+        """Yield playlist entry lists as they are pushed by the server.
+
+        Each item has the same shape as :func:`fetch_raw_playlist_entries`
+        returns.  Iteration only stops after :meth:`close`.
+        """
+        backoff = _STREAM_BACKOFF_INITIAL
+        while not self._closed:
+            self._rotating = False
+            try:
+                async for entries in self._connection_snapshots():
+                    backoff = _STREAM_BACKOFF_INITIAL
+                    yield entries
+            except TimeoutError:
+                logger.warning("Lobby stream idle for %ds; reconnecting", self._idle_timeout)
+            except aiohttp.WSServerHandshakeError as exc:
+                logger.error("Lobby stream handshake failed (status %s): %s", exc.status, exc)
+            except aiohttp.ClientError as exc:
+                logger.error("Lobby stream connection error: %s", exc)
+            except AmqpFrameError as exc:
+                logger.error("Undecodable AMQP stream from lobby: %s", exc)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.exception("Unexpected lobby stream error: %s", exc)
+            finally:
+                self._ws = None
+
+            if self._closed:
+                break
+            if self._rotating:
+                backoff = _STREAM_BACKOFF_INITIAL
+                continue
+            delay = backoff * random.uniform(0.8, 1.2)
+            logger.info("Reconnecting lobby stream in %.1fs", delay)
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, _STREAM_BACKOFF_MAX)
+
+    async def _connection_snapshots(self) -> AsyncIterator[list[dict]]:
+        """Run the state machine on one connection, yielding every TRANSFER."""
+        spartan_token, clearance_token = await self._token_provider()
+        headers = _lobby_headers(spartan_token, clearance_token)
+        loop = asyncio.get_running_loop()
+
+        async with asyncio.timeout(WS_TIMEOUT):
+            ws = await http_pool.get_session().ws_connect(
+                self._url or LOBBY_WS_URL,
+                protocols=["AMQPWSB10"],
+                headers=headers,
+            )
+        async with ws:
+            self._ws = ws
+            deadline = loop.time() + self._max_connection_age
+            await ws.send_bytes(_AMQP_PROTOCOL_HEADER)
+            await ws.send_bytes(_encode_amqp_open())
+            await ws.send_bytes(_encode_amqp_begin())
+
+            decoder = AmqpFrameDecoder()
+            transfers = TransferAssembler()
+            # Sequence numbers start where the server says, not necessarily at 0
+            next_incoming_id = 0  # server BEGIN next-outgoing-id
+            delivery_count = 0    # server ATTACH initial-delivery-count
+            credit = 0
+            delivery_id: Optional[int] = None
+            settled = True
+            while not self._closed:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    logger.info("Lobby stream reached max age; reconnecting with fresh tokens")
+                    self._rotating = True
+                    return
+                msg = await ws.receive(timeout=min(self._idle_timeout, remaining + 1))
+
+                if msg.type == aiohttp.WSMsgType.ERROR:
+                    logger.error("Lobby stream WebSocket error: %s", ws.exception())
+                    return
+                if msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING,
+                                aiohttp.WSMsgType.CLOSED):
+                    logger.info("Lobby stream closed by server")
+                    return
+                if msg.type != aiohttp.WSMsgType.BINARY:
+                    continue
+
+                for frame in decoder.feed(msg.data):
+                    if frame.descriptor == _AMQP_DESC_BEGIN:
+                        next_incoming_id = _frame_field(frame, _BEGIN_NEXT_OUTGOING_ID, 0)
+                        await ws.send_bytes(_encode_amqp_attach())
+
+                    elif frame.descriptor == _AMQP_DESC_ATTACH:
+                        logger.info("Lobby stream attached; granting %d credit", self._link_credit)
+                        delivery_count = _frame_field(frame, _ATTACH_INITIAL_DELIVERY_COUNT, 0)
+                        await ws.send_bytes(_encode_amqp_flow(
+                            self._link_credit,
+                            delivery_count=delivery_count,
+                            next_incoming_id=next_incoming_id,
+                        ))
+                        credit = self._link_credit
+
+                    elif frame.descriptor == _AMQP_DESC_TRANSFER:
+                        next_incoming_id = (next_incoming_id + 1) & 0xFFFFFFFF
+                        if delivery_id is None:
+                            delivery_id = _frame_field(frame, _TRANSFER_DELIVERY_ID)
+                        settled = settled and _frame_field(frame, _TRANSFER_SETTLED, False)
+                        message = transfers.add(frame)
+                        if message is None:
+                            if _frame_field(frame, _TRANSFER_ABORTED, False):
+                                # Nothing to settle; the next delivery starts afresh
+                                delivery_id, settled = None, True
+                            continue
+
+                        delivery_count = (delivery_count + 1) & 0xFFFFFFFF
+                        credit -= 1
+                        if not settled and delivery_id is not None:
+                            await ws.send_bytes(_encode_amqp_disposition(delivery_id))
+                        delivery_id, settled = None, True
+                        if credit <= self._link_credit // 2:
+                            await ws.send_bytes(_encode_amqp_flow(
+                                self._link_credit,
+                                delivery_count=delivery_count,
+                                next_incoming_id=next_incoming_id,
+                            ))
+                            credit = self._link_credit
+
+                        entries = _transfer_entries(message)
+                        if entries:
+                            logger.debug("Lobby stream pushed %d playlist entries", len(entries))
+                            yield entries
+
+                    elif frame.descriptor in (_AMQP_DESC_END, _AMQP_DESC_CLOSE):
+                        logger.warning("Lobby stream ended by server: %s", _frame_error(frame))
+                        return
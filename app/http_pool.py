@@ -0,0 +1,81 @@
+"""Application-wide pooled HTTP connections.
+
+Every outgoing request (spnkr API calls, token refreshes, the lobby WebSocket
+and map thumbnail checks) goes through one :class:`aiohttp.TCPConnector`,
+so DNS lookups, TCP connections and TLS sessions are reused across
+commands instead of being set up again per call.
+
+:func:`get_session` returns a shared session without default headers.  Code
+that sets session-wide headers – ``HaloInfiniteClient.set_tokens`` writes the
+Spartan token into ``session.headers`` – must use :func:`new_session` to get
+a session of its own on the shared connector, so tokens never leak to other
+hosts.
+
+Environment variables
+---------------------
+HTTP_POOL_LIMIT           Total pooled connections (default: 100).
+HTTP_POOL_LIMIT_PER_HOST  Pooled connections per host (default: 20).
+HTTP_DNS_CACHE_TTL        Seconds to cache DNS results (default: 300).
+HTTP_KEEPALIVE_TIMEOUT    Seconds to keep idle connections open (default: 60).
+"""
+
+import logging
+import os
+from typing import Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+_POOL_LIMIT: int = int(os.environ.get("HTTP_POOL_LIMIT", "100"))
+_POOL_LIMIT_PER_HOST: int = int(os.environ.get("HTTP_POOL_LIMIT_PER_HOST", "20"))
+_DNS_CACHE_TTL: int = int(os.environ.get("HTTP_DNS_CACHE_TTL", "300"))
+_KEEPALIVE_TIMEOUT: float = float(os.environ.get("HTTP_KEEPALIVE_TIMEOUT", "60"))
+
+_connector: Optional[aiohttp.TCPConnector] = None
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def get_connector() -> aiohttp.TCPConnector:
+    """Return the shared connector, creating it on first use (or after :func:`close`)."""
+    global _connector
+    if _connector is None or _connector.closed:
+        _connector = aiohttp.TCPConnector(
+            limit=_POOL_LIMIT,
+            limit_per_host=_POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=_DNS_CACHE_TTL,
+            keepalive_timeout=_KEEPALIVE_TIMEOUT,
+        )
+    return _connector
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Return the shared header-free session on the pooled connector.
+
+    Callers must not close it or change its default headers.
+    """
+    global _session
+    if _session is None or _session.closed or _session.connector is not get_connector():
+        _session = aiohttp.ClientSession(connector=get_connector(), connector_owner=False)
+    return _session
+
+
+def new_session(**kwargs) -> aiohttp.ClientSession:
+    """Return a new session sharing the pooled connector.
+
+    The session owns only its default headers and cookies; closing it leaves
+    the pooled connections open for everyone else.
+    """
+    return aiohttp.ClientSession(connector=get_connector(), connector_owner=False, **kwargs)
+
+
+async def close() -> None:
+    """Close the shared session and every pooled connection."""
+    global _session, _connector
+    if _session is not None and not _session.closed:
+        await _session.close()
+    if _connector is not None and not _connector.closed:
+        await _connector.close()
+        logger.info("Closed pooled HTTP connections")
+    _session = None
+    _connector = None
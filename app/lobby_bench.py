@@ -0,0 +1,128 @@
+"""Latency and throughput benchmark for the lobby client against the emulator.
+
+Starts an :class:`app.lobby_emulator.LobbyEmulator` and measures the
+handshake-to-payload latency of three consumption patterns:
+
+poller    Sequential :func:`fetch_raw_playlist_entries` calls, one per
+          ``WAIT_TIMES_POLL_INTERVAL`` tick in production.
+fallback  Bursts of concurrent one-shot fetches, as issued by ``/wait_time``
+          when the wait-time cache is empty (name resolution excluded).
+stream    Snapshots pushed over one :class:`LobbySubscriber` connection.
+
+Usage::
+
+    python -m app.lobby_bench --playlists 50 --iterations 50 --latency 0.005
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from app import http_pool
+from app.amqp_service import LobbySubscriber, fetch_raw_playlist_entries
+from app.lobby_emulator import EmulatorConfig, LobbyEmulator
+
+_FAKE_SPARTAN = "v4=emulator"
+_FAKE_CLEARANCE = "emulator"
+
+
+async def _fake_tokens() -> tuple[str, str]:
+    return _FAKE_SPARTAN, _FAKE_CLEARANCE
+
+
+def _summary(name: str, latencies: list[float], elapsed: float, entries: int) -> str:
+    if not latencies:
+        return f"{name:<9} no payloads received"
+    ms = sorted(x * 1000 for x in latencies)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    return (
+        f"{name:<9} n={len(ms):<4} p50={statistics.median(ms):7.2f}ms p95={p95:7.2f}ms "
+        f"max={ms[-1]:7.2f}ms  {len(ms) / elapsed:8.1f} payloads/s  {entries / elapsed:10.0f} entries/s"
+    )
+
+
+async def bench_poller(url: str, iterations: int) -> str:
+    latencies = []
+    entries = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        result = await fetch_raw_playlist_entries(_FAKE_SPARTAN, _FAKE_CLEARANCE, url=url)
+        if result:
+            latencies.append(time.perf_counter() - t0)
+            entries += len(result)
+    return _summary("poller", latencies, time.perf_counter() - start, entries)
+
+
+async def bench_fallback(url: str, iterations: int, concurrency: int) -> str:
+    latencies = []
+    entries = 0
+
+    async def one() -> None:
+        nonlocal entries
+        t0 = time.perf_counter()
+        result = await fetch_raw_playlist_entries(_FAKE_SPARTAN, _FAKE_CLEARANCE, url=url)
+        if result:
+            latencies.append(time.perf_counter() - t0)
+            entries += len(result)
+
+    start = time.perf_counter()
+    for _ in range(max(1, iterations // concurrency)):
+        await asyncio.gather(*(one() for _ in range(concurrency)))
+    return _summary("fallback", latencies, time.perf_counter() - start, entries)
+
+
+async def bench_stream(url: str, iterations: int) -> str:
+    latencies = []
+    entries = 0
+    subscriber = LobbySubscriber(_fake_tokens, url=url)
+    start = last = time.perf_counter()
+    snapshots = subscriber.snapshots()
+    try:
+        async for result in snapshots:
+            now = time.perf_counter()
+            latencies.append(now - last)
+            last = now
+            entries += len(result)
+            if len(latencies) >= iterations:
+                break
+    finally:
+        await subscriber.close()
+        await snapshots.aclose()
+    return _summary("stream", latencies, time.perf_counter() - start, entries)
+
+
+async def run(args: argparse.Namespace) -> None:
+    config = EmulatorConfig(
+        playlists=args.playlists,
+        handshake_latency=args.latency,
+        transfer_latency=args.latency,
+        fragment_size=args.fragment_size,
+        max_frame_size=args.max_frame_size,
+    )
+    try:
+        async with LobbyEmulator(config) as emulator:
+            print(f"emulator {emulator.url}: {args.playlists} playlists, latency {args.latency * 1000:.1f}ms, "
+                  f"fragment {args.fragment_size or '-'}, max frame {args.max_frame_size}")
+            print(await bench_poller(emulator.url, args.iterations))
+            print(await bench_fallback(emulator.url, args.iterations, args.concurrency))
+            print(await bench_stream(emulator.url, args.iterations))
+            print(f"emulator served {emulator.connections} connections, {emulator.transfers_sent} transfers")
+    finally:
+        await http_pool.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the lobby client against the emulator")
+    parser.add_argument("--playlists", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.0, help="emulated server latency (s)")
+    parser.add_argument("--fragment-size", type=int, default=None)
+    parser.add_argument("--max-frame-size", type=int, default=65536)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+"""Local stand-in for the Halo Infinite lobby WebSocket.
+
+Serves the same AMQPWSB10 OPEN/BEGIN/ATTACH/FLOW/TRANSFER sequence as
+wss://lobby-hi.svc.halowaypoint.com/ from an aiohttp server on localhost,
+with synthetic Bond ``PlaylistResponse`` payloads.  Point
+:func:`app.amqp_service.fetch_raw_playlist_entries` or
+:class:`app.amqp_service.LobbySubscriber` at :attr:`LobbyEmulator.url` (or set
+``LOBBY_WS_URL``) to exercise the client without the real service.
+
+Injectable behaviour (see :class:`EmulatorConfig`)
+--------------------------------------------------
+* latency before the handshake replies and before every TRANSFER,
+* WebSocket fragmentation (frames split over several messages),
+* multi-frame TRANSFERs via the ``more`` flag,
+* END or CLOSE after a number of TRANSFERs,
+* stalling after ATTACH so the client runs into its timeout,
+* non-zero starting sequence numbers, with END on a FLOW that does not
+  count from them.
+
+Run standalone with ``python -m app.lobby_emulator --port 8765``; every
+behaviour above has a flag, e.g. ``--close-after 3`` or ``--stall``.
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import struct
+import uuid
+from typing import Optional
+
+from aiohttp import WSMsgType, web
+from pydantic import BaseModel
+
+from app.amqp_service import (
+    _AMQP_PROTOCOL_HEADER,
+    _BT_DOUBLE,
+    _BT_LIST,
+    _BT_STRING,
+    _BT_STRUCT,
+    _BT_UINT32,
+    AmqpFrameDecoder,
+    AmqpFrameError,
+    _encode_str_amqp,
+    _encode_uint_amqp,
+    _make_amqp_frame,
+)
+
+logger = logging.getLogger(__name__)
+
+# ── Client → server performative descriptors ─────────────────────────────────
+_DESC_OPEN = b'\x00\x53\x10'
+_DESC_BEGIN = b'\x00\x53\x11'
+_DESC_ATTACH = b'\x00\x53\x12'
+_DESC_FLOW = b'\x00\x53\x13'
+_DESC_DISPOSITION = b'\x00\x53\x15'
+_DESC_END = b'\x00\x53\x17'
+_DESC_CLOSE = b'\x00\x53\x18'
+
+# FLOW field indices
+_FLOW_NEXT_INCOMING_ID = 0
+_FLOW_DELIVERY_COUNT = 5
+_FLOW_LINK_CREDIT = 6
+
+_TRANSFER_HEADER_ROOM = 64  # bytes reserved for the frame header + TRANSFER list
+
+
+class EmulatorConfig(BaseModel):
+    """Behaviour of a :class:`LobbyEmulator`.
+
+    Attributes:
+        playlists:         Number of synthetic playlists per snapshot.
+        handshake_latency: Seconds to wait before each handshake reply.
+        transfer_latency:  Seconds to wait before each TRANSFER.
+        jitter:            Relative random change of wait times between snapshots.
+        fragment_size:     Split every outgoing WebSocket message into chunks of
+                           this many bytes (``None`` sends whole frames).
+        max_frame_size:    Split TRANSFERs larger than this into ``more`` parts.
+        end_after:         Send END after this many TRANSFERs.
+        close_after:       Send CLOSE after this many TRANSFERs.
+        stall:             Never send a TRANSFER, even with credit.
+        require_auth:      Reject upgrades without a Spartan token header.
+        next_outgoing_id:  First TRANSFER id, announced in the server BEGIN.
+        initial_delivery_count: Link delivery-count announced in the server ATTACH.
+    """
+
+    playlists: int = 20
+    handshake_latency: float = 0.0
+    transfer_latency: float = 0.0
+    jitter: float = 0.1
+    fragment_size: Optional[int] = None
+    max_frame_size: int = 65536
+    end_after: Optional[int] = None
+    close_after: Optional[int] = None
+    stall: bool = False
+    require_auth: bool = True
+    next_outgoing_id: int = 0
+    initial_delivery_count: int = 0
+
+
+# ── Bond encoding ────────────────────────────────────────────────────────────
+
+def _bond_vint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def _bond_field(wtype: int, ordinal: int, last_ordinal: int) -> bytes:
+    """Encode a field header in the CompactBinary v2 dialect read by amqp_service."""
+    delta = ordinal - last_ordinal
+    if 1 <= delta <= 7:
+        return bytes([(delta << 5) | wtype])
+    return bytes([wtype]) + struct.pack('<H', ordinal)
+
+
+def _bond_guid(value: str) -> bytes:
+    parts = struct.unpack('<IIII', uuid.UUID(value).bytes_le)
+    out = bytearray()
+    last = 0
+    for ordinal, part in enumerate(parts):
+        out += _bond_field(_BT_UINT32, ordinal, last) + _bond_vint(part)
+        last = ordinal
+    return bytes(out) + b'\x00'
+
+
+def encode_playlist_response(entries: list[dict]) -> bytes:
+    """Encode *entries* as a Bond ``PlaylistResponse``.
+
+    Each entry has the keys returned by :func:`app.amqp_service.parse_playlist_bond`
+    (``asset_id``, ``version_id``, ``wait_time_ms``).  A name string is added to
+    every container and an unrelated field to the response so the decoder
+    has something to skip.
+    """
+    containers = bytearray()
+    for entry in entries:
+        info = (_bond_field(_BT_STRUCT, 1, 0) + _bond_guid(entry["asset_id"])
+                + _bond_field(_BT_STRUCT, 2, 1) + _bond_guid(entry["version_id"])
+                + b'\x00')
+        name = entry.get("name", "Emulated playlist").encode()
+        containers += (_bond_field(_BT_STRING, 1, 0) + _bond_vint(len(name)) + name
+                       + _bond_field(_BT_DOUBLE, 2, 1) + struct.pack('<d', entry["wait_time_ms"] / 1000)
+                       + _bond_field(_BT_STRUCT, 3, 2) + info
+                       + b'\x00')
+
+    filler = b"halobotti-lobby-emulator"
+    return (_bond_field(_BT_STRING, 7, 0) + _bond_vint(len(filler)) + filler
+            + _bond_field(_BT_LIST, 51, 7) + bytes([_BT_LIST]) + _bond_vint(1)
+            + bytes([_BT_STRUCT]) + _bond_vint(len(entries)) + containers
+            + b'\x00')
+
+
+def synthetic_playlists(count: int, seed: int = 0) -> list[dict]:
+    """Return *count* deterministic playlist entries for the emulator."""
+    rng = random.Random(seed)
+    return [
+        {
+            "asset_id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "version_id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "wait_time_ms": rng.randint(5_000, 600_000),
+            "name": f"Emulated playlist {i + 1}",
+        }
+        for i in range(count)
+    ]
+
+
+# ── AMQP encoding (server side) ──────────────────────────────────────────────
+
+def _performative(code: int, items: bytes, count: int, channel: int = 0, payload: bytes = b"") -> bytes:
+    list_body = struct.pack('>I', count) + items
+    list_enc = b'\xd0' + struct.pack('>I', len(list_body)) + list_body
+    return _make_amqp_frame(channel, b'\x00\x53' + bytes([code]) + list_enc + payload)
+
+
+def _encode_server_open() -> bytes:
+    return _performative(0x10, _encode_str_amqp("lobby-emulator") + b'\x40'
+                         + b'\x70' + struct.pack('>I', 65536), 3)
+
+
+def _encode_server_begin(next_outgoing_id: int = 0) -> bytes:
+    return _performative(0x11, b'\x60\x00\x00' + _encode_uint_amqp(next_outgoing_id)
+                         + b'\x70' + struct.pack('>I', 0x7FFFFFFF)
+                         + b'\x70' + struct.pack('>I', 0x7FFFFFFF), 4)
+
+
+def _encode_server_attach(name: str, initial_delivery_count: int = 0) -> bytes:
+    items = (_encode_str_amqp(name)
+             + b'\x43'                # handle
+             + b'\x42'                # role = sender
+             + b'\x50\x02'            # snd-settle-mode = mixed
+             + b'\x50\x00'            # rcv-settle-mode = first
+             + b'\x40' * 4            # source, target, unsettled, incomplete-unsettled
+             + _encode_uint_amqp(initial_delivery_count))  # initial-delivery-count
+    return _performative(0x12, items, 10)
+
+
+def _encode_server_end(condition: str, description: str) -> bytes:
+    error = _performative_error(condition, description)
+    return _performative(0x17, error, 1)
+
+
+def _encode_server_close(condition: str, description: str) -> bytes:
+    error = _performative_error(condition, description)
+    return _performative(0x18, error, 1)
+
+
+def _performative_error(condition: str, description: str) -> bytes:
+    cond = condition.encode()
+    items = b'\xa3' + bytes([len(cond)]) + cond + _encode_str_amqp(description)
+    list_body = struct.pack('>I', 2) + items
+    return b'\x00\x53\x1d' + b'\xd0' + struct.pack('>I', len(list_body)) + list_body
+
+
+def _encode_transfer_frames(delivery_id: int, message: bytes, max_frame_size: int) -> list[bytes]:
+    """Encode *message* as one or more TRANSFER frames using the ``more`` flag."""
+    chunk = max(1, max_frame_size - _TRANSFER_HEADER_ROOM)
+    parts = [message[i:i + chunk] for i in range(0, len(message), chunk)] or [b""]
+    tag = struct.pack('>I', delivery_id)
+    frames = []
+    for i, part in enumerate(parts):
+        more = i < len(parts) - 1
+        items = (b'\x43'                             # handle
+                 + _encode_uint_amqp(delivery_id)    # delivery-id
+                 + b'\xa0' + bytes([len(tag)]) + tag  # delivery-tag
+                 + b'\x43'                           # message-format
+                 + b'\x42'                           # settled = false
+                 + (b'\x41' if more else b'\x42'))   # more
+        frames.append(_performative(0x14, items, 6, payload=part))
+    return frames
+
+
+def _data_section(data: bytes) -> bytes:
+    return b'\x00\x53\x75' + b'\xb0' + struct.pack('>I', len(data)) + data
+
+
+# ── Server ───────────────────────────────────────────────────────────────────
+
+class LobbyEmulator:
+    """aiohttp server speaking the lobby's AMQPWSB10 dialect.
+
+    Usage::
+
+        async with LobbyEmulator(EmulatorConfig(playlists=50)) as emulator:
+            entries = await fetch_raw_playlist_entries("v4=x", "x", url=emulator.url)
+    """
+
+    def __init__(self, config: Optional[EmulatorConfig] = None, host: str = "127.0.0.1",
+                 port: int = 0) -> None:
+        self.config = config or EmulatorConfig()
+        self.playlists = synthetic_playlists(self.config.playlists)
+        self._host = host
+        self._port = port
+        self._runner: Optional[web.AppRunner] = None
+        self.url: Optional[str] = None
+        self.connections = 0
+        self.transfers_sent = 0
+        self.settled = 0
+        self.flow_violations = 0
+
+    async def __aenter__(self) -> "LobbyEmulator":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    async def start(self) -> str:
+        """Start listening and return the ``ws://`` URL clients should use."""
+        app = web.Application()
+        app.router.add_get("/", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self._host, self._port)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"ws://{host}:{port}/"
+        logger.info("Lobby emulator listening on %s", self.url)
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def snapshot(self) -> bytes:
+        """Return the next PlaylistResponse, with wait times jittered."""
+        jitter = self.config.jitter
+        for entry in self.playlists:
+            entry["wait_time_ms"] = max(0, int(entry["wait_time_ms"] * random.uniform(1 - jitter, 1 + jitter)))
+        return encode_playlist_response(self.playlists)
+
+    async def _send(self, ws: web.WebSocketResponse, data: bytes) -> None:
+        size = self.config.fragment_size
+        if not size:
+            await ws.send_bytes(data)
+            return
+        for i in range(0, len(data), size):
+            await ws.send_bytes(data[i:i + size])
+
+    async def _handle(self, request: web.Request) -> web.WebSocketResponse:
+        config = self.config
+        if config.require_auth and "X-343-Authorization-Spartan" not in request.headers:
+            raise web.HTTPUnauthorized()
+
+        ws = web.WebSocketResponse(protocols=("AMQPWSB10",))
+        await ws.prepare(request)
+        self.connections += 1
+
+        decoder = AmqpFrameDecoder()
+        # "sent" is the link delivery-count, "transfer_id" the session's next-outgoing-id
+        state = {
+            "credit": 0,
+            "delivery_count": config.initial_delivery_count,
+            "sent": config.initial_delivery_count,
+            "transfer_id": config.next_outgoing_id,
+        }
+        credit_changed = asyncio.Event()
+        pusher: Optional[asyncio.Task] = None
+
+        async def handshake_reply(frame: bytes) -> None:
+            if config.handshake_latency:
+                await asyncio.sleep(config.handshake_latency)
+            await self._send(ws, frame)
+
+        async def push() -> None:
+            while not ws.closed:
+                if state["delivery_count"] + state["credit"] <= state["sent"]:
+                    credit_changed.clear()
+                    await credit_changed.wait()
+                    continue
+                if config.transfer_latency:
+                    await asyncio.sleep(config.transfer_latency)
+                delivery_id = state["sent"]
+                message = _data_section(self.snapshot())
+                frames = _encode_transfer_frames(delivery_id, message, config.max_frame_size)
+                await self._send(ws, b"".join(frames))
+                state["transfer_id"] += len(frames)
+                state["sent"] += 1
+                self.transfers_sent += 1
+
+                if config.end_after and state["sent"] >= config.end_after:
+                    await self._send(ws, _encode_server_end("amqp:internal-error", "emulated END"))
+                    return
+                if config.close_after and state["sent"] >= config.close_after:
+                    await self._send(ws, _encode_server_close("amqp:internal-error", "emulated CLOSE"))
+                    await ws.close()
+                    return
+
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.BINARY:
+                    continue
+                if msg.data[:8] == _AMQP_PROTOCOL_HEADER:
+                    await self._send(ws, _AMQP_PROTOCOL_HEADER)
+                for frame in decoder.feed(msg.data):
+                    if frame.descriptor == _DESC_OPEN:
+                        await handshake_reply(_encode_server_open())
+                    elif frame.descriptor == _DESC_BEGIN:
+                        await handshake_reply(_encode_server_begin(config.next_outgoing_id))
+                    elif frame.descriptor == _DESC_ATTACH:
+                        name = frame.fields[0] if frame.fields else None
+                        link_name = bytes(name).decode() if isinstance(name, memoryview) else "link"
+                        await handshake_reply(_encode_server_attach(link_name, config.initial_delivery_count))
+                    elif frame.descriptor == _DESC_FLOW:
+                        fields = frame.fields
+                        next_incoming_id = fields[_FLOW_NEXT_INCOMING_ID] or 0
+                        delivery_count = fields[_FLOW_DELIVERY_COUNT] or 0
+                        if not (config.next_outgoing_id <= next_incoming_id <= state["transfer_id"]
+                                and config.initial_delivery_count <= delivery_count <= state["sent"]):
+                            self.flow_violations += 1
+                            await self._send(ws, _encode_server_end(
+                                "amqp:session:window-violation",
+                                f"FLOW next-incoming-id {next_incoming_id}, delivery-count {delivery_count}",
+                            ))
+                            await ws.close()
+                            break
+                        state["delivery_count"] = delivery_count
+                        state["credit"] = fields[_FLOW_LINK_CREDIT] or 0
+                        credit_changed.set()
+                        if pusher is None and not config.stall:
+                            pusher = asyncio.create_task(push())
+                    elif frame.descriptor == _DESC_DISPOSITION:
+                        self.settled += 1
+                    elif frame.descriptor in (_DESC_END, _DESC_CLOSE):
+                        await ws.close()
+        except AmqpFrameError as exc:
+            logger.warning("Emulator received undecodable frame: %s", exc)
+        finally:
+            if pusher is not None:
+                pusher.cancel()
+        return ws
+
+
+async def _serve(config: EmulatorConfig, host: str, port: int) -> None:
+    async with LobbyEmulator(config, host, port) as emulator:
+        print(f"Lobby emulator listening on {emulator.url} – set LOBBY_WS_URL to use it")
+        await asyncio.Event().wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local AMQPWSB10 lobby emulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--playlists", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="handshake/TRANSFER latency (s)")
+    parser.add_argument("--fragment-size", type=int, default=None)
+    parser.add_argument("--max-frame-size", type=int, default=65536)
+    parser.add_argument("--end-after", type=int, default=None, help="send END after this many TRANSFERs")
+    parser.add_argument("--close-after", type=int, default=None, help="send CLOSE after this many TRANSFERs")
+    parser.add_argument("--stall", action="store_true", help="never send a TRANSFER")
+    parser.add_argument("--next-outgoing-id", type=int, default=0, help="first TRANSFER id (server BEGIN)")
+    parser.add_argument("--initial-delivery-count", type=int, default=0, help="server ATTACH delivery-count")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    config = EmulatorConfig(
+        playlists=args.playlists,
+        handshake_latency=args.latency,
+        transfer_latency=args.latency,
+        fragment_size=args.fragment_size,
+        max_frame_size=args.max_frame_size,
+        end_after=args.end_after,
+        close_after=args.close_after,
+        stall=args.stall,
+        next_outgoing_id=args.next_outgoing_id,
+        initial_delivery_count=args.initial_delivery_count,
+    )
+    try:
+        asyncio.run(_serve(config, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
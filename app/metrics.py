@@ -0,0 +1,314 @@
+"""In-process metrics: counters and histograms with Prometheus text output.
+
+Modules declare their metrics once at import time::
+
+    _REQUEST_SECONDS = metrics.histogram(
+        "halo_api_request_seconds", "Halo API request latency", ("family", "command"),
+    )
+    _REQUEST_SECONDS.observe(elapsed, family="stats")
+
+A ``command`` label, when declared but not passed, is filled in from the
+slash command being served (see :func:`command`), so time spent in the
+network, parsing, the database and rendering can be attributed to
+``/rank`` or ``make_series``.  Work outside any command is labelled
+``background``.
+
+The registry is rendered by the ``/metrics`` admin command and, when
+``METRICS_DUMP_PATH`` is set, written periodically to that file in the
+Prometheus text format (e.g. for node_exporter's textfile collector).
+
+Environment variables
+---------------------
+METRICS_DUMP_PATH      File to write Prometheus text to (default: unset, disabled).
+METRICS_DUMP_INTERVAL  Seconds between dumps (default: 60).
+"""
+
+import asyncio
+import bisect
+import contextvars
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+_DUMP_PATH: str = os.environ.get("METRICS_DUMP_PATH", "")
+_DUMP_INTERVAL: int = int(os.environ.get("METRICS_DUMP_INTERVAL", "60"))
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_command: contextvars.ContextVar[str] = contextvars.ContextVar("metrics_command", default="background")
+
+_LabelValues = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: _LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+
+    def _key(self, labels: dict[str, object]) -> _LabelValues:
+        if "command" in self.label_names and "command" not in labels:
+            labels["command"] = _command.get()
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """A monotonically increasing count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help_text, label_names)
+        self._values: dict[_LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: object) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def items(self) -> list[tuple[_LabelValues, float]]:
+        return sorted(self._values.items())
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for key, value in self.items():
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value:g}")
+        return lines
+
+
+class _Series:
+    __slots__ = ("buckets", "count", "total")
+
+    def __init__(self, size: int) -> None:
+        self.buckets = [0] * size
+        self.count = 0
+        self.total = 0.0
+
+
+class Histogram(_Metric):
+    """Bucketed observations (in seconds, by convention) per label set."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help_text, label_names)
+        self.bounds = tuple(sorted(buckets))
+        self._series: dict[_LabelValues, _Series] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series(len(self.bounds))
+        index = bisect.bisect_left(self.bounds, value)
+        if index < len(self.bounds):
+            series.buckets[index] += 1
+        series.count += 1
+        series.total += value
+
+    @contextmanager
+    def time(self, **labels: object) -> Iterator[None]:
+        """Observe the wall-clock duration of the enclosed block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def quantile(self, key: _LabelValues, q: float) -> Optional[float]:
+        """Estimate quantile *q* of a series as the upper bound of its bucket."""
+        series = self._series.get(key)
+        if series is None or series.count == 0:
+            return None
+        target = q * series.count
+        seen = 0
+        for bound, count in zip(self.bounds, series.buckets):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def items(self) -> list[tuple[_LabelValues, _Series]]:
+        return sorted(self._series.items())
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for key, series in self.items():
+            cumulative = 0
+            for bound, count in zip(self.bounds, series.buckets):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, f'le="{bound:g}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {series.count}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {series.total:.6f}")
+            lines.append(f"{self.name}_count{labels} {series.count}")
+        return lines
+
+
+class Registry:
+    """Named metrics, created once and shared by name."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def _get_or_create(self, cls: type, name: str, *args, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, *args, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names: tuple[str, ...] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, label_names)
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, label_names, buckets)
+
+    def metrics(self) -> list[_Metric]:
+        return [self._metrics[name] for name in sorted(self._metrics)]
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics():
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+histogram = REGISTRY.histogram
+render = REGISTRY.render
+
+COMMAND_SECONDS = histogram("command_seconds", "Slash command wall-clock time", ("command", "outcome"))
+CACHE_REQUESTS = counter("cache_requests_total", "Cache lookups by cache, tier and result", ("cache", "result"))
+PARSE_SECONDS = histogram("parse_seconds", "Time to parse API payloads into models", ("model", "command"))
+RENDER_SECONDS = histogram("render_seconds", "Time to build embeds and images", ("view", "command"))
+
+
+def current_command() -> str:
+    """Return the slash command being served, or ``"background"``."""
+    return _command.get()
+
+
+@contextmanager
+def command(name: str) -> Iterator[None]:
+    """Attribute the enclosed work (and tasks spawned in it) to command *name*."""
+    token = _command.set(name)
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        COMMAND_SECONDS.observe(time.perf_counter() - start, command=name, outcome=outcome)
+        _command.reset(token)
+
+
+def cache_result(cache: str, result: str, count: int = 1) -> None:
+    """Count *count* lookups in *cache* with *result* (``hit``, ``miss``, ``db_hit``…)."""
+    if count:
+        CACHE_REQUESTS.inc(count, cache=cache, result=result)
+
+
+def summary() -> list[str]:
+    """Return a compact, human-readable digest of every histogram and counter."""
+    lines = []
+    for metric in REGISTRY.metrics():
+        if isinstance(metric, Histogram):
+            for key, series in metric.items():
+                labels = ",".join(value for value in key if value)
+                p50 = metric.quantile(key, 0.5)
+                p95 = metric.quantile(key, 0.95)
+                lines.append(
+                    f"{metric.name}[{labels}] n={series.count} "
+                    f"avg={series.total / series.count * 1000:.1f}ms "
+                    f"p50≤{p50 * 1000:g}ms p95≤{p95 * 1000:g}ms"
+                )
+        elif isinstance(metric, Counter):
+            for key, value in metric.items():
+                labels = ",".join(value for value in key if value)
+                lines.append(f"{metric.name}[{labels}] {value:g}")
+    return lines
+
+
+def write_dump(path: str = _DUMP_PATH) -> None:
+    """Atomically write the Prometheus text to *path*."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(tmp, path)
+
+
+# ── Periodic dump ─────────────────────────────────────────────────────────────
+
+_dump_task: Optional[asyncio.Task] = None
+
+
+async def _dump_loop(path: str, interval: int) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(write_dump, path)
+        except OSError as exc:
+            logger.warning("Could not write metrics to %s: %s", path, exc)
+
+
+def start_dump() -> None:
+    """Start writing ``METRICS_DUMP_PATH`` every ``METRICS_DUMP_INTERVAL`` seconds, if configured."""
+    global _dump_task
+    if not _DUMP_PATH or (_dump_task is not None and not _dump_task.done()):
+        return
+    _dump_task = asyncio.create_task(_dump_loop(_DUMP_PATH, _DUMP_INTERVAL))
+    logger.info("Writing metrics to %s every %ds", _DUMP_PATH, _DUMP_INTERVAL)
+
+
+async def stop_dump() -> None:
+    """Stop the dump loop and write a final snapshot."""
+    global _dump_task
+    if _dump_task is None:
+        return
+    _dump_task.cancel()
+    try:
+        await _dump_task
+    except asyncio.CancelledError:
+        pass
+    _dump_task = None
+    try:
+        write_dump(_DUMP_PATH)
+    except OSError as exc:
+        logger.warning("Could not write metrics to %s: %s", _DUMP_PATH, exc)
@@ -17,6 +17,16 @@ class PlaylistWaitTimeRecord(SQLModel, table=True):
     recorded_at: datetime = Field(default_factory=datetime.utcnow, index=True)
 
 
+class LatestWaitTime(SQLModel, table=True):
+    """Most recent wait time of each playlist, upserted with every stored snapshot."""
+
+    asset_id: str = Field(primary_key=True)
+    version_id: str
+    playlist_name: Optional[str] = Field(default=None)
+    wait_time_ms: int
+    recorded_at: datetime
+
+
 class PlaylistInfo(SQLModel, table=True):
     """Cached metadata for a playlist (name resolved from the discovery API)."""
 
@@ -24,3 +34,13 @@ class PlaylistInfo(SQLModel, table=True):
     version_id: str
     playlist_name: Optional[str] = Field(default=None)
     last_seen: datetime = Field(default_factory=datetime.utcnow)
+
+
+class PlaylistCategory(SQLModel, table=True):
+    """Category of one playlist version ("ranked", "social")."""
+
+    asset_id: str = Field(primary_key=True)
+    version_id: str = Field(primary_key=True)
+    category: str
+    playlist_name: Optional[str] = Field(default=None)
+    classified_at: datetime = Field(default_factory=datetime.utcnow)
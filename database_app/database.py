@@ -1,27 +1,167 @@
+"""SQLite access for the bot: models, caches and match/player bookkeeping.
+
+Two engines share the database file.  :data:`engine` is the only writer:
+its pool holds a single connection, so writes queue in the pool instead
+of contending for SQLite's lock.  :data:`read_engine` is a small pool of
+read-only connections used by the query helpers.  In WAL mode readers see
+the last committed state and never wait for the writer's commits (the
+wait-time poller, the ingestion crawler).  Every connection is tuned with
+the pragmas below when it is opened.
+
+Writes go through :func:`write_session`.  While one is open it holds the
+only writer connection, so it must be short: prepare rows and do any API
+or read-engine I/O before opening it, and never open another writer
+session inside it (that raises :class:`RuntimeError` rather than waiting
+for a connection it holds itself).  Other writers wait up to
+``DB_POOL_TIMEOUT`` seconds for the connection before raising
+``TimeoutError``.
+
+Environment variables
+---------------------
+DB_JOURNAL_MODE     SQLite journal mode, set by the writer (default: WAL).
+DB_SYNCHRONOUS      ``PRAGMA synchronous``; NORMAL is durable in WAL mode except on power loss (default: NORMAL).
+DB_MMAP_SIZE        Bytes of the file memory-mapped per connection (default: 268435456).
+DB_CACHE_SIZE_KB    Page cache per connection in KiB (default: 65536).
+DB_BUSY_TIMEOUT_MS  Milliseconds a connection waits for a lock before failing (default: 5000).
+DB_READ_POOL_SIZE   Read-only connections (default: 4).
+DB_POOL_TIMEOUT     Seconds a session waits for a pooled connection (default: 30).
+"""
+
+import asyncio
+import contextvars
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
 from sqlmodel import SQLModel, create_engine, select
 from sqlmodel.ext.asyncio.session import AsyncSession as Session
 from sqlalchemy.ext.asyncio import create_async_engine
 from .models import *
-from app.models.playlist import PlaylistWaitTimeRecord, PlaylistInfo  # noqa: F401 – registers tables
+from . import migrations
+from app import metrics
+from app.models.playlist import LatestWaitTime, PlaylistWaitTimeRecord, PlaylistInfo, PlaylistCategory  # noqa: F401 – registers tables
 
+from sqlalchemy import event, func, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError, InvalidRequestError
 
+_JOURNAL_MODE: str = os.environ.get("DB_JOURNAL_MODE", "WAL").upper()
+_SYNCHRONOUS: str = os.environ.get("DB_SYNCHRONOUS", "NORMAL").upper()
+_MMAP_SIZE: int = int(os.environ.get("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+_CACHE_SIZE_KB: int = int(os.environ.get("DB_CACHE_SIZE_KB", "65536"))
+_BUSY_TIMEOUT_MS: int = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "5000"))
+_READ_POOL_SIZE: int = int(os.environ.get("DB_READ_POOL_SIZE", "4"))
+_POOL_TIMEOUT: float = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
 
 sqlite_file_name = "database.db"
 sqlite_url = f"sqlite+aiosqlite:///{sqlite_file_name}"
+# Absolute like the writer's path (SQLAlchemy resolves that one when the engine is created)
+sqlite_read_url = f"sqlite+aiosqlite:///file:{os.path.abspath(sqlite_file_name)}?mode=ro&uri=true"
 connect_args = {"check_same_thread": False}
 
-engine = create_async_engine(sqlite_url, future=True, echo=False, connect_args=connect_args)
+# One writer connection: see write_session() for the rules that keep it from queueing everyone
+engine = create_async_engine(
+    sqlite_url, future=True, echo=False, connect_args=connect_args,
+    pool_size=1, max_overflow=0, pool_timeout=_POOL_TIMEOUT,
+)
+# mode=ro cannot create the database, and WAL needs its -shm/-wal files next to
+# it.  engine_start() opens the file on the writer and switches it to WAL
+# before anything reads, and the writer's pooled connection stays open, so
+# the WAL files exist for as long as the readers do.
+read_engine = create_async_engine(
+    sqlite_read_url, future=True, echo=False, connect_args=connect_args,
+    pool_size=_READ_POOL_SIZE, max_overflow=0, pool_timeout=_POOL_TIMEOUT,
+)
 
+_IN_CHUNK = 500  # stay well under SQLite's bound-parameter limit
 
-async def engine_start() -> None:
+_DB_SECONDS = metrics.histogram("db_query_seconds", "SQLite statement time", ("operation", "command"))
+
+_PRAGMAS = (
+    f"busy_timeout = {_BUSY_TIMEOUT_MS}",
+    f"synchronous = {_SYNCHRONOUS}",
+    f"mmap_size = {_MMAP_SIZE}",
+    f"cache_size = -{_CACHE_SIZE_KB}",  # negative: KiB rather than pages
+)
+
+
+def _apply_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    for pragma in pragmas:
+        cursor.execute(f"PRAGMA {pragma}")
+    cursor.close()
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def _connect_writer(dbapi_connection, connection_record):
+    # The journal mode is stored in the file; WAL then applies to the readers too
+    _apply_pragmas(dbapi_connection, (*_PRAGMAS, f"journal_mode = {_JOURNAL_MODE}"))
+
+
+@event.listens_for(read_engine.sync_engine, "connect")
+def _connect_reader(dbapi_connection, connection_record):
+    _apply_pragmas(dbapi_connection, _PRAGMAS)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    _DB_SECONDS.observe(time.perf_counter() - context._query_start, operation=operation)
+
+
+for _engine in (engine, read_engine):
+    event.listen(_engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(_engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+_writing: contextvars.ContextVar[bool] = contextvars.ContextVar("db_writing", default=False)
+_start_task: Optional[asyncio.Task] = None
+
+
+@asynccontextmanager
+async def write_session(**kwargs) -> AsyncIterator[Session]:
+    """Open a session on the writer engine; *kwargs* go to :class:`Session`.
+
+    Raises :class:`RuntimeError` inside another writer session of the same
+    task (or a task started from one): the pool's only connection is
+    already taken, so the inner session would wait for it until
+    ``DB_POOL_TIMEOUT``.
+    """
+    if _writing.get():
+        raise RuntimeError("Nested writer session: the writer pool has a single connection")
+    token = _writing.set(True)
+    try:
+        async with Session(engine, **kwargs) as session:
+            yield session
+    finally:
+        _writing.reset(token)
+
+
+async def _migrate() -> None:
     async with engine.begin() as conn:
-        await conn.run_sync(SQLModel.metadata.drop_all)
-        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.run_sync(migrations.migrate, SQLModel.metadata)
+
+
+async def engine_start() -> None:
+    """Create or migrate the database and switch it to WAL.
+
+    Every startup path that reads awaits this first (see :data:`read_engine`);
+    concurrent callers share one run.
+    """
+    global _start_task
+    if _start_task is None or (_start_task.done() and (_start_task.cancelled() or _start_task.exception())):
+        _start_task = asyncio.get_running_loop().create_task(_migrate())
+    await asyncio.shield(_start_task)
 
 
 async def get_player(gamertag):
-    async with Session(engine) as session:
+    async with Session(read_engine) as session:
         statement = select(CustomPlayer).where(CustomPlayer.gamertag == gamertag)
         results = await session.exec(statement)
         player = results.unique().first()
@@ -31,7 +171,7 @@ async def get_player(gamertag):
 
 async def add_custom_player(profile, is_valid=False):
     player = CustomPlayer(gamertag=profile.gamertag, xuid=profile.xuid, is_valid=is_valid, custom_matches=[])
-    async with Session(engine, expire_on_commit=False) as session:
+    async with write_session(expire_on_commit=False) as session:
         try:
             session.add(player)
             await session.commit()
@@ -44,7 +184,7 @@ async def add_custom_player(profile, is_valid=False):
 
 
 async def get_player_by_xuid(xuid):
-    async with Session(engine) as session:
+    async with Session(read_engine) as session:
         statement = select(CustomPlayer).where(CustomPlayer.xuid == xuid)
         results = await session.exec(statement)
         player = results.unique().first()
@@ -52,9 +192,62 @@ async def get_player_by_xuid(xuid):
         return player
 
 
+async def get_players_by_xuids(xuids):
+    async with Session(read_engine) as session:
+        statement = select(CustomPlayer).where(CustomPlayer.xuid.in_(xuids))
+        results = await session.exec(statement)
+        players = results.unique().all()
+
+        return players
+
+
+async def get_player_by_gamertag_nocase(gamertag):
+    async with Session(read_engine) as session:
+        statement = select(CustomPlayer).where(func.lower(CustomPlayer.gamertag) == gamertag.lower())
+        results = await session.exec(statement)
+        player = results.unique().first()
+
+        return player
+
+
+async def upsert_players(profiles, refreshed_at=None):
+    """Insert or update *profiles* (objects with ``xuid`` and ``gamertag``) in one transaction.
+
+    Rows are written with ``INSERT … ON CONFLICT(xuid) DO UPDATE``: existing
+    players get the current gamertag and, when given, *refreshed_at*; their
+    other columns (``is_valid``…) are left alone.  The stored rows are then
+    read back in a single query and returned.
+    """
+    rows = {
+        int(profile.xuid): {"xuid": int(profile.xuid), "gamertag": profile.gamertag, "last_refreshed": refreshed_at}
+        for profile in profiles
+    }
+    if not rows:
+        return []
+    xuids = list(rows)
+    async with write_session(expire_on_commit=False) as session:
+        for i in range(0, len(xuids), _IN_CHUNK):
+            statement = sqlite_insert(CustomPlayer).values([rows[xuid] for xuid in xuids[i:i + _IN_CHUNK]])
+            statement = statement.on_conflict_do_update(
+                index_elements=["xuid"],
+                set_={
+                    "gamertag": statement.excluded.gamertag,
+                    "last_refreshed": func.coalesce(statement.excluded.last_refreshed, CustomPlayer.last_refreshed),
+                },
+            )
+            await session.execute(statement)
+        statement = select(CustomPlayer).where(CustomPlayer.xuid.in_(xuids)).execution_options(populate_existing=True)
+        results = await session.exec(statement)
+        players = results.unique().all()
+        await session.commit()
+
+        return players
+
+
 async def update_player(gamertag, value, validation_message=False):
-    async with Session(engine, expire_on_commit=False) as session:
-        player = await get_player(gamertag)
+    async with write_session(expire_on_commit=False) as session:
+        results = await session.exec(select(CustomPlayer).where(CustomPlayer.gamertag == gamertag))
+        player = results.unique().first()
         if player:
             player.is_valid = value
             if validation_message:
@@ -67,7 +260,7 @@ async def update_player(gamertag, value, validation_message=False):
         
 
 async def get_players():
-    async with Session(engine) as session:
+    async with Session(read_engine) as session:
         statement = select(CustomPlayer).where(CustomPlayer.is_valid == True)
         results = await session.exec(statement)
         players = results.unique().all()
@@ -75,25 +268,17 @@ async def get_players():
 
 
 async def add_players_in_match(match):
-    custom_players = []
-    for player in match.players:
-        if not player.xuid.startswith("bid"):
-            try:
-                await add_custom_player(player)
-            except IntegrityError:
-                pass
-            custom_player = await get_player(player.gamertag)
-            custom_players.append(custom_player)
-    return custom_players
+    # Bots have no XUID (their IDs look like "bid(1.0)")
+    return await upsert_players([player for player in match.players if not str(player.xuid).startswith("bid")])
 
 
 async def add_custom_match(match, is_valid: bool = False):
 
-    async with Session(engine, expire_on_commit=False) as session:
+    async with write_session(expire_on_commit=False) as session:
         custom_match = CustomMatch(
             match_id=match.match_stats.match_id,
             players=[],
-            is_vslid=is_valid
+            is_valid=is_valid
         )
         try:
             session.add(custom_match)
@@ -107,7 +292,7 @@ async def add_custom_match(match, is_valid: bool = False):
 
 
 async def get_match(match_id):
-    async with Session(engine) as session:
+    async with Session(read_engine) as session:
         statement = select(CustomMatch).where(CustomMatch.match_id == match_id)
         results = await session.exec(statement)
         match = results.unique().one()
@@ -116,8 +301,9 @@ async def get_match(match_id):
 
 
 async def update_match(match_id, value):
-    async with Session(engine) as session:
-        match = await get_match(match_id)
+    async with write_session() as session:
+        results = await session.exec(select(CustomMatch).where(CustomMatch.match_id == match_id))
+        match = results.unique().one()
         match.is_valid = value
         session.add(match)
         await session.commit()
@@ -127,7 +313,7 @@ async def update_match(match_id, value):
 
 
 async def get_all_matches():
-    async with Session(engine) as session:
+    async with Session(read_engine) as session:
         statement = select(CustomMatch)
         results = await session.exec(statement)
         matches = results.unique().all()
@@ -136,19 +322,20 @@ async def get_all_matches():
 
 
 async def add_match_to_players(custom_match_id, players):
-    async with Session(engine) as session:
-        match = await get_match(custom_match_id)
-        for player in players:
-            custom_player = await get_player(player.gamertag)
-            if custom_player:
-                custom_player.custom_matches.append(match)
-                session.add(custom_player)
-                await session.commit()
+    gamertags = [player.gamertag for player in players]
+    async with write_session() as session:
+        results = await session.exec(select(CustomMatch).where(CustomMatch.match_id == custom_match_id))
+        match = results.unique().one()
+        results = await session.exec(select(CustomPlayer).where(CustomPlayer.gamertag.in_(gamertags)))
+        for custom_player in results.unique().all():
+            custom_player.custom_matches.append(match)
+            session.add(custom_player)
+        await session.commit()
 
 
 async def add_channel(guild_id):
     channel = Channel(guild_id=guild_id)
-    async with Session(engine) as session:
+    async with write_session() as session:
         try:
             session.add(channel)
             await session.commit()
@@ -161,7 +348,7 @@ async def add_channel(guild_id):
         
 
 async def update_channel(guild_id, log_channel=None, leaderboard_channel=None):
-    async with Session(engine) as session:
+    async with write_session() as session:
         statement = select(Channel).where(Channel.guild_id == guild_id)
         results = await session.exec(statement)
         channel = results.one()
@@ -179,7 +366,7 @@ async def update_channel(guild_id, log_channel=None, leaderboard_channel=None):
 
 
 async def get_log_channel():
-    async with Session(engine) as session:
+    async with Session(read_engine) as session:
         statement = select(Channel)
         results = await session.exec(statement)
         channel = results.first()
@@ -188,9 +375,193 @@ async def get_log_channel():
 
 
 async def get_all_channels():
-    async with Session(engine) as session:
+    async with Session(read_engine) as session:
         statement = select(Channel)
         results = await session.exec(statement)
         channels = results.all()
 
         return channels
+
+
+async def get_match_stats_data(match_ids):
+    """Return ``{match_id: compressed_json}`` for the stored matches among *match_ids*."""
+    match_ids = list(match_ids)
+    found = {}
+    async with Session(read_engine) as session:
+        for i in range(0, len(match_ids), _IN_CHUNK):
+            statement = select(MatchStatsRecord.match_id, MatchStatsRecord.data).where(
+                MatchStatsRecord.match_id.in_(match_ids[i:i + _IN_CHUNK])
+            )
+            results = await session.exec(statement)
+            found.update(results.all())
+
+    return found
+
+
+async def save_match_stats_data(records):
+    """Store ``{match_id: compressed_json}`` in one transaction, keeping existing rows."""
+    if not records:
+        return
+    now = datetime.utcnow()
+    statement = sqlite_insert(MatchStatsRecord).on_conflict_do_nothing(index_elements=["match_id"])
+    async with write_session() as session:
+        await session.execute(
+            statement,
+            [{"match_id": match_id, "data": data, "stored_at": now} for match_id, data in records.items()],
+        )
+        await session.commit()
+
+
+async def get_discovery_asset(asset_type, asset_id, version_id):
+    async with Session(read_engine) as session:
+        return await session.get(DiscoveryAssetRecord, (asset_type, asset_id, version_id))
+
+
+async def save_discovery_asset(asset_type, asset_id, version_id, data):
+    """Store an asset's compressed JSON (``None`` for a 404), replacing any earlier entry."""
+    values = {
+        "asset_type": asset_type,
+        "asset_id": asset_id,
+        "version_id": version_id,
+        "data": data,
+        "stored_at": datetime.utcnow(),
+    }
+    statement = sqlite_insert(DiscoveryAssetRecord).values(values)
+    statement = statement.on_conflict_do_update(
+        index_elements=["asset_type", "asset_id", "version_id"],
+        set_={"data": statement.excluded.data, "stored_at": statement.excluded.stored_at},
+    )
+    async with write_session() as session:
+        await session.execute(statement)
+        await session.commit()
+
+
+async def get_playlist_categories():
+    """Return ``{(asset_id, version_id): category}`` for every classified playlist version."""
+    async with Session(read_engine) as session:
+        results = await session.exec(
+            select(PlaylistCategory.asset_id, PlaylistCategory.version_id, PlaylistCategory.category)
+        )
+        return {(asset_id, version_id): category for asset_id, version_id, category in results.all()}
+
+
+async def save_playlist_category(asset_id, version_id, category, playlist_name):
+    statement = sqlite_insert(PlaylistCategory).values(
+        asset_id=asset_id, version_id=version_id, category=category, playlist_name=playlist_name,
+        classified_at=datetime.utcnow(),
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["asset_id", "version_id"],
+        set_={
+            "category": statement.excluded.category,
+            "playlist_name": statement.excluded.playlist_name,
+            "classified_at": statement.excluded.classified_at,
+        },
+    )
+    async with write_session() as session:
+        await session.execute(statement)
+        await session.commit()
+
+
+async def get_film_highlights_data(match_id):
+    async with Session(read_engine) as session:
+        record = await session.get(FilmHighlightsRecord, match_id)
+        return record.data if record else None
+
+
+async def save_film_highlights_data(match_id, data):
+    statement = sqlite_insert(FilmHighlightsRecord).values(match_id=match_id, data=data, stored_at=datetime.utcnow())
+    statement = statement.on_conflict_do_nothing(index_elements=["match_id"])
+    async with write_session() as session:
+        await session.execute(statement)
+        await session.commit()
+
+
+async def get_match_skill_data(match_ids):
+    """Return ``{match_id: compressed_json}`` for the stored match skills among *match_ids*."""
+    match_ids = list(match_ids)
+    found = {}
+    async with Session(read_engine) as session:
+        for i in range(0, len(match_ids), _IN_CHUNK):
+            statement = select(MatchSkillRecord.match_id, MatchSkillRecord.data).where(
+                MatchSkillRecord.match_id.in_(match_ids[i:i + _IN_CHUNK])
+            )
+            results = await session.exec(statement)
+            found.update(results.all())
+
+    return found
+
+
+async def save_match_skill_data(records):
+    """Store ``{match_id: compressed_json}`` in one transaction, replacing existing rows."""
+    if not records:
+        return
+    now = datetime.utcnow()
+    statement = sqlite_insert(MatchSkillRecord)
+    statement = statement.on_conflict_do_update(
+        index_elements=["match_id"],
+        set_={"data": statement.excluded.data, "stored_at": statement.excluded.stored_at},
+    )
+    async with write_session() as session:
+        await session.execute(
+            statement,
+            [{"match_id": match_id, "data": data, "stored_at": now} for match_id, data in records.items()],
+        )
+        await session.commit()
+
+
+async def get_ingested_match_ids(match_ids):
+    """Return the IDs among *match_ids* that already have a ``CustomMatch`` row, lower-cased."""
+    match_ids = [uuid.UUID(str(match_id)) for match_id in match_ids]
+    async with Session(read_engine) as session:
+        statement = select(CustomMatch.match_id).where(CustomMatch.match_id.in_(match_ids))
+        results = await session.exec(statement)
+        return {str(match_id) for match_id in results.all()}
+
+
+def _match_validity_upsert():
+    statement = sqlite_insert(CustomMatch)
+    return statement.on_conflict_do_update(index_elements=["match_id"], set_={"is_valid": statement.excluded.is_valid})
+
+
+def _match_validity_rows(results):
+    return [{"match_id": uuid.UUID(str(match_id)), "is_valid": bool(is_valid)} for match_id, is_valid in results.items()]
+
+
+async def save_ingested_matches(participants, validity):
+    """Store matches with their validity and link their players in one transaction.
+
+    Args:
+        participants: ``{match_id: xuids}``; XUIDs without a ``CustomPlayer``
+            row are not linked.
+        validity: ``{match_id: is_valid}`` for the same matches.
+    """
+    if not participants:
+        return
+    match_ids = {uuid.UUID(str(match_id)): xuids for match_id, xuids in participants.items()}
+    all_xuids = {int(xuid) for xuids in match_ids.values() for xuid in xuids}
+    async with write_session() as session:
+        await session.execute(_match_validity_upsert(), _match_validity_rows(validity))
+
+        results = await session.exec(select(CustomMatch.match_id, CustomMatch.id).where(CustomMatch.match_id.in_(match_ids)))
+        match_pks = dict(results.all())
+        results = await session.exec(select(CustomPlayer.xuid, CustomPlayer.id).where(CustomPlayer.xuid.in_(all_xuids)))
+        player_pks = dict(results.all())
+
+        links = [
+            {"custom_match_id": match_pks[match_id], "custom_player_id": player_pks[int(xuid)]}
+            for match_id, xuids in match_ids.items()
+            for xuid in set(xuids)
+            if int(xuid) in player_pks
+        ]
+        if links:
+            statement = sqlite_insert(LinkTable).on_conflict_do_nothing()
+            await session.execute(statement, links)
+        await session.commit()
+
+
+async def mark_player_ingested(xuid, ingested_at):
+    async with write_session() as session:
+        statement = update(CustomPlayer).where(CustomPlayer.xuid == xuid).values(last_ingested=ingested_at)
+        await session.execute(statement)
+        await session.commit()
@@ -0,0 +1,199 @@
+"""Versioned, in-place schema migrations for the SQLite database.
+
+The schema version is kept in SQLite's ``PRAGMA user_version``.  On startup
+:func:`migrate` reads it and applies only the migrations above it, in order
+and in one transaction, so an up-to-date database costs a version read
+(plus a quick look at its columns, below) and keeps its data (players,
+wait-time history, API caches) across restarts.
+
+Each migration is plain DDL written for the schema as it was at that
+version; never edit a released one.  To change a model, add a migration
+at the end of :data:`MIGRATIONS` that brings the previous version's tables
+to the new shape.  On every start the database is compared with the
+models and any missing table or column is logged, which catches a
+forgotten migration.
+"""
+
+import logging
+from typing import NamedTuple
+
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    statements: tuple[str, ...]
+
+
+# Tables created by the drop-and-recreate startup that preceded versioning
+_UNVERSIONED_TABLES = (
+    "linktable", "channel", "custommatch", "customplayer", "discoveryassetrecord", "filmhighlightsrecord",
+    "matchskillrecord", "matchstatsrecord", "playlistcategory", "playlistinfo", "playlistwaittimerecord",
+)
+
+MIGRATIONS: tuple[Migration, ...] = (
+    Migration(1, "baseline schema", (
+        # The old startup wiped these on every restart; do it one last time
+        *(f"DROP TABLE IF EXISTS {table}" for table in _UNVERSIONED_TABLES),
+        """CREATE TABLE channel (
+            id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            log_channel_id INTEGER,
+            leaderboard_channel_id INTEGER,
+            PRIMARY KEY (id),
+            UNIQUE (guild_id)
+        )""",
+        """CREATE TABLE custommatch (
+            id INTEGER NOT NULL,
+            match_id CHAR(32) NOT NULL,
+            is_valid BOOLEAN NOT NULL,
+            PRIMARY KEY (id),
+            UNIQUE (match_id)
+        )""",
+        "CREATE INDEX ix_custommatch_is_valid ON custommatch (is_valid)",
+        """CREATE TABLE customplayer (
+            id INTEGER NOT NULL,
+            gamertag VARCHAR NOT NULL,
+            xuid INTEGER NOT NULL,
+            is_valid BOOLEAN NOT NULL,
+            validation_message BOOLEAN NOT NULL,
+            last_refreshed DATETIME,
+            last_ingested DATETIME,
+            PRIMARY KEY (id),
+            UNIQUE (xuid)
+        )""",
+        """CREATE TABLE linktable (
+            custom_match_id INTEGER NOT NULL,
+            custom_player_id INTEGER NOT NULL,
+            PRIMARY KEY (custom_match_id, custom_player_id),
+            FOREIGN KEY(custom_match_id) REFERENCES custommatch (id),
+            FOREIGN KEY(custom_player_id) REFERENCES customplayer (id)
+        )""",
+        """CREATE TABLE discoveryassetrecord (
+            asset_type VARCHAR NOT NULL,
+            asset_id VARCHAR NOT NULL,
+            version_id VARCHAR NOT NULL,
+            data BLOB,
+            stored_at DATETIME NOT NULL,
+            PRIMARY KEY (asset_type, asset_id, version_id)
+        )""",
+        """CREATE TABLE filmhighlightsrecord (
+            match_id VARCHAR NOT NULL,
+            data BLOB NOT NULL,
+            stored_at DATETIME NOT NULL,
+            PRIMARY KEY (match_id)
+        )""",
+        """CREATE TABLE matchskillrecord (
+            match_id VARCHAR NOT NULL,
+            data BLOB NOT NULL,
+            stored_at DATETIME NOT NULL,
+            PRIMARY KEY (match_id)
+        )""",
+        """CREATE TABLE matchstatsrecord (
+            match_id VARCHAR NOT NULL,
+            data BLOB NOT NULL,
+            stored_at DATETIME NOT NULL,
+            PRIMARY KEY (match_id)
+        )""",
+        """CREATE TABLE playlistcategory (
+            asset_id VARCHAR NOT NULL,
+            category VARCHAR NOT NULL,
+            playlist_name VARCHAR,
+            classified_at DATETIME NOT NULL,
+            PRIMARY KEY (asset_id)
+        )""",
+        """CREATE TABLE playlistinfo (
+            asset_id VARCHAR NOT NULL,
+            version_id VARCHAR NOT NULL,
+            playlist_name VARCHAR,
+            last_seen DATETIME NOT NULL,
+            PRIMARY KEY (asset_id)
+        )""",
+        """CREATE TABLE playlistwaittimerecord (
+            id INTEGER NOT NULL,
+            asset_id VARCHAR NOT NULL,
+            version_id VARCHAR NOT NULL,
+            playlist_name VARCHAR,
+            wait_time_ms INTEGER NOT NULL,
+            recorded_at DATETIME NOT NULL,
+            PRIMARY KEY (id)
+        )""",
+        "CREATE INDEX ix_playlistwaittimerecord_recorded_at ON playlistwaittimerecord (recorded_at)",
+        "CREATE INDEX ix_playlistwaittimerecord_asset_id ON playlistwaittimerecord (asset_id)",
+    )),
+    Migration(2, "latest wait time per playlist", (
+        """CREATE TABLE latestwaittime (
+            asset_id VARCHAR NOT NULL,
+            version_id VARCHAR NOT NULL,
+            playlist_name VARCHAR,
+            wait_time_ms INTEGER NOT NULL,
+            recorded_at DATETIME NOT NULL,
+            PRIMARY KEY (asset_id)
+        )""",
+        """INSERT INTO latestwaittime (asset_id, version_id, playlist_name, wait_time_ms, recorded_at)
+        SELECT asset_id, version_id, playlist_name, wait_time_ms, recorded_at FROM (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY asset_id ORDER BY recorded_at DESC, id DESC) AS newest
+            FROM playlistwaittimerecord
+        ) WHERE newest = 1""",
+    )),
+    Migration(3, "playlist categories per version", (
+        # Rows without a version cannot be trusted for any version; they are reclassified on demand
+        "DROP TABLE playlistcategory",
+        """CREATE TABLE playlistcategory (
+            asset_id VARCHAR NOT NULL,
+            version_id VARCHAR NOT NULL,
+            category VARCHAR NOT NULL,
+            playlist_name VARCHAR,
+            classified_at DATETIME NOT NULL,
+            PRIMARY KEY (asset_id, version_id)
+        )""",
+    )),
+)
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def schema_version(connection: Connection) -> int:
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def _check_models(connection: Connection, metadata: MetaData) -> None:
+    inspector = inspect(connection)
+    tables = set(inspector.get_table_names())
+    for table in metadata.sorted_tables:
+        if table.name not in tables:
+            logger.error("Table %s is missing from the database; add a migration", table.name)
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        missing = [column.name for column in table.columns if column.name not in columns]
+        if missing:
+            logger.error("Table %s is missing columns %s; add a migration", table.name, ", ".join(missing))
+
+
+def migrate(connection: Connection, metadata: MetaData) -> int:
+    """Bring the database up to :data:`LATEST_VERSION`; return the version it was at.
+
+    Run it inside ``engine.begin()``: pending migrations are applied in
+    one transaction, so a failed one leaves the previous version intact.
+    """
+    current = schema_version(connection)
+    if current > LATEST_VERSION:
+        raise RuntimeError(f"Database schema version {current} is newer than this code ({LATEST_VERSION})")
+
+    pending = [migration for migration in MIGRATIONS if migration.version > current]
+    if pending:
+        # pysqlite runs DDL outside of a transaction; a savepoint makes SQLite open one
+        connection.exec_driver_sql("SAVEPOINT migrate")
+        for migration in pending:
+            logger.info("Migrating database to version %d: %s", migration.version, migration.description)
+            for statement in migration.statements:
+                connection.execute(text(statement))
+            connection.exec_driver_sql(f"PRAGMA user_version = {migration.version}")
+        connection.exec_driver_sql("RELEASE SAVEPOINT migrate")
+
+    _check_models(connection, metadata)
+    return current
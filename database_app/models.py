@@ -1,3 +1,4 @@
+from datetime import datetime
 from email.policy import default
 from typing import List, Optional
 import uuid
@@ -15,7 +16,7 @@ class CustomMatch(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     match_id: uuid.UUID = Field(unique=True, default_factory=uuid.uuid4)
     players: List["CustomPlayer"] = Relationship(back_populates="custom_matches", link_model=LinkTable, sa_relationship_kwargs={"lazy": "joined"},)
-    is_valid: bool = False
+    is_valid: bool = Field(default=False, index=True)
 
 
 class CustomPlayer(SQLModel, table=True):
@@ -25,6 +26,9 @@ class CustomPlayer(SQLModel, table=True):
     custom_matches: List[CustomMatch] = Relationship(back_populates="players", link_model=LinkTable, sa_relationship_kwargs={"lazy": "joined"},)
     is_valid: bool = False
     validation_message: bool = False
+    last_refreshed: Optional[datetime] = Field(default=None)
+    # Set once the ingestion crawler has backfilled this player's history
+    last_ingested: Optional[datetime] = Field(default=None)
 
 
 class Channel(SQLModel, table=True):
@@ -32,4 +36,40 @@ class Channel(SQLModel, table=True):
     guild_id: int = Field(unique=True)
     log_channel_id: Optional[int] = Field(default=None)
     leaderboard_channel_id: Optional[int] = Field(default=None)
-    
+
+
+class MatchStatsRecord(SQLModel, table=True):
+    """Raw MatchStats JSON for a finished match, zlib-compressed. Never updated."""
+
+    match_id: str = Field(primary_key=True)
+    data: bytes
+    stored_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class DiscoveryAssetRecord(SQLModel, table=True):
+    """Raw discovery UGC asset JSON for one immutable ``(asset_id, version_id)``.
+
+    ``data`` is zlib-compressed JSON, or ``None`` when the API answered 404.
+    """
+
+    asset_type: str = Field(primary_key=True)
+    asset_id: str = Field(primary_key=True)
+    version_id: str = Field(primary_key=True)
+    data: Optional[bytes] = Field(default=None)
+    stored_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class FilmHighlightsRecord(SQLModel, table=True):
+    """Parsed film highlight events of a match, as zlib-compressed JSON rows."""
+
+    match_id: str = Field(primary_key=True)
+    data: bytes
+    stored_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class MatchSkillRecord(SQLModel, table=True):
+    """Raw MatchSkill JSON for a match's human players, zlib-compressed."""
+
+    match_id: str = Field(primary_key=True)
+    data: bytes
+    stored_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,4 +1,4 @@
-import time
+import io
 from datetime import datetime, timezone
 from typing import Optional
 
@@ -7,6 +7,7 @@ from discord import Interaction
 from discord.ext.pages import Page, Paginator
 from spnkr.tools import LIFECYCLE_MAP
 
+from app import http_pool, metrics
 from database_app.database import engine_start
 from discord_app.embeds import (
     create_match_info,
@@ -15,10 +16,26 @@ from discord_app.embeds import (
     create_series_info,
 )
 from discord_app.lobby import fetch_playlist_wait_times
-from spnkr_app import fetch_player_match_data, fetch_player_match_skills, get_client, get_xbl_profiles
+from spnkr_app import fetch_player_match_data, fetch_rank_bundle, match_ingestor, token_manager
+from spnkr_app.shared_client import shared_client
+from spnkr_app.tiers import estimate_match_skills
 import wait_times_app
 
-bot = discord.Bot()
+
+class HaloBot(discord.Bot):
+    async def close(self) -> None:
+        """Close the Discord connection, then every pooled HTTP connection."""
+        try:
+            await super().close()
+        finally:
+            await match_ingestor.stop()
+            await token_manager.stop()
+            await shared_client.close()
+            await metrics.stop_dump()
+            await http_pool.close()
+
+
+bot = HaloBot()
 
 
 class PublishView(discord.ui.View):
@@ -48,6 +65,9 @@ class PublishView(discord.ui.View):
 async def startup():
     print(f"Bot is up and running: {bot.user.name} - {bot.user.id}")
     await engine_start()
+    token_manager.start()
+    metrics.start_dump()
+    match_ingestor.start()
 
 
 @bot.command(description="Hae pelaajan ranked-suoritus")
@@ -55,28 +75,25 @@ async def rank(ctx, gamertag: str) -> None:
     """Näytä pelaajan CSR-eteneminen ja viimeiset ranked-matsit."""
     await ctx.defer(ephemeral=True)
     try:
-        async with get_client() as client:
-            profile = await get_xbl_profiles(client, gamertag)
-            if not profile:
+        with metrics.command("rank"):
+            bundle = await fetch_rank_bundle(gamertag, count=20)
+            if bundle is None:
                 await ctx.followup.send(f"Virhe: Pelaajaa '{gamertag}' ei löydy", ephemeral=True)
                 return
-            start_time = time.time()
-            match_skills = await fetch_player_match_skills(profile[0].gamertag, count=20)
-            end_time = time.time()
-            print("match_skills took %f ms" % ((end_time - start_time) * 1000.0))
             pages = []
-            xuids = []
-            embed, image = await create_rank_embed(profile[0], match_skills)
+            with metrics.RENDER_SECONDS.time(view="rank_summary"):
+                # One pass over every player of every match, shared by all pages
+                estimates = estimate_match_skills(bundle.match_skills)
+                embed, image = await create_rank_embed(bundle.player, bundle.match_skills, estimates=estimates)
             await ctx.followup.send(file=discord.File(image, "csr_graph.png"), ephemeral=True)
             summary_page = Page(embeds=[embed])
             pages.append(summary_page)
-            for match_skill in match_skills:
-                for value in match_skill.value:
-                    xuids.append(value.id)
-            profiles = await get_xbl_profiles(client, xuids)
-            for i, match_skill in enumerate(match_skills):
-                match_embed = await create_match_skill_embed(profiles, match_skill)
-                _, match_image = await create_rank_embed(profile[0], match_skills, highlight_index=i)
+            for i, match_skill in enumerate(bundle.match_skills):
+                with metrics.RENDER_SECONDS.time(view="rank_match"):
+                    match_embed = await create_match_skill_embed(bundle.profiles, match_skill, estimates[i])
+                    _, match_image = await create_rank_embed(
+                        bundle.player, bundle.match_skills, highlight_index=i, estimates=estimates
+                    )
                 filename = f"csr_graph_match_{i + 1}.png"
                 match_embed.set_image(url=f"attachment://{filename}")
                 page = Page(embeds=[match_embed], files=[discord.File(match_image, filename)])
@@ -181,24 +198,27 @@ class MatchSelect(discord.ui.Select):
 
     async def callback(self, interaction: Interaction):
         await interaction.response.defer()
-        pages = []
-        files = []
-        match_ids = self.values
-        selected_matches = [match for match in self.match_history if f"{match.match_stats.match_id}" in match_ids]
-        embed, file = await create_series_info(selected_matches)
-        series_page = Page(embeds=[embed], files=file)
-        pages.append(series_page)
-        files.append(file)
-        for match in selected_matches:
-            match_embed, file = await create_match_info(match)
-            page = Page(embeds=[match_embed], files=file)
-            pages.append(page)
+        with metrics.command("series_select"):
+            pages = []
+            files = []
+            match_ids = self.values
+            selected_matches = [match for match in self.match_history if f"{match.match_stats.match_id}" in match_ids]
+            with metrics.RENDER_SECONDS.time(view="series_info"):
+                embed, file = await create_series_info(selected_matches)
+            series_page = Page(embeds=[embed], files=file)
+            pages.append(series_page)
             files.append(file)
-        custom_view = PublishView()
-        paginator = SeriesPaginator(pages=pages)
-        custom_view.add_paginator(paginator)
-        paginator.custom_view = custom_view
-        await paginator.respond(interaction, ephemeral=True)
+            for match in selected_matches:
+                with metrics.RENDER_SECONDS.time(view="match_info"):
+                    match_embed, file = await create_match_info(match)
+                page = Page(embeds=[match_embed], files=file)
+                pages.append(page)
+                files.append(file)
+            custom_view = PublishView()
+            paginator = SeriesPaginator(pages=pages)
+            custom_view.add_paginator(paginator)
+            paginator.custom_view = custom_view
+            await paginator.respond(interaction, ephemeral=True)
 
 
 class SeriesView(discord.ui.View):
@@ -213,17 +233,29 @@ class SeriesView(discord.ui.View):
             await self.message.edit(delete_after=0)
 
 
+@bot.command(name="metrics", description="Näytä botin suorituskykymittarit")
+@discord.default_permissions(administrator=True)
+async def metrics_command(ctx) -> None:
+    """Näytä kerätyt mittarit tiivistelmänä ja Prometheus-tiedostona."""
+    summary = "\n".join(metrics.summary()) or "Ei mittauksia vielä"
+    if len(summary) > 1900:
+        summary = summary[:1900] + "\n…"
+    prometheus = io.BytesIO(metrics.render().encode())
+    await ctx.respond(f"```\n{summary}\n```", file=discord.File(prometheus, "metrics.prom"), ephemeral=True)
+
+
 @bot.command(description="Luo yhteenveto pelatuista matseista")
 async def make_series(ctx, gamertag: str, count: Optional[int] = 25, start: Optional[int] = 0, match_type: str = "all") -> None:
     """Hae pelaajan matsit ja luo niistä sarjayhteenveto valintanäkymällä."""
     await ctx.defer(ephemeral=True)
     try:
-        match_history = await fetch_player_match_data(gamertag, start=start, count=count, match_type=match_type)
-        if not match_history:
-            await ctx.followup.send("Virhe: Matseja ei löydy annetuilla hakuehdoilla", ephemeral=True)
-            return
-        select = MatchSelect(match_history)
-        await ctx.followup.send(view=SeriesView(select), ephemeral=True)
+        with metrics.command("make_series"):
+            match_history = await fetch_player_match_data(gamertag, start=start, count=count, match_type=match_type)
+            if not match_history:
+                await ctx.followup.send("Virhe: Matseja ei löydy annetuilla hakuehdoilla", ephemeral=True)
+                return
+            select = MatchSelect(match_history)
+            await ctx.followup.send(view=SeriesView(select), ephemeral=True)
     except Exception as e:
         print(f"Virhe make_series-komennossa: {e}")
         await ctx.followup.send("Virhe: Matsien hakeminen epäonnistui", ephemeral=True)
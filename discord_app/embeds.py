@@ -4,14 +4,13 @@ from collections import defaultdict
 from typing import List, Optional
 
 import matplotlib.pyplot as plt
-from aiohttp import ClientSession
 from discord import Embed, File
-from spnkr.models.skill import Counterfactual
 from spnkr.tools import BOT_MAP, LIFECYCLE_MAP, OUTCOME_MAP, TEAM_MAP, unwrap_xuid
 from spnkr.xuid import wrap_xuid
 
+from app import http_pool
 from spnkr_app import Match
-from spnkr_app.tools import estimate_tier
+from spnkr_app.tiers import TierEstimate, estimate_match_skills
 
 # Discord dark-theme colour palette used for matplotlib graphs
 DISCORD_COLORS = {
@@ -50,15 +49,26 @@ def _save_figure_to_buffer() -> io.BytesIO:
     return buf
 
 
+async def _image_missing(session, url: str) -> bool:
+    """Return whether *url* answers 404; any other status keeps the image."""
+    # HEAD keeps the pooled connection reusable; an unread GET body would close it
+    async with session.head(url) as response:
+        if response.status not in (403, 405):
+            return response.status == 404
+    # The CDN rejects HEAD: GET, and drain the body before releasing the connection
+    async with session.get(url) as response:
+        await response.read()
+        response.release()
+        return response.status == 404
+
+
 async def get_map_image(map_asset) -> str:
-    async with ClientSession() as session:
-        map_image_url = map_asset.files.prefix + "images/thumbnail.jpg"
-        async with session.get(map_image_url) as response:
-            if response.status == 404:
-                map_image_url = map_asset.files.prefix + "images/thumbnail.png"
-                async with session.get(map_image_url) as response2:
-                    if response2.status == 404:
-                        map_image_url = "https://img.freepik.com/premium-vector/default-image-icon-vector-missing-picture-page-website-design-mobile-app-no-photo-available_87543-11093.jpg"
+    session = http_pool.get_session()
+    map_image_url = map_asset.files.prefix + "images/thumbnail.jpg"
+    if await _image_missing(session, map_image_url):
+        map_image_url = map_asset.files.prefix + "images/thumbnail.png"
+        if await _image_missing(session, map_image_url):
+            map_image_url = "https://img.freepik.com/premium-vector/default-image-icon-vector-missing-picture-page-website-design-mobile-app-no-photo-available_87543-11093.jpg"
 
     return map_image_url
 
@@ -439,68 +449,7 @@ async def create_series_info(match_history: List[Match]):
     return series_embed, files
 
 
-async def find_closest_rank(counterfactuals, tier_counterfactuals):
-    def closest_by_stat(stat: str):
-        return min(
-            tier_counterfactuals,
-            key=lambda rank: abs(getattr(counterfactuals, stat) - getattr(tier_counterfactuals[rank], stat))
-        )
-
-    closest_kills = closest_by_stat("kills")
-    closest_deaths = closest_by_stat("deaths")
-
-    return closest_kills, closest_deaths
-
-
-def get_performance_rating(estimated_tier, performance_tier):
-    try:
-        est = float(estimated_tier)
-        perf = float(performance_tier)
-        
-        # Prevent division by zero just in case
-        if est <= 0:
-            est = 1.0 
-            
-        # Calculate how much they over/underperformed as a percentage
-        percent_diff = ((perf - est) / est) * 100
-        
-    except (ValueError, TypeError):
-        return "?"
-
-    # 20% over/under performance used as the extreme bounds
-    if percent_diff >= 20.0:
-        return "SSS"
-    elif percent_diff >= 15.0:
-        return "SS"
-    elif percent_diff >= 10.0:
-        return "S"
-    elif percent_diff >= 5.0:
-        return "A++"
-    elif percent_diff > 0.0:
-        return "A+"
-    elif percent_diff == 0.0:
-        return "A"
-    elif percent_diff >= -2.5:
-        return "A-"
-    elif percent_diff >= -5.0:
-        return "B+"
-    elif percent_diff >= -7.5:
-        return "B"
-    elif percent_diff >= -10.0:
-        return "B-"
-    elif percent_diff >= -12.5:
-        return "C+"
-    elif percent_diff >= -15.0:
-        return "C"
-    elif percent_diff >= -17.5:
-        return "C-"
-    elif percent_diff >= -20.0:
-        return "D"
-    else:
-        return "F"
-
-
-async def create_match_skill_embed(profiles, match_skill):
+async def create_match_skill_embed(profiles, match_skill, estimates: Optional[dict[str, TierEstimate]] = None):
     match_embed = Embed(title="Match Skill Breakdown")
     match_embed.description = "```Legend: first value is the actual value player got in-game and value in brackets is what they were expected to get```"
     match_embed.set_footer(
@@ -508,6 +457,9 @@ async def create_match_skill_embed(profiles, match_skill):
         icon_url="https://halofin.land/HaloFinland.png",
     )
 
+    if estimates is None:
+        estimates = estimate_match_skills([match_skill])[0]
+
     current_team_id = None
     for player in sorted(match_skill.value, key=lambda p: p.result.team_id):
         team_id = player.result.team_id
@@ -520,8 +472,12 @@ async def create_match_skill_embed(profiles, match_skill):
         profile = next((item for item in profiles if wrap_xuid(item.xuid) == player.id), None)
         gamertag = profile.gamertag if profile else str(player.id)
 
+        estimate = estimates.get(player.id)
+        if estimate is None:
+            match_embed.add_field(name=gamertag, value="No skill data", inline=False)
+            continue
+
         self_counterfactuals = player.result.counterfactuals.self_counterfactuals
-        tier_counterfactuals = player.result.counterfactuals.tier_counterfactuals
         rank_recap = player.result.rank_recap
 
         actual_kills = player.result.stat_performances.kills.count
@@ -531,20 +487,12 @@ async def create_match_skill_embed(profiles, match_skill):
         exp_kills = round(self_counterfactuals.kills, 1)
         exp_deaths = round(self_counterfactuals.deaths, 1)
 
-        estimated_tier = await estimate_tier(self_counterfactuals, tier_counterfactuals)
-        performance_tier = await estimate_tier(
-            Counterfactual(kills=actual_kills, deaths=actual_deaths), tier_counterfactuals
-        )
-        
-        # --- Fetch the performance rating using the new percentage scaling ---
-        rating = get_performance_rating(estimated_tier, performance_tier)
+        estimated_tier = estimate.expected_tier
+        performance_tier = estimate.performance_tier
+        rating = estimate.rating
 
-        exp_kills_rank, exp_deaths_rank = await find_closest_rank(
-            self_counterfactuals, tier_counterfactuals
-        )
-        act_kills_rank, act_deaths_rank = await find_closest_rank(
-            Counterfactual(kills=actual_kills, deaths=actual_deaths), tier_counterfactuals
-        )
+        exp_kills_rank, exp_deaths_rank = estimate.expected_kills_rank, estimate.expected_deaths_rank
+        act_kills_rank, act_deaths_rank = estimate.kills_rank, estimate.deaths_rank
 
         current_csr = rank_recap.pre_match_csr.value
 
@@ -559,7 +507,12 @@ async def create_match_skill_embed(profiles, match_skill):
     return match_embed
 
 
-async def create_rank_embed(player, match_skills, highlight_index: int | None = None):
+async def create_rank_embed(
+    player,
+    match_skills,
+    highlight_index: int | None = None,
+    estimates: Optional[list[dict[str, TierEstimate]]] = None,
+):
     wrapped_xuid = wrap_xuid(player.xuid)
 
     # Collect per-match data for the player
@@ -600,16 +553,16 @@ async def create_rank_embed(player, match_skills, highlight_index: int | None =
     avg_kd = total_kills / total_deaths if total_deaths > 0 else float(total_kills)
 
     # Estimate hidden MMR from the most recent match skill entry
-    hidden_mmr = None
-    for match_skill in match_skills:
-        for player_skill in match_skill.value:
-            if player_skill.id == wrapped_xuid:
-                self_cf = player_skill.result.counterfactuals.self_counterfactuals
-                tier_cf = player_skill.result.counterfactuals.tier_counterfactuals
-                hidden_mmr = await estimate_tier(self_cf, tier_cf)
-                break
-        if hidden_mmr is not None:
-            break
+    if estimates is None:
+        estimates = estimate_match_skills(match_skills)
+    hidden_mmr = next(
+        (
+            match_estimates[wrapped_xuid].expected_tier
+            for match_estimates in estimates
+            if wrapped_xuid in match_estimates and match_estimates[wrapped_xuid].expected_tier is not None
+        ),
+        None,
+    )
 
     trend_str = ""
     if csr_trend is not None:
@@ -4,6 +4,7 @@ Thin wrapper around :mod:`app.amqp_service` that resolves playlist asset IDs
 to human-readable names and returns a ``{"playlist_name": wait_time_ms}`` dict.
 """
 
+import asyncio
 import logging
 from typing import Optional
 
@@ -13,49 +14,41 @@ from app.amqp_service import fetch_raw_playlist_entries
 logger = logging.getLogger(__name__)
 
 
+async def _playlist_name(client, entry: dict) -> str:
+    asset_id = entry["asset_id"]
+    try:
+        playlist = await spnkr_app.asset_cache.get(client, "playlists", asset_id, entry["version_id"])
+        return getattr(playlist, "public_name", None) or asset_id
+    except Exception as exc:
+        logger.warning("Could not resolve name for %s: %s", asset_id, exc)
+        return asset_id
+
+
 async def fetch_playlist_wait_times() -> Optional[dict[str, int]]:
     """Fetch playlist wait times live from the Halo Infinite Lobby WebSocket.
 
-    Tokens are read from *spnkr_app.player_cache*.  Playlist asset IDs are
-    resolved to human-readable names via the spnkr discovery API.
+    Tokens come from *spnkr_app.token_manager*.  Playlist asset IDs are
+    resolved to human-readable names via *spnkr_app.asset_cache*.
 
     Returns:
         ``{"playlist_name": wait_time_ms, ...}`` or ``None`` on failure.
     """
     try:
-        async with spnkr_app.get_client():
-            pass
+        spartan_token, clearance_token = await spnkr_app.get_lobby_tokens()
     except Exception as exc:
         logger.error("Token refresh failed: %s", exc)
         return None
 
-    if spnkr_app.player_cache is None or not spnkr_app.player_cache.is_valid:
-        logger.error("No valid player tokens available")
-        return None
-
-    spartan_token = spnkr_app.player_cache.spartan_token.token
-    clearance_token = spnkr_app.player_cache.clearance_token.token
-
     entries = await fetch_raw_playlist_entries(spartan_token, clearance_token)
     if not entries:
         logger.warning("No playlist entries received from lobby WebSocket")
         return None
 
     logger.info("Resolving names for %d playlist(s)", len(entries))
-    wait_times: dict[str, int] = {}
     try:
         async with spnkr_app.get_client() as client:
-            for entry in entries:
-                asset_id = entry["asset_id"]
-                version_id = entry["version_id"]
-                try:
-                    resp = await client.discovery_ugc.get_playlist(asset_id, version_id)
-                    playlist = await resp.parse()
-                    name = getattr(playlist, "public_name", None) or asset_id
-                except Exception as exc:
-                    logger.warning("Could not resolve name for %s: %s", asset_id, exc)
-                    name = asset_id
-                wait_times[name] = entry["wait_time_ms"]
+            names = await asyncio.gather(*(_playlist_name(client, entry) for entry in entries))
+        wait_times = {name: entry["wait_time_ms"] for name, entry in zip(names, entries)}
     except Exception as exc:
         logger.error("Failed to obtain spnkr client for name resolution: %s", exc)
         wait_times = {e["asset_id"]: e["wait_time_ms"] for e in entries}
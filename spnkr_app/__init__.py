@@ -1,48 +1,62 @@
 import asyncio
+import os
 from contextlib import asynccontextmanager
 
 from spnkr.models.skill import MatchSkill
 from spnkr.xuid import wrap_xuid
-from sqlalchemy.exc import IntegrityError
 
-from app.tokens import AZURE_CLIENT_ID, AZURE_CLIENT_SECRET, REDIRECT_URI, AZURE_REFRESH_TOKEN
-from aiohttp import ClientSession, ClientResponseError
-from spnkr import HaloInfiniteClient, AzureApp, refresh_player_tokens
+from app import http_pool
+from spnkr import HaloInfiniteClient
 from spnkr.models.stats import MatchStats
-from spnkr.models.discovery_ugc import Asset, Map, UgcGameVariant
+from spnkr.models.discovery_ugc import Asset, Map, Playlist, UgcGameVariant
 from spnkr.models.profile import User
 from typing import List, Optional
-from pydantic import BaseModel
-import time
-from database_app.database import get_player_by_xuid, add_custom_player
+from pydantic import BaseModel, ConfigDict
 from database_app.models import CustomPlayer
 from spnkr.tools import unwrap_xuid, BOT_MAP
-from spnkr.film import HighlightEvent, read_highlight_events
+from spnkr.film import HighlightEvent
+from spnkr_app import films, match_store, rate_limit, skill_store
+from spnkr_app.assets import AssetCache
+from spnkr_app.auth import token_manager
+from spnkr_app.history import paginate_match_history
+from spnkr_app.ingest import MatchIngestor
+from spnkr_app.match_view import MatchStatsView
+from spnkr_app.playlists import RANKED, PlaylistClassifier
+from spnkr_app.profiles import ProfileCache
 
 
 
-player_cache = None  # Global cache for the player instance
+profile_cache = ProfileCache()
+asset_cache = AssetCache()
+playlist_classifier = PlaylistClassifier(asset_cache)
+
+_RANK_FETCH_CONCURRENCY: int = int(os.environ.get("RANK_FETCH_CONCURRENCY", "8"))
 
 @asynccontextmanager
 async def get_client():
-    global player_cache
-    app = AzureApp(AZURE_CLIENT_ID, AZURE_CLIENT_SECRET, REDIRECT_URI)
+    spartan_token, clearance_token = await token_manager.get_tokens()
 
-    async with ClientSession() as session:
-        if player_cache is None or not player_cache.is_valid:
-            player_cache = await refresh_player_tokens(session, app, AZURE_REFRESH_TOKEN)
-            
+    # Own session for the client's auth headers, pooled connections underneath.
+    # Pacing is process-wide in rate_limit; spnkr's per-client limiter is only a backstop.
+    async with http_pool.new_session(trace_configs=[rate_limit.trace_config()]) as session:
         client = HaloInfiniteClient(
             session=session,
-            spartan_token=f"{player_cache.spartan_token.token}",
-            clearance_token=f"{player_cache.clearance_token.token}",
-            # Optional, default rate is 5.
-            requests_per_second=5,
+            spartan_token=spartan_token,
+            clearance_token=clearance_token,
+            requests_per_second=50,
         )
 
         yield client
 
 
+match_ingestor = MatchIngestor(get_client, profile_cache, asset_cache)
+
+
+async def get_lobby_tokens() -> tuple[str, str]:
+    """Return ``(spartan_token, clearance_token)`` for the lobby WebSocket."""
+    return await token_manager.get_tokens()
+
+
 class Match(BaseModel):
     match_stats: MatchStats
     players: List[User|CustomPlayer]
@@ -50,146 +64,49 @@ class Match(BaseModel):
     match_gamemode: Optional[Asset]
 
 
-async def add_xbl_profile_to_db(profile):
-    try:
-        db_player = await add_custom_player(profile)
-    except IntegrityError:
-        db_player = await get_player_by_xuid(profile.xuid)
-
-    return db_player
-
-
-async def get_xbl_profiles(client, xuids):
-    profiles = []
-    count = 0
-    for i in range(0, len(xuids), 100):
-        batch = xuids[i:i + 100]
-        if count == 10:
-            seconds = 300
-            print(f"Burst limit reached. Sleeping for {seconds} seconds")
-            await asyncio.sleep(seconds)
-            count = 0
-        try:
-            resp = await client.profile.get_users_by_id(batch)
-            batch_profiles = await resp.parse()
-        except ClientResponseError as e:
-            if e.status == 429:
-                seconds = 300
-                print(f"Burst limit reached. Sleeping for {seconds} seconds")
-                await asyncio.sleep(seconds)
-                resp = await client.profile.get_users_by_id(batch)
-                batch_profiles = await resp.parse()
-        except TypeError:
-            resp = await client.profile.get_user_by_gamertag(batch)
-            batch_profiles = [await resp.parse()]
-
+async def get_xbl_profiles(client, xuids) -> List[CustomPlayer]:
+    # A single string is a gamertag lookup
+    if isinstance(xuids, str):
+        player = await profile_cache.resolve_gamertag(client, xuids)
+        return [player] if player else []
 
-        profiles += batch_profiles
-        count += 1
-        await asyncio.sleep(1)
-
-    return profiles
+    return await profile_cache.get_profiles(client, xuids)
 
 
 async def get_match_stats(client: HaloInfiniteClient, match_id) -> MatchStats:
-    start = time.time()
-    resp = await client.stats.get_match_stats(match_id)
-    end = time.time()
-    print("Response Took %f ms" % ((end - start) * 1000.0))
-
-
-    start = time.time()
-    match_stats = await resp.parse()
-    end = time.time()
-    print("Pydantic Took %f ms" % ((end - start) * 1000.0))
-
-    return match_stats
-
+    return await match_store.get_match_stats(client, match_id)
 
-async def get_map_asset(client: HaloInfiniteClient, asset) -> Map:
-    try:
-        resp = await client.discovery_ugc.get_map(
-            asset.asset_id,
-            asset.version_id
-        )
-        asset = await resp.parse()
-    except ClientResponseError as e:
-        if e.status == 404:
-            asset = None
-
-    return asset
 
+async def get_map_asset(client: HaloInfiniteClient, asset) -> Optional[Map]:
+    return await asset_cache.get(client, "maps", asset.asset_id, asset.version_id)
 
-async def get_gamemode_asset(client: HaloInfiniteClient, asset) -> UgcGameVariant:
-    try:
-        resp = await client.discovery_ugc.get_ugc_game_variant(
-            asset.asset_id,
-            asset.version_id
-        )
-        asset = await resp.parse()
-    except ClientResponseError as e:
-        if e.status == 404:
-            asset = None
 
-    return asset
+async def get_gamemode_asset(client: HaloInfiniteClient, asset) -> Optional[UgcGameVariant]:
+    return await asset_cache.get(client, "ugcGameVariants", asset.asset_id, asset.version_id)
 
 
-async def get_playlist_asset(client: HaloInfiniteClient, asset) -> Asset:
-    try:
-        resp = await client.discovery_ugc.get_playlist(
-            asset.asset_id,
-            asset.version_id
-        )
-        asset = await resp.parse()
-    except ClientResponseError as e:
-        if e.status == 404:
-            asset = None
-
-    return asset
+async def get_playlist_asset(client: HaloInfiniteClient, asset) -> Optional[Playlist]:
+    return await asset_cache.get(client, "playlists", asset.asset_id, asset.version_id)
     
     
 async def fetch_film(client, match_id):
-    film_events = await read_highlight_events(client, match_id)
+    film_events = await films.get_highlight_events(client, match_id)
     return film_events
             
 
-async def get_ranked_match_result(client, match):
-    if match.match_info.playlist:
-        playlist = await get_playlist_asset(client, match.match_info.playlist)
-        if playlist and playlist.public_name == "Ranked Arena":
-            return match
-
-    return None
+async def get_ranked_matches(client, matches):
+    categories = await playlist_classifier.classify_many(client, [match.match_info.playlist for match in matches])
+    return [match for match, category in zip(matches, categories) if category == RANKED]
 
 
 async def get_match_history(client, player: str|int, start: int=0, count: int=25, match_type="all"):
-    looking_for_ranked = False
     if match_type == "ranked":
         # there is no way to look for just ranked type so we have to fetch all types and match the playlist id with ranked
-        match_type = "all"
-        looking_for_ranked = True
-    results = []
-
-    while len(results) < count:
-        response = await client.stats.get_match_history(player, start, count, match_type)
-        match_history = await response.parse()
-        if len(match_history.results) == 0:
-            return results
-
-        if looking_for_ranked:
-            async_tasks = []
-            for match in match_history.results:
-                task = get_ranked_match_result(client, match)
-                async_tasks.append(task)
-            ranked_matches = await asyncio.gather(*async_tasks)
-            results += [item for item in ranked_matches if item is not None]
-
-        else:
-            results += match_history.results
-
-        start += 25
+        return await paginate_match_history(
+            client, player, start, count, "all", page_filter=lambda page: get_ranked_matches(client, page)
+        )
 
-    return results[:count]
+    return await paginate_match_history(client, player, start, count, match_type)
 
 
 class BotPlayer(BaseModel):
@@ -198,11 +115,22 @@ class BotPlayer(BaseModel):
 
 
 class CustomMatch(BaseModel):
-    match_stats: MatchStats
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    # A MatchStatsView on the render paths; its .model is the full MatchStats
+    match_stats: MatchStats | MatchStatsView
     match_gamemode: Optional[UgcGameVariant]
     match_map: Optional[Map]
     players: Optional[List[CustomPlayer|BotPlayer]]
-    film: Optional[List[HighlightEvent]]
+    # Loaded on demand by load_film(); the embeds never need it
+    film: Optional[List[HighlightEvent]] = None
+
+    async def load_film(self) -> List[HighlightEvent]:
+        if self.film is None:
+            async with get_client() as client:
+                self.film = await fetch_film(client, self.match_stats.match_id)
+
+        return self.film
 
 
 async def create_custom_match(client, match_players, match_stats):
@@ -210,8 +138,7 @@ async def create_custom_match(client, match_players, match_stats):
     bots = [BotPlayer(gamertag=BOT_MAP[player.player_id], xuid=player.player_id) for player in match_stats.players if player.player_id not in [wrap_xuid(profile.xuid) for profile in profiles]]
     gamemode_asset = await get_gamemode_asset(client, match_stats.match_info.ugc_game_variant)
     map_asset = await get_map_asset(client, match_stats.match_info.map_variant)
-    film_asset = await fetch_film(client, match_stats.match_id)
-    custom_match = CustomMatch(match_stats=match_stats, match_gamemode=gamemode_asset, match_map=map_asset, players=profiles+bots, film=film_asset)
+    custom_match = CustomMatch(match_stats=match_stats, match_gamemode=gamemode_asset, match_map=map_asset, players=profiles+bots)
 
     return custom_match
 
@@ -219,19 +146,13 @@ async def create_custom_match(client, match_players, match_stats):
 async def fetch_player_match_data(gamertag: str|int, start=0, count=25, match_type="all"):
     async with get_client() as client:
         match_history = await get_match_history(client, gamertag, start, count, match_type)
-        async_tasks =[]
-        for match_history_result in match_history:
-            match_stats = get_match_stats(client, match_history_result.match_id)
-            async_tasks.append(match_stats)
-        match_results = await asyncio.gather(*async_tasks)
+        match_results = await match_store.get_match_stats_many(
+            client, [item.match_id for item in match_history], view=True
+        )
         xuids = []
         for match_stats in match_results:
             xuids += match_stats.xuids
-        xbl_profiles = await get_xbl_profiles(client, list(set(xuids)))
-        async_tasks = []
-        for profile in xbl_profiles:
-            async_tasks.append(asyncio.create_task(add_xbl_profile_to_db(profile)))
-        match_players = await asyncio.gather(*async_tasks)
+        match_players = await get_xbl_profiles(client, xuids)
 
         tasks = []
         for match_stats in match_results:
@@ -243,32 +164,53 @@ async def fetch_player_match_data(gamertag: str|int, start=0, count=25, match_ty
 
 
 async def get_match_skills(client, match_id, xuids):
-    try:
-        resp = await client.skill.get_match_skill(match_id, xuids)
-        match_skill = await resp.parse()
-        return match_skill
-    except ClientResponseError as e:
-        if e.status == 404:
-            return None
-        else:
-            raise e
+    return await skill_store.get_match_skill(client, match_id, xuids)
+
+
+async def get_match_skills_pipelined(client, match_history) -> List[MatchSkill]:
+    """Fetch skills for *match_history*, starting each match's skill request as soon as its stats are known."""
+    match_ids = [item.match_id for item in match_history]
+    stored_skills = await skill_store.get_stored_match_skills(match_ids)
+    # Stats are only needed for the participant XUIDs of matches without a stored skill
+    missing = [match_id for match_id, match_skill in zip(match_ids, stored_skills) if match_skill is None]
+    stored_stats = dict(zip(missing, await match_store.get_stored_match_stats(missing, view=True)))
+    semaphore = asyncio.Semaphore(_RANK_FETCH_CONCURRENCY)
+
+    async def fetch_one(match_id, match_skill):
+        if match_skill is not None:
+            return match_skill
+        async with semaphore:
+            match_stats = stored_stats[match_id]
+            if match_stats is None:
+                match_stats = await match_store.fetch_match_stats(client, match_id, view=True)
+            return await skill_store.fetch_match_skill(client, match_id, match_stats.xuids)
+
+    match_skills = await asyncio.gather(*(fetch_one(*item) for item in zip(match_ids, stored_skills)))
+    return [item for item in match_skills if item is not None]
 
 
 async def fetch_player_match_skills(gamertag: str|int, start=0, count=25, match_type="ranked") -> List[MatchSkill]:
     async with get_client() as client:
-        start_time = time.time()
         match_history = await get_match_history(client, gamertag, start, count, match_type)
-        end_time = time.time()
-        print("match_history took %f ms" % ((end_time - start_time) * 1000.0))
-        profile = await get_xbl_profiles(client, gamertag)
-        skill_tasks = []
-        for match_history_result in match_history:
-            match_stats = await get_match_stats(client, match_history_result.match_id)
-            match_skill = get_match_skills(client, match_history_result.match_id, match_stats.xuids)
+        return await get_match_skills_pipelined(client, match_history)
+
+
+class RankBundle(BaseModel):
+    player: CustomPlayer
+    match_skills: List[MatchSkill]
+    profiles: List[CustomPlayer]
 
-            skill_tasks.append(match_skill)
-        match_skills = await asyncio.gather(*skill_tasks)
-        match_skills = [item for item in match_skills if item is not None]
 
-        return match_skills
+async def fetch_rank_bundle(gamertag: str, count=20) -> Optional[RankBundle]:
+    """Everything /rank renders: the player, their ranked match skills and all participants' profiles."""
+    async with get_client() as client:
+        players = await get_xbl_profiles(client, gamertag)
+        if not players:
+            return None
+        player = players[0]
+        match_history = await get_match_history(client, player.xuid, count=count, match_type="ranked")
+        match_skills = await get_match_skills_pipelined(client, match_history)
+        xuids = [value.id for match_skill in match_skills for value in match_skill.value]
+        profiles = await get_xbl_profiles(client, xuids)
 
+        return RankBundle(player=player, match_skills=match_skills, profiles=profiles)
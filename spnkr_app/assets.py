@@ -0,0 +1,130 @@
+"""Cache of discovery UGC assets (maps, game variants, playlists).
+
+An asset's content is immutable for a given ``(asset_id, version_id)``, so
+each one is fetched at most once.  Lookups go through an in-memory LRU of
+parsed models, then the ``DiscoveryAssetRecord`` table, and only then the
+discovery service.  Concurrent lookups of the same asset share one
+in-flight request, so 25 matches on the same map cost a single call.
+
+A 404 is cached too (as ``None``), but only for ``ASSET_CACHE_NEGATIVE_TTL``
+seconds, since an asset may simply not be published yet.
+
+Environment variables
+---------------------
+ASSET_CACHE_SIZE          Parsed assets kept in memory (default: 1000).
+ASSET_CACHE_NEGATIVE_TTL  Seconds to remember a 404 (default: 3600).
+"""
+
+import json
+import logging
+import os
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Optional
+from uuid import UUID
+
+from aiohttp import ClientResponseError
+from spnkr import HaloInfiniteClient
+from spnkr.models.discovery_ugc import Map, Playlist, UgcGameVariant
+
+from app import metrics
+from database_app.database import get_discovery_asset, save_discovery_asset
+from spnkr_app import rate_limit
+from spnkr_app.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+_SIZE: int = int(os.environ.get("ASSET_CACHE_SIZE", "1000"))
+_NEGATIVE_TTL: int = int(os.environ.get("ASSET_CACHE_NEGATIVE_TTL", "3600"))
+
+# asset type (discovery URL segment): (DiscoveryUgcService method, model)
+_ASSET_TYPES: dict[str, tuple[str, type]] = {
+    "maps": ("get_map", Map),
+    "ugcGameVariants": ("get_ugc_game_variant", UgcGameVariant),
+    "playlists": ("get_playlist", Playlist),
+}
+
+_Key = tuple[str, str, str]
+
+
+class AssetCache:
+    """Two-tier cache of parsed discovery assets with shared in-flight lookups."""
+
+    def __init__(self, size: int = _SIZE, negative_ttl: int = _NEGATIVE_TTL) -> None:
+        self._size = size
+        self._negative_ttl = timedelta(seconds=negative_ttl)
+        # None values are 404s, stored with the time they were seen
+        self._memory: OrderedDict[_Key, tuple[Optional[Any], datetime]] = OrderedDict()
+        self._in_flight = SingleFlight("discovery asset")
+
+    def _remember(self, key: _Key, asset: Optional[Any], stored_at: datetime) -> None:
+        self._memory[key] = (asset, stored_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._size:
+            self._memory.popitem(last=False)
+
+    def _negative_expired(self, stored_at: datetime) -> bool:
+        return datetime.utcnow() - stored_at >= self._negative_ttl
+
+    async def get(
+        self,
+        client: HaloInfiniteClient,
+        asset_type: str,
+        asset_id: str | UUID,
+        version_id: str | UUID,
+    ) -> Optional[Any]:
+        """Return the parsed asset, or ``None`` if the API does not have it.
+
+        Args:
+            client: The caller's client.  A cache miss is fetched on the
+                shared client (see :mod:`spnkr_app.singleflight`).
+            asset_type: ``"maps"``, ``"ugcGameVariants"`` or ``"playlists"``.
+            asset_id: The asset's GUID.
+            version_id: The asset version's GUID.
+        """
+        key = (asset_type, str(asset_id).lower(), str(version_id).lower())
+        cached = self._memory.get(key)
+        if cached is not None:
+            asset, stored_at = cached
+            if asset is not None or not self._negative_expired(stored_at):
+                self._memory.move_to_end(key)
+                metrics.cache_result("discovery_asset", "hit")
+                return asset
+
+        return await self._in_flight.do(key, lambda shared: self._load(shared, key))
+
+    @staticmethod
+    def _parse(model: type, body: bytes) -> Any:
+        with metrics.PARSE_SECONDS.time(model=model.__name__):
+            return model(**json.loads(body))
+
+    async def _load(self, client: HaloInfiniteClient, key: _Key) -> Optional[Any]:
+        asset_type, asset_id, version_id = key
+        method, model = _ASSET_TYPES[asset_type]
+
+        record = await get_discovery_asset(*key)
+        if record is not None and (record.data is not None or not self._negative_expired(record.stored_at)):
+            asset = self._parse(model, zlib.decompress(record.data)) if record.data is not None else None
+            self._remember(key, asset, record.stored_at)
+            metrics.cache_result("discovery_asset", "db_hit")
+            return asset
+
+        metrics.cache_result("discovery_asset", "miss")
+
+        try:
+            resp = await rate_limit.retry_throttled(
+                lambda: getattr(client.discovery_ugc, method)(asset_id, version_id)
+            )
+            body = await resp.read()
+            asset = self._parse(model, body)
+            data = zlib.compress(body)
+        except ClientResponseError as e:
+            if e.status != 404:
+                raise
+            logger.info("Discovery asset %s/%s/%s not found", *key)
+            asset = data = None
+
+        await save_discovery_asset(asset_type, asset_id, version_id, data)
+        self._remember(key, asset, datetime.utcnow())
+        return asset
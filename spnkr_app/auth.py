@@ -0,0 +1,111 @@
+"""Background management of the bot's Halo Infinite tokens.
+
+:class:`TokenManager` owns the refresh-token → Spartan/clearance token chain.
+A background task refreshes the tokens ``TOKEN_REFRESH_MARGIN`` seconds
+before the Spartan token expires, so callers normally get valid tokens
+without touching the refresh path.  If a caller does find the tokens
+expired (e.g. on startup, or after a failed refresh), every concurrent
+caller awaits the same in-flight refresh instead of starting its own.
+
+Environment variables
+---------------------
+TOKEN_REFRESH_MARGIN  Seconds before expiry to refresh proactively (default: 600).
+"""
+
+import asyncio
+import datetime as dt
+import logging
+import os
+from typing import Optional
+
+from spnkr import AzureApp, refresh_player_tokens
+from spnkr.auth.player import AuthenticatedPlayer
+
+from app import http_pool
+from app.tokens import AZURE_CLIENT_ID, AZURE_CLIENT_SECRET, AZURE_REFRESH_TOKEN, REDIRECT_URI
+
+logger = logging.getLogger(__name__)
+
+_REFRESH_MARGIN: int = int(os.environ.get("TOKEN_REFRESH_MARGIN", "600"))
+_RETRY_INITIAL = 15  # seconds
+_RETRY_MAX = 300     # seconds
+
+
+class TokenManager:
+    """Keeps one :class:`AuthenticatedPlayer` fresh for the whole process."""
+
+    def __init__(self, app: AzureApp, refresh_token: str, refresh_margin: int = _REFRESH_MARGIN) -> None:
+        self._app = app
+        self._refresh_token = refresh_token
+        self._refresh_margin = dt.timedelta(seconds=refresh_margin)
+        self._player: Optional[AuthenticatedPlayer] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._background_task: Optional[asyncio.Task] = None
+
+    @property
+    def player(self) -> Optional[AuthenticatedPlayer]:
+        """The most recently refreshed player, valid or not."""
+        return self._player
+
+    async def get_player(self) -> AuthenticatedPlayer:
+        """Return a player with valid tokens, refreshing only if they have expired."""
+        self.start()
+        player = self._player
+        if player is not None and player.is_valid:
+            return player
+        return await self.refresh()
+
+    async def get_tokens(self) -> tuple[str, str]:
+        """Return ``(spartan_token, clearance_token)``."""
+        player = await self.get_player()
+        return player.spartan_token.token, player.clearance_token.token
+
+    async def refresh(self) -> AuthenticatedPlayer:
+        """Refresh the tokens, joining a refresh that is already in flight."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._do_refresh())
+        # shield: one cancelled waiter must not cancel the refresh for the others
+        return await asyncio.shield(self._refresh_task)
+
+    async def _do_refresh(self) -> AuthenticatedPlayer:
+        player = await refresh_player_tokens(http_pool.get_session(), self._app, self._refresh_token)
+        self._player = player
+        logger.info("Halo tokens refreshed; Spartan token expires at %s", player.spartan_token.expires_at)
+        return player
+
+    def start(self) -> None:
+        """Start the proactive refresh loop if it is not running yet."""
+        if self._background_task is None or self._background_task.done():
+            self._background_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        """Stop the proactive refresh loop."""
+        if self._background_task is not None:
+            self._background_task.cancel()
+            try:
+                await self._background_task
+            except asyncio.CancelledError:
+                pass
+            self._background_task = None
+
+    async def _refresh_loop(self) -> None:
+        retry = _RETRY_INITIAL
+        while True:
+            player = self._player
+            if player is not None:
+                refresh_at = player.spartan_token.expires_at - self._refresh_margin
+                delay = (refresh_at - dt.datetime.now(dt.timezone.utc)).total_seconds()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            try:
+                await self.refresh()
+                retry = _RETRY_INITIAL
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.error("Background token refresh failed, retrying in %ds: %s", retry, exc)
+                await asyncio.sleep(retry)
+                retry = min(retry * 2, _RETRY_MAX)
+
+
+token_manager = TokenManager(AzureApp(AZURE_CLIENT_ID, AZURE_CLIENT_SECRET, REDIRECT_URI), AZURE_REFRESH_TOKEN)
@@ -0,0 +1,36 @@
+"""On-demand film highlight events with a per-match disk cache.
+
+Downloading and decoding a film's highlight events is the most expensive
+call in the series path, so it only happens when a consumer asks for it
+(:meth:`spnkr_app.CustomMatch.load_film`).  The decoded events are stored
+per match ID in the ``FilmHighlightsRecord`` table as compressed JSON rows,
+so a match's film is downloaded at most once.
+"""
+
+import json
+import logging
+import zlib
+from uuid import UUID
+
+from spnkr import HaloInfiniteClient
+from spnkr.film import HighlightEvent, read_highlight_events
+
+from app import metrics
+from database_app.database import get_film_highlights_data, save_film_highlights_data
+
+logger = logging.getLogger(__name__)
+
+
+async def get_highlight_events(client: HaloInfiniteClient, match_id: str | UUID) -> list[HighlightEvent]:
+    """Return a match's highlight events from the cache, downloading the film if unseen."""
+    key = str(match_id).lower()
+    data = await get_film_highlights_data(key)
+    if data is not None:
+        metrics.cache_result("film_highlights", "hit")
+        return [HighlightEvent(*row) for row in json.loads(zlib.decompress(data))]
+
+    metrics.cache_result("film_highlights", "miss")
+    events = await read_highlight_events(client, key)
+    await save_film_highlights_data(key, zlib.compress(json.dumps(events).encode()))
+    logger.debug("Stored %d highlight events for match %s", len(events), key)
+    return events
@@ -0,0 +1,103 @@
+"""Concurrent, early-terminating match-history pagination.
+
+The stats service returns match history 25 results at a time.  Instead of
+awaiting one page before asking for the next, :func:`paginate_match_history`
+keeps up to ``MATCH_HISTORY_PREFETCH`` pages in flight (all still paced by
+the shared rate limiter), filters each page as soon as it arrives, and
+cancels the pages it no longer needs once ``count`` matches are collected
+or the history runs out.
+
+Environment variables
+---------------------
+MATCH_HISTORY_PREFETCH  Pages requested ahead of the one being consumed (default: 3).
+"""
+
+import asyncio
+import logging
+import math
+import os
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from spnkr import HaloInfiniteClient
+from spnkr.models.stats import MatchHistoryResult
+
+from spnkr_app import rate_limit
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = 25  # stats service maximum
+_PREFETCH: int = int(os.environ.get("MATCH_HISTORY_PREFETCH", "3"))
+
+PageFilter = Callable[[list[MatchHistoryResult]], Awaitable[list[MatchHistoryResult]]]
+
+
+async def paginate_match_history(
+    client: HaloInfiniteClient,
+    player: str | int,
+    start: int = 0,
+    count: int = 25,
+    match_type: str = "all",
+    page_filter: Optional[PageFilter] = None,
+    prefetch: int = _PREFETCH,
+) -> list[MatchHistoryResult]:
+    """Collect up to *count* matches from a player's history, newest first.
+
+    Args:
+        client: Client for the stats service.
+        player: Gamertag or XUID.
+        start: Offset of the first match to consider.
+        count: Number of (filtered) matches wanted.
+        match_type: ``"all"``, ``"matchmaking"``, ``"custom"`` or ``"local"``.
+        page_filter: Optional coroutine that keeps the wanted matches of a page.
+            Without one, exactly the pages covering *count* are requested.
+        prefetch: Maximum pages in flight at once.
+
+    Returns:
+        At most *count* matches, in history order.
+    """
+    page_size = _PAGE_SIZE if page_filter else min(_PAGE_SIZE, count)
+    if page_size <= 0:
+        return []
+    # Without a filter every result counts, so the pages needed are known up front
+    page_limit = None if page_filter else math.ceil(count / page_size)
+
+    async def fetch_page(offset: int) -> tuple[int, list[MatchHistoryResult]]:
+        resp = await rate_limit.retry_throttled(
+            lambda: client.stats.get_match_history(player, offset, page_size, match_type)
+        )
+        page = (await resp.parse()).results
+        kept = await page_filter(page) if page_filter else page
+        return len(page), kept
+
+    pending: deque[asyncio.Task] = deque()
+    next_offset = start
+    requested = 0
+    exhausted = False
+    results: list[MatchHistoryResult] = []
+
+    def schedule() -> None:
+        nonlocal next_offset, requested
+        while not exhausted and len(pending) < max(1, prefetch) and (page_limit is None or requested < page_limit):
+            pending.append(asyncio.ensure_future(fetch_page(next_offset)))
+            next_offset += page_size
+            requested += 1
+
+    try:
+        schedule()
+        while pending and len(results) < count:
+            returned, kept = await pending.popleft()
+            results += kept
+            if returned < page_size:
+                # End of history: later pages would be empty
+                exhausted = True
+                break
+            schedule()
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            logger.debug("Cancelled %d prefetched history page(s)", len(pending))
+
+    return results[:count]
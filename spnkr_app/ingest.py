@@ -0,0 +1,172 @@
+"""Background ingestion of tracked players' matches.
+
+:class:`MatchIngestor` periodically walks the match history of every valid
+``CustomPlayer``, newest first, and stops at the first match it has already
+ingested.  New matches get their stats (match store), skill results (skill
+store, matchmade games only) and participants' profiles stored locally, and
+every participant is linked to the match through ``LinkTable``.  Each
+batch's ranking validity is evaluated in one pass and stored in
+``CustomMatch.is_valid``.  A match whose game variant cannot be looked up is
+skipped and logged without failing the rest of the batch.  Commands then
+find most matches locally and only request the newest ones.
+
+A player's first crawl cannot stop at a known match, since teammates'
+crawls may already have ingested some of it, so it skips known matches and
+goes back ``INGEST_BACKFILL`` matches instead.  All requests run at
+background priority, behind interactive commands in the rate limiter.
+
+Environment variables
+---------------------
+INGEST_INTERVAL  Seconds between crawls; 0 disables the crawler (default: 0).
+INGEST_BACKFILL  Matches walked back on a player's first crawl, and at most per crawl (default: 100).
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import AsyncContextManager, Callable, Optional
+
+from spnkr import HaloInfiniteClient
+from spnkr.models.refdata import LifecycleMode
+
+from database_app.database import get_ingested_match_ids, get_players, mark_player_ingested, save_ingested_matches
+from database_app.models import CustomPlayer
+from spnkr_app import match_store, match_validity, rate_limit, skill_store
+from spnkr_app.assets import AssetCache
+from spnkr_app.profiles import ProfileCache
+
+logger = logging.getLogger(__name__)
+
+_INTERVAL: int = int(os.environ.get("INGEST_INTERVAL", "0"))
+_BACKFILL: int = int(os.environ.get("INGEST_BACKFILL", "100"))
+_PAGE_SIZE = 25  # stats service maximum
+
+ClientFactory = Callable[[], AsyncContextManager[HaloInfiniteClient]]
+
+
+class MatchIngestor:
+    """Incremental crawler of tracked players' match history into the local DB."""
+
+    def __init__(
+        self,
+        client_factory: ClientFactory,
+        profiles: ProfileCache,
+        assets: AssetCache,
+        interval: int = _INTERVAL,
+        backfill: int = _BACKFILL,
+    ) -> None:
+        self._client_factory = client_factory
+        self._profiles = profiles
+        self._assets = assets
+        self._interval = interval
+        self._backfill = backfill
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the crawl loop if it is enabled and not running yet."""
+        if self._interval <= 0 or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._loop())
+        logger.info("Ingesting tracked players' matches every %ds", self._interval)
+
+    async def stop(self) -> None:
+        """Stop the crawl loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self._interval)
+
+    async def run_once(self) -> int:
+        """Crawl every valid player once; return the number of matches ingested."""
+        total = 0
+        with rate_limit.background():
+            for player in await get_players():
+                try:
+                    async with self._client_factory() as client:
+                        total += await self.ingest_player(client, player)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception("Ingesting matches of %s failed", player.gamertag)
+        if total:
+            logger.info("Ingested %d new matches", total)
+        return total
+
+    async def ingest_player(self, client: HaloInfiniteClient, player: CustomPlayer) -> int:
+        """Ingest *player*'s matches newer than the first known one; return how many."""
+        backfilling = player.last_ingested is None
+        new: list[str] = []
+        start = 0
+        while start < self._backfill:
+            resp = await rate_limit.retry_throttled(
+                lambda: client.stats.get_match_history(player.xuid, start, _PAGE_SIZE, "all")
+            )
+            page = (await resp.parse()).results
+            match_ids = [str(result.match_id).lower() for result in page]
+            known = await get_ingested_match_ids(match_ids)
+            reached_known = False
+            for match_id in match_ids:
+                if match_id not in known:
+                    new.append(match_id)
+                elif not backfilling:
+                    reached_known = True
+                    break
+            start += len(page)
+            if reached_known or len(page) < _PAGE_SIZE:
+                break
+
+        # Oldest first, so an interrupted crawl never leaves a gap behind a known match
+        new.reverse()
+        ingested = 0
+        for i in range(0, len(new), _PAGE_SIZE):
+            ingested += await self._ingest_matches(client, new[i:i + _PAGE_SIZE])
+        await mark_player_ingested(player.xuid, datetime.utcnow())
+        logger.debug("Ingested %d matches of %s", ingested, player.gamertag)
+        return ingested
+
+    async def _ingest_matches(self, client: HaloInfiniteClient, match_ids: list[str]) -> int:
+        """Store a batch of matches; return how many were stored."""
+        match_stats = await match_store.get_match_stats_many(client, match_ids, view=True)
+        # Creates or refreshes the participants' CustomPlayer rows
+        await self._profiles.get_profiles(client, [xuid for stats in match_stats for xuid in stats.xuids])
+        await asyncio.gather(*(
+            skill_store.get_match_skill(client, stats.match_id, stats.xuids)
+            for stats in match_stats
+            if stats.match_info.lifecycle_mode is LifecycleMode.MATCHMADE
+        ))
+        gamemodes = await asyncio.gather(*(
+            self._assets.get(
+                client, "ugcGameVariants", stats.match_info.ugc_game_variant.asset_id,
+                stats.match_info.ugc_game_variant.version_id,
+            )
+            for stats in match_stats
+        ), return_exceptions=True)
+        resolved = []
+        for stats, gamemode in zip(match_stats, gamemodes):
+            if not isinstance(gamemode, BaseException):
+                resolved.append((stats, gamemode))
+            elif isinstance(gamemode, Exception):
+                logger.warning("Skipping match %s: game variant lookup failed: %r", stats.match_id, gamemode)
+            else:
+                raise gamemode
+        if not resolved:
+            return 0
+
+        match_stats = [stats for stats, _ in resolved]
+        valid = match_validity.evaluate(
+            match_stats, [gamemode.public_name if gamemode else None for _, gamemode in resolved]
+        )
+        await save_ingested_matches(
+            {stats.match_id: stats.xuids for stats in match_stats},
+            {stats.match_id: is_valid for stats, is_valid in zip(match_stats, valid)},
+        )
+        return len(match_stats)
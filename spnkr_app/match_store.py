@@ -0,0 +1,119 @@
+"""Local store of finished matches' stats.
+
+A finished match never changes, so the raw ``MatchStats`` JSON is kept in
+the ``MatchStatsRecord`` table, zlib-compressed and keyed by match ID.
+:func:`get_match_stats_many` reads every stored match in one query and only
+goes to the stats service for matches it has not seen, so browsing the same
+series or player history again is a local read.
+
+Every reader takes ``view=True`` to get :class:`~spnkr_app.match_view.MatchStatsView`
+projections instead of full models, for render paths that only need a
+match's core stats, teams and assets.
+"""
+
+import asyncio
+import json
+import logging
+import zlib
+from typing import Iterable, Optional, Union
+from uuid import UUID
+
+from spnkr import HaloInfiniteClient
+from spnkr.models.stats import MatchStats
+
+from app import metrics
+from database_app.database import get_match_stats_data, save_match_stats_data
+from spnkr_app import rate_limit
+from spnkr_app.match_view import MatchStatsView
+from spnkr_app.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+AnyMatchStats = Union[MatchStats, MatchStatsView]
+
+
+def _key(match_id: str | UUID) -> str:
+    return str(match_id).lower()
+
+
+def _parse(body: bytes) -> MatchStats:
+    with metrics.PARSE_SECONDS.time(model="match_stats"):
+        return MatchStats(**json.loads(body))
+
+
+def _decode(data: bytes, view: bool = False) -> AnyMatchStats:
+    if view:
+        return MatchStatsView.from_json(data)
+    return _parse(zlib.decompress(data))
+
+
+_in_flight = SingleFlight("match stats")
+
+
+async def _fetch_raw(match_id: str) -> bytes:
+    async def fetch(client: HaloInfiniteClient) -> bytes:
+        resp = await rate_limit.retry_throttled(lambda: client.stats.get_match_stats(match_id))
+        return await resp.read()
+
+    return await _in_flight.do(match_id, fetch)
+
+
+async def get_match_stats_many(
+    client: HaloInfiniteClient, match_ids: Iterable[str | UUID], view: bool = False
+) -> list[AnyMatchStats]:
+    """Return stats for *match_ids*, in order, fetching only unstored matches.
+
+    Args:
+        client: The caller's client.  Matches missing from the store are
+            fetched on the shared client (see :mod:`spnkr_app.singleflight`).
+        match_ids: Match GUIDs; duplicates are returned once per occurrence.
+        view: Return :class:`MatchStatsView` projections instead of full models.
+
+    Returns:
+        One :class:`MatchStats` (or view) per requested ID.
+    """
+    keys = [_key(match_id) for match_id in match_ids]
+    unique = list(dict.fromkeys(keys))
+    stored = await get_match_stats_data(unique)
+    missing = [key for key in unique if key not in stored]
+    logger.debug("Match store: %d stored, %d fetched", len(unique) - len(missing), len(missing))
+    metrics.cache_result("match_stats", "hit", len(unique) - len(missing))
+    metrics.cache_result("match_stats", "miss", len(missing))
+
+    parsed = {key: _decode(data, view) for key, data in stored.items()}
+    if missing:
+        bodies = await asyncio.gather(*(_fetch_raw(key) for key in missing))
+        compressed = {key: zlib.compress(body) for key, body in zip(missing, bodies)}
+        # Parse before storing so a malformed body is never persisted
+        for key, body in zip(missing, bodies):
+            parsed[key] = MatchStatsView.from_json(compressed[key], body) if view else _parse(body)
+        await save_match_stats_data(compressed)
+
+    return [parsed[key] for key in keys]
+
+
+async def get_stored_match_stats(
+    match_ids: Iterable[str | UUID], view: bool = False
+) -> list[Optional[AnyMatchStats]]:
+    """Return stored stats for *match_ids* in one query, ``None`` where not stored."""
+    keys = [_key(match_id) for match_id in match_ids]
+    stored = await get_match_stats_data(set(keys))
+    parsed = {key: _decode(data, view) for key, data in stored.items()}
+    metrics.cache_result("match_stats", "hit", len(parsed))
+    metrics.cache_result("match_stats", "miss", len(set(keys)) - len(parsed))
+    return [parsed.get(key) for key in keys]
+
+
+async def fetch_match_stats(client: HaloInfiniteClient, match_id: str | UUID, view: bool = False) -> AnyMatchStats:
+    """Fetch one match from the stats service and store it."""
+    key = _key(match_id)
+    body = await _fetch_raw(key)
+    compressed = zlib.compress(body)
+    match_stats = MatchStatsView.from_json(compressed, body) if view else _parse(body)
+    await save_match_stats_data({key: compressed})
+    return match_stats
+
+
+async def get_match_stats(client: HaloInfiniteClient, match_id: str | UUID, view: bool = False) -> AnyMatchStats:
+    """Return stats for one match from the store, fetching it if unseen."""
+    return (await get_match_stats_many(client, [match_id], view))[0]
@@ -1,118 +1,133 @@
-from spnkr.models.stats import MatchStats
-
-import datetime
-
-
-async def check_if_teams_enabled(
-        match_stats: MatchStats
-):
-    """
-    Check whether the teams are enabled. If not then it is FFA and thus not eligible for ranking
-
-    :param match_stats:
-    :return bool:
-    """
-    return match_stats.match_info.teams_enabled
-
-
-async def check_match_date(
-        match_stats: MatchStats,
-        date: datetime.datetime
-):
-    """
-    Check if match was played after 1st of Jan 2024 and thus is eligible to be added to database
-
-    :param date:
-    :param match_stats:
-    :return bool:
-    """
-    if match_stats.match_info.start_time >= date:
-        return True
-    else:
-        return False
-
-
-async def check_match_validity(
-        match,
-        date: datetime.date = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
-):
-    """
-    Determines the validity of a match for be used in ranking as in was it ended by the host or was it played
-    till either scorelimit or timelimit was reached. For match to be valid, there has to also be 8 players in
-    the lobby at the end of the match and the gamemode has to be one of listed in scorelimit/timelimit
-
-    :param date:
-    :param match_stats:
-    :return bool:
-    """
-    # "<Gamemode name>": [score needed to win, rounds needed to win]
-    scorelimit = {
-        "Ranked:King of the Hill": [4, 1],
-        "Ranked:Strongholds": [250, 1],
-        "Ranked:Oddball": [200, 2],
-        "Ranked:CTF 3 Captures": [3, 1],
-        "Ranked:CTF 5 Captures": [5, 1],
-        "Ranked:Slayer": [50, 1],
-        "Ranked:Extraction": [4, 1],
-        "Ranked:CTF": [5,1],
-        "Assault:Neutral Bomb Ranked": [1,1]
-    }
-
-    timelimit = {
-        "Ranked:King of the Hill": datetime.timedelta(minutes=5),
-        "Ranked:Strongholds": datetime.timedelta(minutes=9000),
-        "Ranked:Oddball": datetime.timedelta(minutes=2 * 5),
-        "Ranked:CTF 3 Captures": datetime.timedelta(minutes=12),
-        "Ranked:CTF 5 Captures": datetime.timedelta(minutes=12),
-        "Ranked:Slayer": datetime.timedelta(minutes=12),
-        "Ranked:Extraction": datetime.timedelta(minutes=12),
-        "Ranked:CTF": datetime.timedelta(minutes=12),
-        "Assault:Neutral Bomb Ranked": datetime.timedelta(minutes=12)
-    }
-    match_stats = match.match_stats
-
-    date_passes = await check_match_date(match_stats, date)
-    if not date_passes:
-        return False
-
-    teams_enabled = await check_if_teams_enabled(match_stats)
-    if not teams_enabled:
-        return False
-
-    
-    if match.match_gamemode.public_name not in scorelimit.keys():
-        return False
-
-    # if timelimit for the gamemode has run out and there are 8 players present at the end of the match in lobby,
-    # it's a valid match
-    if (
-            match_stats.match_info.playable_duration >= timelimit[match.match_gamemode.public_name]
-            and
-            len([player for player in match_stats.players if player.participation_info.present_at_completion]) == 8
-            and
-            [
-                team for team in match_stats.teams
-                if (
-                    team.stats.core_stats.rounds_won == scorelimit[match.match_gamemode.public_name][1]
-                )
-            ]
-
-    ):
-        return True
-    # if scorelimit for the gamemode has been reached and there are 8 players present at the end of the match in lobby,
-    # it's a valid match
-    elif (
-            [
-                team for team in match_stats.teams
-                if (
-                    team.stats.core_stats.score >= scorelimit[match.match_gamemode.public_name][0]
-                    and
-                    team.stats.core_stats.rounds_won == scorelimit[match.match_gamemode.public_name][1]
-                )
-            ]
-            and
-            len([player for player in match_stats.players if player.participation_info.present_at_completion]) == 8
-    ):
-        return True
-    else:
-        return False
+"""Ranking validity of matches, evaluated in batches.
+
+A match counts for ranking when it was played after ``VALID_SINCE`` with
+teams, in one of the game modes below, with 8 players present at the end,
+and it ended by the rules: either the time limit ran out with a team having
+won the required rounds, or a team reached the score limit (and its
+rounds).
+
+The rule tables are compiled once into arrays indexed by game mode, and
+:func:`evaluate` checks many matches in one pass over NumPy columns of
+start time, playable duration, present-player count and per-team score and
+rounds won.  Results are persisted in ``CustomMatch.is_valid`` (indexed) by
+the ingestion crawler.
+"""
+
+import datetime
+from typing import Optional, Sequence
+
+import numpy as np
+from spnkr.models.stats import MatchStats
+
+VALID_SINCE = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+PLAYERS_REQUIRED = 8
+
+# "<Gamemode name>": [score needed to win, rounds needed to win]
+SCORELIMIT = {
+    "Ranked:King of the Hill": [4, 1],
+    "Ranked:Strongholds": [250, 1],
+    "Ranked:Oddball": [200, 2],
+    "Ranked:CTF 3 Captures": [3, 1],
+    "Ranked:CTF 5 Captures": [5, 1],
+    "Ranked:Slayer": [50, 1],
+    "Ranked:Extraction": [4, 1],
+    "Ranked:CTF": [5, 1],
+    "Assault:Neutral Bomb Ranked": [1, 1],
+}
+
+TIMELIMIT = {
+    "Ranked:King of the Hill": datetime.timedelta(minutes=5),
+    "Ranked:Strongholds": datetime.timedelta(minutes=9000),
+    "Ranked:Oddball": datetime.timedelta(minutes=2 * 5),
+    "Ranked:CTF 3 Captures": datetime.timedelta(minutes=12),
+    "Ranked:CTF 5 Captures": datetime.timedelta(minutes=12),
+    "Ranked:Slayer": datetime.timedelta(minutes=12),
+    "Ranked:Extraction": datetime.timedelta(minutes=12),
+    "Ranked:CTF": datetime.timedelta(minutes=12),
+    "Assault:Neutral Bomb Ranked": datetime.timedelta(minutes=12),
+}
+
+# ── Compiled rule tables ──────────────────────────────────────────────────────
+
+_MODE_INDEX: dict[str, int] = {name: index for index, name in enumerate(SCORELIMIT)}
+_SCORE_NEEDED = np.array([SCORELIMIT[name][0] for name in _MODE_INDEX], dtype=np.int64)
+_ROUNDS_NEEDED = np.array([SCORELIMIT[name][1] for name in _MODE_INDEX], dtype=np.int64)
+_SECONDS_NEEDED = np.array([TIMELIMIT[name].total_seconds() for name in _MODE_INDEX], dtype=np.float64)
+
+
+def evaluate(
+    match_stats: Sequence[MatchStats],
+    gamemodes: Sequence[Optional[str]],
+    since: datetime.datetime = VALID_SINCE,
+) -> np.ndarray:
+    """Return a boolean array telling which matches are valid for ranking.
+
+    Args:
+        match_stats: Full models or :class:`~spnkr_app.match_view.MatchStatsView` projections.
+        gamemodes: Each match's game variant public name (``None`` if unknown).
+        since: Earliest start time of a valid match (timezone-aware).
+    """
+    count = len(match_stats)
+    start_time = np.empty(count, dtype=np.float64)
+    teams_enabled = np.empty(count, dtype=bool)
+    mode = np.empty(count, dtype=np.int64)
+    duration = np.empty(count, dtype=np.float64)
+    present = np.empty(count, dtype=np.int64)
+    team_match, team_score, team_rounds = [], [], []
+    for i, (stats, gamemode) in enumerate(zip(match_stats, gamemodes)):
+        info = stats.match_info
+        start_time[i] = info.start_time.timestamp()
+        teams_enabled[i] = info.teams_enabled
+        mode[i] = _MODE_INDEX.get(gamemode, -1)
+        duration[i] = info.playable_duration.total_seconds()
+        present[i] = sum(player.participation_info.present_at_completion for player in stats.players)
+        for team in stats.teams:
+            team_match.append(i)
+            team_score.append(team.stats.core_stats.score)
+            team_rounds.append(team.stats.core_stats.rounds_won)
+
+    known = mode >= 0
+    rule = np.where(known, mode, 0)
+
+    team_match = np.array(team_match, dtype=np.int64)
+    team_rule = rule[team_match]
+    rounds_reached = np.array(team_rounds, dtype=np.int64) == _ROUNDS_NEEDED[team_rule]
+    score_reached = rounds_reached & (np.array(team_score, dtype=np.int64) >= _SCORE_NEEDED[team_rule])
+    any_rounds_reached = np.zeros(count, dtype=bool)
+    any_score_reached = np.zeros(count, dtype=bool)
+    np.logical_or.at(any_rounds_reached, team_match, rounds_reached)
+    np.logical_or.at(any_score_reached, team_match, score_reached)
+
+    time_ran_out = (duration >= _SECONDS_NEEDED[rule]) & any_rounds_reached
+    return (
+        (start_time >= since.timestamp())
+        & teams_enabled
+        & known
+        & (present == PLAYERS_REQUIRED)
+        & (time_ran_out | any_score_reached)
+    )
+
+
+def evaluate_matches(matches: Sequence, since: datetime.datetime = VALID_SINCE) -> np.ndarray:
+    """:func:`evaluate` for matches carrying ``match_stats`` and ``match_gamemode`` (e.g. ``CustomMatch``)."""
+    return evaluate(
+        [match.match_stats for match in matches],
+        [match.match_gamemode.public_name if match.match_gamemode else None for match in matches],
+        since,
+    )
+
+
+async def check_match_validity(
+        match,
+        date: datetime.datetime = VALID_SINCE
+):
+    """
+    Determines the validity of a match for be used in ranking as in was it ended by the host or was it played
+    till either scorelimit or timelimit was reached. For match to be valid, there has to also be 8 players in
+    the lobby at the end of the match and the gamemode has to be one of listed in scorelimit/timelimit
+
+    :param date:
+    :param match:
+    :return bool:
+    """
+    return bool(evaluate_matches([match], date)[0])
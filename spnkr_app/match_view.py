@@ -0,0 +1,169 @@
+"""Lightweight projections of :class:`~spnkr.models.stats.MatchStats`.
+
+A full ``MatchStats`` validates every medal, per-mode stat block and
+participation timestamp of every player, yet the embeds and the validity
+checks read only core stats, team IDs, outcomes, ``playable_duration`` and
+the map/variant/playlist assets.  :meth:`MatchStatsView.from_json` builds
+just those fields straight from the decoded JSON into ``__slots__``
+objects.
+
+The views keep the model's attribute paths (``match_info.teams_enabled``,
+``players[i].player_team_stats[j].stats.core_stats.kills``, ``is_human``,
+``xuids``…), so render code works with either.  The full model is still
+available through :attr:`MatchStatsView.model`, parsed once on first use
+from the compressed JSON the view keeps.
+"""
+
+import datetime as dt
+import json
+import zlib
+from typing import Any, Optional
+from uuid import UUID
+
+from pydantic import TypeAdapter
+from spnkr.models.refdata import LifecycleMode, Outcome, PlayerType
+from spnkr.models.stats import MatchStats
+
+from app import metrics
+
+_DATETIME = TypeAdapter(dt.datetime)
+_DURATION = TypeAdapter(dt.timedelta)
+
+
+class AssetRefView:
+    """Asset and version ID of a map, game variant or playlist."""
+
+    __slots__ = ("asset_id", "version_id")
+
+    def __init__(self, data: dict[str, Any]) -> None:
+        self.asset_id = UUID(data["AssetId"])
+        self.version_id = UUID(data["VersionId"])
+
+    @classmethod
+    def optional(cls, data: Optional[dict[str, Any]]) -> Optional["AssetRefView"]:
+        return cls(data) if data else None
+
+
+class CoreStatsView:
+    """The core stats shown in match tables and used by the validity checks."""
+
+    __slots__ = (
+        "score", "personal_score", "rounds_won", "kills", "deaths", "assists",
+        "damage_dealt", "damage_taken", "shots_hit", "shots_fired", "accuracy",
+    )
+
+    def __init__(self, data: dict[str, Any]) -> None:
+        self.score: int = data["Score"]
+        self.personal_score: int = data["PersonalScore"]
+        self.rounds_won: int = data["RoundsWon"]
+        self.kills: int = data["Kills"]
+        self.deaths: int = data["Deaths"]
+        self.assists: int = data["Assists"]
+        self.damage_dealt: int = data["DamageDealt"]
+        self.damage_taken: int = data["DamageTaken"]
+        self.shots_hit: int = data["ShotsHit"]
+        self.shots_fired: int = data["ShotsFired"]
+        self.accuracy: float = float(data["Accuracy"])
+
+
+class StatsView:
+    """``Stats`` reduced to its core stats."""
+
+    __slots__ = ("core_stats",)
+
+    def __init__(self, data: dict[str, Any]) -> None:
+        self.core_stats = CoreStatsView(data["CoreStats"])
+
+
+class TeamView:
+    __slots__ = ("team_id", "outcome", "stats")
+
+    def __init__(self, data: dict[str, Any]) -> None:
+        self.team_id: int = data["TeamId"]
+        self.outcome = Outcome(data["Outcome"])
+        self.stats = StatsView(data["Stats"])
+
+
+class PlayerTeamStatsView:
+    __slots__ = ("team_id", "stats")
+
+    def __init__(self, data: dict[str, Any]) -> None:
+        self.team_id: int = data["TeamId"]
+        self.stats = StatsView(data["Stats"])
+
+
+class ParticipationView:
+    __slots__ = ("present_at_completion",)
+
+    def __init__(self, data: dict[str, Any]) -> None:
+        self.present_at_completion: bool = data["PresentAtCompletion"]
+
+
+class PlayerView:
+    __slots__ = ("player_id", "player_type", "last_team_id", "outcome", "participation_info", "player_team_stats")
+
+    def __init__(self, data: dict[str, Any]) -> None:
+        self.player_id: str = data["PlayerId"]
+        self.player_type = PlayerType(data["PlayerType"])
+        self.last_team_id: int = data["LastTeamId"]
+        self.outcome = Outcome(data["Outcome"])
+        self.participation_info = ParticipationView(data["ParticipationInfo"])
+        self.player_team_stats = tuple(PlayerTeamStatsView(team) for team in data["PlayerTeamStats"])
+
+    @property
+    def is_human(self) -> bool:
+        return self.player_type is PlayerType.HUMAN
+
+
+class MatchInfoView:
+    __slots__ = (
+        "start_time", "lifecycle_mode", "playable_duration", "teams_enabled",
+        "map_variant", "ugc_game_variant", "playlist",
+    )
+
+    def __init__(self, data: dict[str, Any]) -> None:
+        self.start_time: dt.datetime = _DATETIME.validate_python(data["StartTime"])
+        self.lifecycle_mode = LifecycleMode(data["LifecycleMode"])
+        self.playable_duration: dt.timedelta = _DURATION.validate_python(data["PlayableDuration"])
+        self.teams_enabled: bool = data["TeamsEnabled"]
+        self.map_variant = AssetRefView(data["MapVariant"])
+        self.ugc_game_variant = AssetRefView(data["UgcGameVariant"])
+        self.playlist = AssetRefView.optional(data.get("Playlist"))
+
+
+class MatchStatsView:
+    """The fields of a match the bot renders, with the full model on demand."""
+
+    __slots__ = ("match_id", "match_info", "teams", "players", "_data", "_model")
+
+    def __init__(self, data: dict[str, Any], compressed: bytes) -> None:
+        self.match_id = UUID(data["MatchId"])
+        self.match_info = MatchInfoView(data["MatchInfo"])
+        self.teams = tuple(TeamView(team) for team in data["Teams"])
+        self.players = tuple(PlayerView(player) for player in data["Players"])
+        self._data = compressed
+        self._model: Optional[MatchStats] = None
+
+    @classmethod
+    def from_json(cls, compressed: bytes, body: Optional[bytes] = None) -> "MatchStatsView":
+        """Build a view from stored (zlib-compressed) JSON.
+
+        Args:
+            compressed: The compressed JSON, kept for :attr:`model`.
+            body: The same JSON uncompressed, if the caller already has it.
+        """
+        with metrics.PARSE_SECONDS.time(model="match_stats_view"):
+            return cls(json.loads(body if body is not None else zlib.decompress(compressed)), compressed)
+
+    @property
+    def xuids(self) -> list[int]:
+        """Xbox user IDs for all human players in the match."""
+        return [int(p.player_id[5:-1]) for p in self.players if p.is_human]
+
+    @property
+    def model(self) -> MatchStats:
+        """The fully validated ``MatchStats``, parsed on first access."""
+        if self._model is None:
+            with metrics.PARSE_SECONDS.time(model="match_stats"):
+                self._model = MatchStats(**json.loads(zlib.decompress(self._data)))
+        return self._model
@@ -0,0 +1,107 @@
+"""Local classification of playlists by asset and version ID.
+
+Ranked detection used to look up every match's playlist asset.
+:class:`PlaylistClassifier` keeps an ``(asset_id, version_id) → category``
+index in the ``PlaylistCategory`` table (loaded into memory once) and
+filters a page of match history without any API call.  A playlist version
+is immutable, so its category is stored for good; a renamed or
+re-categorized playlist is a new version and is classified again.  Only
+versions it has never seen go to the discovery asset cache.
+"""
+
+import asyncio
+import logging
+from typing import Iterable, Optional
+
+from spnkr import HaloInfiniteClient
+from spnkr.models.discovery_ugc import Asset
+
+from app import metrics
+from database_app.database import get_playlist_categories, save_playlist_category
+from spnkr_app.assets import AssetCache
+
+logger = logging.getLogger(__name__)
+
+RANKED = "ranked"
+SOCIAL = "social"
+CUSTOM = "custom"
+
+_RANKED_PLAYLISTS = frozenset({"Ranked Arena"})
+
+
+def category_for(playlist_name: Optional[str]) -> str:
+    """Return the category of a playlist from its public name."""
+    return RANKED if playlist_name in _RANKED_PLAYLISTS else SOCIAL
+
+
+_Key = tuple[str, str]
+
+
+def _key(playlist: Asset) -> _Key:
+    return str(playlist.asset_id).lower(), str(playlist.version_id).lower()
+
+
+class PlaylistClassifier:
+    """Persistent ``(asset_id, version_id) → category`` index in front of the asset cache."""
+
+    def __init__(self, assets: AssetCache) -> None:
+        self._assets = assets
+        self._categories: Optional[dict[_Key, str]] = None
+        self._load_lock = asyncio.Lock()
+
+    async def _index(self) -> dict[_Key, str]:
+        if self._categories is None:
+            async with self._load_lock:
+                if self._categories is None:
+                    self._categories = await get_playlist_categories()
+                    logger.info("Loaded %d playlist categories", len(self._categories))
+        return self._categories
+
+    async def _classify_unknown(self, client: HaloInfiniteClient, playlist: Asset) -> str:
+        asset_id, version_id = key = _key(playlist)
+        asset = await self._assets.get(client, "playlists", asset_id, version_id)
+        if asset is None:
+            # Not published (yet); do not remember a guess
+            return SOCIAL
+        category = category_for(asset.public_name)
+        await save_playlist_category(asset_id, version_id, category, asset.public_name)
+        self._categories[key] = category
+        logger.info("Classified playlist %s/%s (%s) as %s", asset_id, version_id, asset.public_name, category)
+        return category
+
+    async def classify_many(self, client: HaloInfiniteClient, playlists: Iterable[Optional[Asset]]) -> list[str]:
+        """Return the category of each playlist; ``None`` (no playlist) is custom.
+
+        Unknown playlist versions are resolved concurrently, once each.
+        """
+        index = await self._index()
+        playlists = list(playlists)
+        unknown: dict[_Key, Asset] = {}
+        hits = 0
+        for playlist in playlists:
+            if playlist is not None:
+                key = _key(playlist)
+                if key in index:
+                    hits += 1
+                else:
+                    unknown.setdefault(key, playlist)
+
+        metrics.cache_result("playlist_category", "hit", hits)
+        metrics.cache_result("playlist_category", "miss", len(unknown))
+        resolved: dict[_Key, str] = {}
+        if unknown:
+            categories = await asyncio.gather(*(self._classify_unknown(client, p) for p in unknown.values()))
+            resolved = dict(zip(unknown, categories))
+
+        result = []
+        for playlist in playlists:
+            if playlist is None:
+                result.append(CUSTOM)
+            else:
+                key = _key(playlist)
+                result.append(index.get(key) or resolved[key])
+        return result
+
+    async def classify(self, client: HaloInfiniteClient, playlist: Optional[Asset]) -> str:
+        """Return the category of one playlist."""
+        return (await self.classify_many(client, [playlist]))[0]
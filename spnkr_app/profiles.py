@@ -0,0 +1,205 @@
+"""Two-tier XUID ↔ gamertag cache for Xbox Live profiles.
+
+Profiles are served from an in-memory LRU first and from the
+:class:`~database_app.models.CustomPlayer` table second.  Only XUIDs missing
+from both, or whose ``last_refreshed`` is older than ``PROFILE_CACHE_TTL``,
+are fetched from the profile service, in batches of 100.  Results are
+written back to both tiers, so repeat lookups of the same community
+players cost neither API calls nor rate-limit budget.
+
+Concurrent lookups share in-flight requests: a XUID already being fetched
+by another command is awaited rather than requested again.
+
+If a refresh fails, stale rows are served rather than failing the command.
+
+Environment variables
+---------------------
+PROFILE_CACHE_TTL   Seconds before a cached profile is refreshed (default: 86400).
+PROFILE_CACHE_SIZE  Profiles kept in memory (default: 5000).
+"""
+
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from aiohttp import ClientResponseError
+from spnkr.errors import InvalidXuidError
+from spnkr.xuid import unwrap_xuid
+
+from app import metrics
+from database_app.database import get_player_by_gamertag_nocase, get_players_by_xuids, upsert_players
+from database_app.models import CustomPlayer
+from spnkr_app import rate_limit, singleflight
+from spnkr_app.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+_TTL: int = int(os.environ.get("PROFILE_CACHE_TTL", "86400"))
+_SIZE: int = int(os.environ.get("PROFILE_CACHE_SIZE", "5000"))
+_BATCH_SIZE = 100  # profile service limit for /users?xuids=
+
+
+class ProfileCache:
+    """In-memory LRU in front of the ``CustomPlayer`` table."""
+
+    def __init__(self, ttl: int = _TTL, size: int = _SIZE) -> None:
+        self._ttl = timedelta(seconds=ttl)
+        self._size = size
+        self._by_xuid: OrderedDict[int, CustomPlayer] = OrderedDict()
+        self._by_gamertag: dict[str, int] = {}
+        # (priority, xuid) → task fetching the batch that contains it
+        self._in_flight: dict[tuple[int, int], asyncio.Task] = {}
+        self._gamertag_lookups = SingleFlight("gamertag lookup")
+
+    def _is_fresh(self, player: CustomPlayer, now: datetime) -> bool:
+        return player.last_refreshed is not None and now - player.last_refreshed < self._ttl
+
+    def _remember(self, player: CustomPlayer) -> None:
+        old = self._by_xuid.pop(player.xuid, None)
+        if old is not None and old.gamertag.lower() != player.gamertag.lower():
+            self._by_gamertag.pop(old.gamertag.lower(), None)
+        self._by_xuid[player.xuid] = player
+        self._by_gamertag[player.gamertag.lower()] = player.xuid
+        while len(self._by_xuid) > self._size:
+            _, evicted = self._by_xuid.popitem(last=False)
+            if self._by_gamertag.get(evicted.gamertag.lower()) == evicted.xuid:
+                del self._by_gamertag[evicted.gamertag.lower()]
+
+    def _cached(self, xuid: int, now: datetime) -> Optional[CustomPlayer]:
+        player = self._by_xuid.get(xuid)
+        if player is None or not self._is_fresh(player, now):
+            return None
+        self._by_xuid.move_to_end(xuid)
+        return player
+
+    async def get_profiles(self, client, xuids: Iterable[str | int]) -> list[CustomPlayer]:
+        """Return players for *xuids*, in order and without duplicates.
+
+        Non-player IDs (bots) are skipped, as are XUIDs the profile service
+        does not know.  Profiles are fetched on the shared client (see
+        :mod:`spnkr_app.singleflight`), not on *client*.
+        """
+        wanted: list[int] = []
+        for xuid in xuids:
+            try:
+                xuid = unwrap_xuid(xuid)
+            except (InvalidXuidError, ValueError):
+                continue
+            if xuid not in wanted:
+                wanted.append(xuid)
+
+        now = datetime.utcnow()
+        found: dict[int, CustomPlayer] = {}
+        missing = []
+        for xuid in wanted:
+            player = self._cached(xuid, now)
+            if player is None:
+                missing.append(xuid)
+            else:
+                found[xuid] = player
+
+        metrics.cache_result("profile", "hit", len(found))
+        stale: dict[int, CustomPlayer] = {}
+        if missing:
+            memory_hits = len(found)
+            for player in await get_players_by_xuids(missing):
+                if self._is_fresh(player, now):
+                    self._remember(player)
+                    found[player.xuid] = player
+                else:
+                    stale[player.xuid] = player
+            metrics.cache_result("profile", "db_hit", len(found) - memory_hits)
+            missing = [xuid for xuid in missing if xuid not in found]
+
+        if missing:
+            metrics.cache_result("profile", "miss", len(missing))
+            logger.debug("Profile cache: %d hits, %d fetched", len(found), len(missing))
+            try:
+                for player in await self._fetch(missing):
+                    found[player.xuid] = player
+            except Exception as e:
+                if not stale:
+                    raise
+                logger.warning("Profile refresh failed, serving %d stale profiles: %s", len(stale), e)
+                for xuid, player in stale.items():
+                    found.setdefault(xuid, player)
+
+        return [found[xuid] for xuid in wanted if xuid in found]
+
+    async def resolve_gamertag(self, client, gamertag: str) -> Optional[CustomPlayer]:
+        """Return the player currently using *gamertag*, or ``None`` if there is none."""
+        now = datetime.utcnow()
+        xuid = self._by_gamertag.get(gamertag.lower())
+        if xuid is not None:
+            player = self._cached(xuid, now)
+            if player is not None:
+                return player
+
+        return await self._gamertag_lookups.do(
+            gamertag.lower(), lambda shared: self._resolve_gamertag(shared, gamertag)
+        )
+
+    async def _resolve_gamertag(self, client, gamertag: str) -> Optional[CustomPlayer]:
+        now = datetime.utcnow()
+        stale = await get_player_by_gamertag_nocase(gamertag)
+        if stale is not None and self._is_fresh(stale, now):
+            self._remember(stale)
+            return stale
+
+        try:
+            resp = await rate_limit.retry_throttled(lambda: client.profile.get_user_by_gamertag(gamertag))
+            user = await resp.parse()
+        except ClientResponseError as e:
+            if e.status == 404:
+                return None
+            if stale is None:
+                raise
+            logger.warning("Gamertag lookup failed, serving stale profile for %s: %s", gamertag, e)
+            return stale
+
+        players = await upsert_players([user], now)
+        for player in players:
+            self._remember(player)
+        return players[0]
+
+    async def _fetch(self, xuids: list[int]) -> list[CustomPlayer]:
+        """Fetch *xuids*, joining batches other callers of the same priority already have in flight."""
+        level = rate_limit.current_priority()
+        tasks = {self._in_flight[level, xuid] for xuid in xuids if (level, xuid) in self._in_flight}
+        mine = [xuid for xuid in xuids if (level, xuid) not in self._in_flight]
+        if mine:
+            # Runs on the shared client: no caller's client may close under the others
+            task = singleflight.detach(lambda shared: self._fetch_batches(shared, mine), level)
+            for xuid in mine:
+                self._in_flight[level, xuid] = task
+
+            def done(finished: asyncio.Task) -> None:
+                for xuid in mine:
+                    if self._in_flight.get((level, xuid)) is finished:
+                        del self._in_flight[level, xuid]
+                if not finished.cancelled():
+                    finished.exception()
+
+            task.add_done_callback(done)
+            tasks.add(task)
+
+        fetched: dict[int, CustomPlayer] = {}
+        for result in await asyncio.gather(*(asyncio.shield(task) for task in tasks)):
+            fetched.update(result)
+        return [fetched[xuid] for xuid in xuids if xuid in fetched]
+
+    async def _fetch_batches(self, client, xuids: list[int]) -> dict[int, CustomPlayer]:
+        users = []
+        for i in range(0, len(xuids), _BATCH_SIZE):
+            batch = xuids[i:i + _BATCH_SIZE]
+            resp = await rate_limit.retry_throttled(lambda: client.profile.get_users_by_id(batch))
+            users += await resp.parse()
+        if not users:
+            return {}
+        players = await upsert_players(users, datetime.utcnow())
+        for player in players:
+            self._remember(player)
+        return {player.xuid: player for player in players}
@@ -0,0 +1,287 @@
+"""Process-wide, adaptive rate limiting for Halo Infinite API calls.
+
+spnkr rate-limits per service *per client instance*, and every command builds
+its own client, so concurrent commands never shared a budget.  This module
+keeps one token bucket per endpoint family for the whole process and hooks
+it into every request through an :class:`aiohttp.TraceConfig`, so spnkr
+services and raw session calls (film blobs) are paced alike.
+
+Buckets adapt to the API: a ``429`` halves the bucket's rate and blocks it
+for ``Retry-After`` seconds (or an exponential backoff when the header is
+missing), and each successful request then recovers the rate additively
+towards its configured ceiling.
+
+Waiters queue by priority, then FIFO.  Requests made inside
+:func:`background` yield to interactive ones (slash commands), which are
+the default.
+
+Environment variables
+---------------------
+HALO_RATE_<FAMILY>   Requests per second for a family, e.g. ``HALO_RATE_STATS``.
+HALO_BURST_<FAMILY>  Bucket capacity for a family, e.g. ``HALO_BURST_PROFILE``.
+
+Families: ``profile``, ``stats``, ``skill``, ``discovery_ugc``, ``film``.
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, ContextManager, Iterator, Optional, TypeVar
+
+import aiohttp
+from aiohttp import ClientResponseError
+from yarl import URL
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BACKGROUND = 10
+
+# family: (requests per second, burst)
+_DEFAULTS: dict[str, tuple[float, int]] = {
+    "profile": (1.0, 10),
+    "stats": (5.0, 10),
+    "skill": (5.0, 10),
+    "discovery_ugc": (5.0, 10),
+    "film": (5.0, 10),
+}
+
+_MIN_RATE = 0.05             # never slow a bucket below one request per 20 s
+_RECOVERY_STEPS = 20         # successes needed to recover from rate 0 to the ceiling
+_BACKOFF_INITIAL = 5.0       # seconds, for a 429 without Retry-After
+_BACKOFF_MAX = 300.0         # seconds
+_RETRY_ATTEMPTS = 3
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("halo_api_priority", default=INTERACTIVE)
+
+T = TypeVar("T")
+
+
+def _config(family: str) -> tuple[float, int]:
+    rate, burst = _DEFAULTS[family]
+    key = family.upper()
+    return (
+        float(os.environ.get(f"HALO_RATE_{key}", rate)),
+        int(os.environ.get(f"HALO_BURST_{key}", burst)),
+    )
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a ``Retry-After`` header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """An adaptive token bucket whose waiters are served in priority order."""
+
+    def __init__(self, name: str, rate: float, burst: int) -> None:
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._backoff = _BACKOFF_INITIAL
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _try_take(self) -> float:
+        """Take a token if one is available; otherwise return seconds until one is."""
+        now = time.monotonic()
+        self._refill(now)
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    async def acquire(self, priority: Optional[int] = None) -> None:
+        """Wait for a token. Lower *priority* values are served first."""
+        if priority is None:
+            priority = _priority.get()
+        if not self._waiters and self._try_take() == 0.0:
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self._schedule(0.0)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as we were cancelled: hand the token back.
+                self._tokens = min(self.burst, self._tokens + 1)
+                self._schedule(0.0)
+            raise
+
+    def _schedule(self, delay: float) -> None:
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+        self._wakeup = asyncio.get_running_loop().call_later(delay, self._drain)
+
+    def _drain(self) -> None:
+        self._wakeup = None
+        while self._waiters:
+            future = self._waiters[0][2]
+            if future.cancelled():
+                heapq.heappop(self._waiters)
+                continue
+            wait = self._try_take()
+            if wait > 0:
+                self._schedule(wait)
+                return
+            heapq.heappop(self._waiters)
+            future.set_result(None)
+
+    def on_throttled(self, retry_after: Optional[float]) -> None:
+        """Back off after a ``429``: halve the rate and pause the bucket."""
+        if retry_after is None:
+            retry_after = self._backoff
+            self._backoff = min(_BACKOFF_MAX, self._backoff * 2)
+        self.rate = max(_MIN_RATE, self.rate / 2)
+        self._tokens = 0.0
+        self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        logger.warning(
+            "Halo API throttled (%s): pausing %.1fs, rate now %.2f req/s",
+            self.name, retry_after, self.rate,
+        )
+        if self._waiters:
+            self._schedule(self._blocked_until - time.monotonic())
+
+    def on_success(self) -> None:
+        """Recover the rate additively after a successful request."""
+        self._backoff = _BACKOFF_INITIAL
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / _RECOVERY_STEPS)
+
+
+_buckets: dict[str, TokenBucket] = {}
+
+
+def get_bucket(family: str) -> TokenBucket:
+    """Return the process-wide bucket for an endpoint family."""
+    bucket = _buckets.get(family)
+    if bucket is None:
+        bucket = _buckets[family] = TokenBucket(family, *_config(family))
+    return bucket
+
+
+def family_for(url: URL) -> Optional[str]:
+    """Map a request URL to its endpoint family, or ``None`` if it is not rate-limited."""
+    host = url.host or ""
+    if host.startswith("profile."):
+        return "profile"
+    if host.startswith("halostats."):
+        return "stats"
+    if host.startswith("skill."):
+        return "skill"
+    if host.startswith("blobs-infiniteugc."):
+        return "film"
+    if host.startswith("discovery-infiniteugc."):
+        return "film" if url.path.startswith("/hi/films/") else "discovery_ugc"
+    return None
+
+
+@contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Run the enclosed API calls (and tasks spawned inside) at *level*."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    """Return the priority the current task's API calls run at."""
+    return _priority.get()
+
+
+def background() -> ContextManager[None]:
+    """Shorthand for ``priority(BACKGROUND)``, for crawlers and pollers."""
+    return priority(BACKGROUND)
+
+
+_WAIT_SECONDS = metrics.histogram(
+    "halo_rate_limit_wait_seconds", "Time spent waiting for a rate-limit token", ("family", "command")
+)
+_REQUEST_SECONDS = metrics.histogram(
+    "halo_api_request_seconds", "Halo API time to response headers", ("family", "command")
+)
+_RESPONSES = metrics.counter("halo_api_responses_total", "Halo API responses by status", ("family", "status"))
+
+
+async def _on_request_start(session, ctx, params: aiohttp.TraceRequestStartParams) -> None:
+    family = family_for(params.url)
+    if family is not None:
+        start = time.perf_counter()
+        await get_bucket(family).acquire()
+        ctx.start = time.perf_counter()
+        _WAIT_SECONDS.observe(ctx.start - start, family=family)
+
+
+async def _on_request_end(session, ctx, params: aiohttp.TraceRequestEndParams) -> None:
+    family = family_for(params.url)
+    if family is None:
+        return
+    _REQUEST_SECONDS.observe(time.perf_counter() - ctx.start, family=family)
+    _RESPONSES.inc(family=family, status=params.response.status)
+    bucket = get_bucket(family)
+    if params.response.status == 429:
+        bucket.on_throttled(_retry_after(params.response.headers.get("Retry-After")))
+    else:
+        bucket.on_success()
+
+
+async def _on_request_exception(session, ctx, params: aiohttp.TraceRequestExceptionParams) -> None:
+    family = family_for(params.url)
+    if family is not None:
+        _RESPONSES.inc(family=family, status="error")
+
+
+def trace_config() -> aiohttp.TraceConfig:
+    """Return a trace config that paces a session's Halo API requests."""
+    config = aiohttp.TraceConfig()
+    config.on_request_start.append(_on_request_start)
+    config.on_request_end.append(_on_request_end)
+    config.on_request_exception.append(_on_request_exception)
+    return config
+
+
+async def retry_throttled(call: Callable[[], Awaitable[T]], attempts: int = _RETRY_ATTEMPTS) -> T:
+    """Await ``call()``, retrying when it fails with ``429``.
+
+    The bucket has already been paused for ``Retry-After`` by the time the
+    error surfaces, so the retry simply queues behind that pause.
+    """
+    for attempt in range(attempts):
+        try:
+            return await call()
+        except ClientResponseError as e:
+            if e.status != 429 or attempt == attempts - 1:
+                raise
+            logger.info("Retrying throttled request (%d/%d)", attempt + 1, attempts - 1)
+    raise AssertionError("unreachable")
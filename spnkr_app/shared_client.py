@@ -0,0 +1,61 @@
+"""The process-owned Halo Infinite client for coalesced API calls.
+
+A call shared by several commands (see :mod:`spnkr_app.singleflight`) must
+not run on any one caller's client.  That client's session is closed when
+its ``get_client()`` block exits, and a caller that is cancelled or fails
+early would take the call down for every other waiter.  :data:`shared_client`
+belongs to the process instead.  Its session sits on the pooled connector
+and is paced by the rate limiter like every other client.  It picks up new
+tokens from :data:`~spnkr_app.auth.token_manager` as they are refreshed.
+"""
+
+import logging
+from typing import Optional
+
+import aiohttp
+from spnkr import HaloInfiniteClient
+
+from app import http_pool
+from spnkr_app import rate_limit
+from spnkr_app.auth import TokenManager, token_manager
+
+logger = logging.getLogger(__name__)
+
+
+class SharedClient:
+    """One :class:`HaloInfiniteClient` for work that no single command owns."""
+
+    def __init__(self, tokens: TokenManager) -> None:
+        self._tokens = tokens
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._client: Optional[HaloInfiniteClient] = None
+        self._current_tokens: Optional[tuple[str, str]] = None
+
+    async def get(self) -> HaloInfiniteClient:
+        """Return the client, carrying the current tokens."""
+        tokens = await self._tokens.get_tokens()
+        session = self._session
+        if session is None or session.closed or session.connector is not http_pool.get_connector():
+            # A session of its own: the client writes its tokens into the session headers
+            self._session = http_pool.new_session(trace_configs=[rate_limit.trace_config()])
+            self._client = HaloInfiniteClient(
+                session=self._session,
+                spartan_token=tokens[0],
+                clearance_token=tokens[1],
+                requests_per_second=50,
+            )
+        elif tokens != self._current_tokens:
+            self._client.set_tokens(*tokens)
+        self._current_tokens = tokens
+        return self._client
+
+    async def close(self) -> None:
+        """Close the client's session; the next :meth:`get` opens a new one."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._client = None
+        self._current_tokens = None
+
+
+shared_client = SharedClient(token_manager)
@@ -0,0 +1,81 @@
+"""Coalescing of identical in-flight API calls.
+
+When several commands ask for the same match, skill or gamertag at the same
+time, :class:`SingleFlight` runs the call once and hands every caller the
+same result (or exception).  The call runs as its own task on
+:data:`~spnkr_app.shared_client.shared_client`, never on a caller's client,
+so a caller that gives up (e.g. a cancelled interaction) or whose client
+closes does not fail it for the others.
+
+The task starts from an empty context: its metrics are not attributed to
+whichever command happened to start it.  It runs at the rate-limit priority
+of its callers, and calls are only shared between callers of the same
+priority, so a command never waits behind a background crawl's request.
+"""
+
+import asyncio
+import contextvars
+import logging
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from spnkr import HaloInfiniteClient
+
+from spnkr_app import rate_limit
+from spnkr_app.shared_client import shared_client
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+Call = Callable[[HaloInfiniteClient], Awaitable[T]]
+
+
+def _consume_exception(task: asyncio.Task) -> None:
+    # Every waiter may have been cancelled; do not warn about an unretrieved error
+    if not task.cancelled():
+        task.exception()
+
+
+def detach(call: Call[T], level: int) -> "asyncio.Task[T]":
+    """Run ``call(client)`` on the shared client as a task no caller owns, at priority *level*."""
+
+    async def run() -> T:
+        with rate_limit.priority(level):
+            return await call(await shared_client.get())
+
+    return asyncio.get_running_loop().create_task(run(), context=contextvars.Context())
+
+
+class SingleFlight:
+    """At most one in-flight call per key and priority."""
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+        self._calls: dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def task(self, key: Hashable, call: Call[T]) -> "asyncio.Task[T]":
+        """Return the in-flight task for *key*, starting ``call(client)`` if there is none."""
+        level = rate_limit.current_priority()
+        flight = (level, key)
+        task = self._calls.get(flight)
+        if task is not None:
+            logger.debug("Coalesced %s call %r", self._name, key)
+            return task
+
+        task = detach(call, level)
+        self._calls[flight] = task
+
+        def done(finished: asyncio.Task) -> None:
+            if self._calls.get(flight) is finished:
+                del self._calls[flight]
+            _consume_exception(finished)
+
+        task.add_done_callback(done)
+        return task
+
+    async def do(self, key: Hashable, call: Call[T]) -> T:
+        """Await ``call(client)``, sharing it with concurrent callers of the same *key*."""
+        return await asyncio.shield(self.task(key, call))
@@ -0,0 +1,89 @@
+"""Local store of match skill results (CSR changes and expected performance).
+
+A match's skill result is requested once, for all of its human players,
+and kept raw in the ``MatchSkillRecord`` table, zlib-compressed and keyed
+by match ID.  Matches the ingestion crawler has seen, or that /rank has
+shown before, are then read locally.  A 404 (no skill data, e.g. a custom
+game) is not stored.
+"""
+
+import json
+import logging
+import zlib
+from typing import Iterable, Optional
+from uuid import UUID
+
+from aiohttp import ClientResponseError
+from spnkr import HaloInfiniteClient
+from spnkr.models.skill import MatchSkill
+from spnkr.xuid import unwrap_xuid
+
+from app import metrics
+from database_app.database import get_match_skill_data, save_match_skill_data
+from spnkr_app import rate_limit
+from spnkr_app.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+def _key(match_id: str | UUID) -> str:
+    return str(match_id).lower()
+
+
+def _parse(body: bytes) -> MatchSkill:
+    with metrics.PARSE_SECONDS.time(model="match_skill"):
+        return MatchSkill(**json.loads(body))
+
+
+def _covers(match_skill: MatchSkill, xuids: Iterable[str | int]) -> bool:
+    players = {unwrap_xuid(value.id) for value in match_skill.value}
+    return all(unwrap_xuid(xuid) in players for xuid in xuids)
+
+
+_in_flight = SingleFlight("match skill")
+
+
+async def get_stored_match_skills(match_ids: Iterable[str | UUID]) -> list[Optional[MatchSkill]]:
+    """Return stored skill results for *match_ids* in one query, ``None`` where not stored."""
+    keys = [_key(match_id) for match_id in match_ids]
+    stored = await get_match_skill_data(set(keys))
+    parsed = {key: _parse(zlib.decompress(data)) for key, data in stored.items()}
+    metrics.cache_result("match_skill", "hit", len(parsed))
+    metrics.cache_result("match_skill", "miss", len(set(keys)) - len(parsed))
+    return [parsed.get(key) for key in keys]
+
+
+async def fetch_match_skill(
+    client: HaloInfiniteClient, match_id: str | UUID, xuids: Iterable[str | int]
+) -> Optional[MatchSkill]:
+    """Fetch a match's skill result for *xuids* and store it; ``None`` if the match has none.
+
+    The request runs on the shared client (see :mod:`spnkr_app.singleflight`).
+    """
+    key = _key(match_id)
+    xuids = list(xuids)
+
+    async def fetch(client: HaloInfiniteClient) -> Optional[MatchSkill]:
+        try:
+            resp = await rate_limit.retry_throttled(lambda: client.skill.get_match_skill(key, xuids))
+            body = await resp.read()
+        except ClientResponseError as e:
+            if e.status == 404:
+                return None
+            raise
+        match_skill = _parse(body)
+        await save_match_skill_data({key: zlib.compress(body)})
+        return match_skill
+
+    return await _in_flight.do((key, frozenset(unwrap_xuid(xuid) for xuid in xuids)), fetch)
+
+
+async def get_match_skill(
+    client: HaloInfiniteClient, match_id: str | UUID, xuids: Iterable[str | int]
+) -> Optional[MatchSkill]:
+    """Return a match's skill result from the store, fetching it if unseen or missing a player."""
+    xuids = list(xuids)
+    stored = (await get_stored_match_skills([match_id]))[0]
+    if stored is not None and _covers(stored, xuids):
+        return stored
+    return await fetch_match_skill(client, match_id, xuids)
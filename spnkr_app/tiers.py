@@ -0,0 +1,183 @@
+"""Tier estimation from match skill counterfactuals, vectorized with NumPy.
+
+Each player's skill result has a curve of the kills and deaths expected of
+a player of every tier (``tier_counterfactuals``).  Placing a player's
+expected (``self_counterfactuals``) and actual kills and deaths on that
+curve gives their estimated and performance tiers in CSR terms.  That
+works by linear interpolation between tiers, extrapolating above the top
+one.  The tiers whose expected kills and deaths are closest are also
+computed, and so is a rating letter for performance against expectation.
+
+:func:`estimate_match_skills` does all of this for every player of every
+match in one pass over ``(rows × tiers)`` arrays, so /rank computes a
+whole history once instead of once per embed.
+"""
+
+from typing import Iterable, NamedTuple, Optional, Sequence
+
+import numpy as np
+from spnkr.models.refdata import Tier
+from spnkr.models.skill import MatchSkill, MatchSkillResult
+
+TIER_CSR = {
+    "Bronze": 0,
+    "Silver": 300,
+    "Gold": 600,
+    "Platinum": 900,
+    "Diamond": 1200,
+    "Onyx": 1500,
+}
+
+# Percentage over/under the estimated tier: rating starts at each bound (inclusive)
+_RATING_BOUNDS = np.array([-20.0, -17.5, -15.0, -12.5, -10.0, -7.5, -5.0, -2.5, 0.0, 5.0, 10.0, 15.0, 20.0])
+_RATING_LETTERS = ("F", "D", "C-", "C", "C+", "B-", "B", "B+", "A-", "A+", "A++", "S", "SS", "SSS")
+
+
+class TierEstimate(NamedTuple):
+    """One player's tiers in a match; ranks are the closest tiers by kills and deaths."""
+
+    expected_tier: Optional[int]
+    performance_tier: Optional[int]
+    expected_kills_rank: Tier
+    expected_deaths_rank: Tier
+    kills_rank: Tier
+    deaths_rank: Tier
+    rating: str
+
+
+def _divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    # A flat curve segment contributes nothing instead of dividing by zero
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator != 0)
+
+
+def estimate_tiers(
+    kills: np.ndarray, deaths: np.ndarray, kill_curves: np.ndarray, death_curves: np.ndarray, tier_values: np.ndarray
+) -> np.ndarray:
+    """Place each row's kills and deaths on its tier curves; return rounded CSR values (NaN if unknown).
+
+    Args:
+        kills: ``(n,)`` kills per row.
+        deaths: ``(n,)`` deaths per row.
+        kill_curves: ``(n, tiers)`` expected kills per tier, in tier order.
+        death_curves: ``(n, tiers)`` expected deaths per tier.
+        tier_values: ``(n, tiers)`` CSR value of each tier.
+    """
+    rows = np.arange(len(kills))
+    in_segment = (kill_curves[:, :-1] <= kills[:, None]) & (kills[:, None] <= kill_curves[:, 1:])
+    has_segment = in_segment.any(axis=1)
+    segment = in_segment.argmax(axis=1)
+
+    lower_value = tier_values[rows, segment]
+    value_span = tier_values[rows, segment + 1] - lower_value
+
+    def interpolate(x: np.ndarray, curves: np.ndarray) -> np.ndarray:
+        lower = curves[rows, segment]
+        return lower_value + value_span * _divide(x - lower, curves[rows, segment + 1] - lower)
+
+    between = (interpolate(kills, kill_curves) + interpolate(deaths, death_curves)) / 2
+    above = tier_values[:, -1] + (kills - kill_curves[:, -1]) * _divide(
+        tier_values[:, -1] - tier_values[:, -2], kill_curves[:, -1] - kill_curves[:, -2]
+    )
+    return np.round(np.select(
+        [kills <= kill_curves[:, 0], kills >= kill_curves[:, -1], has_segment],
+        [tier_values[:, 0], above, between],
+        default=tier_values[:, -1],
+    ))
+
+
+def closest_tiers(values: np.ndarray, curves: np.ndarray) -> np.ndarray:
+    """Index of the tier whose curve value is closest to each row's value (first on ties)."""
+    return np.abs(curves - values[:, None]).argmin(axis=1)
+
+
+def performance_ratings(estimated: np.ndarray, performance: np.ndarray) -> list[str]:
+    """Rating letters for performance tiers against estimated tiers (``"?"`` if either is unknown)."""
+    estimated = np.where(estimated <= 0, 1.0, estimated)
+    percent = (performance - estimated) / estimated * 100
+    index = np.searchsorted(_RATING_BOUNDS, percent, side="right")
+    return [
+        "?" if np.isnan(p) else "A" if p == 0 else _RATING_LETTERS[i]
+        for p, i in zip(percent.tolist(), index.tolist())
+    ]
+
+
+def _optional_int(value: float) -> Optional[int]:
+    return None if value != value else int(value)  # NaN → None
+
+
+def _known_tiers(tiers: tuple[Tier, ...]) -> bool:
+    return len(tiers) >= 2 and all(tier in TIER_CSR for tier in tiers)
+
+
+def estimate_results(results: Sequence[MatchSkillResult]) -> list[Optional[TierEstimate]]:
+    """Estimate tiers for each skill result; ``None`` where it lacks counterfactuals or stats."""
+    estimates: list[Optional[TierEstimate]] = [None] * len(results)
+    # Results are grouped by tier list so each group is one rectangular array
+    groups: dict[tuple[Tier, ...], list[int]] = {}
+    for i, result in enumerate(results):
+        if result.counterfactuals is not None and result.stat_performances is not None:
+            groups.setdefault(tuple(result.counterfactuals.tier_counterfactuals), []).append(i)
+
+    for tiers, indices in groups.items():
+        if not _known_tiers(tiers):
+            continue
+        count = len(indices)
+        # (count, tiers, 2): expected kills and deaths of each tier
+        curves = np.empty((count, len(tiers), 2), dtype=np.float64)
+        # Rows 0..count-1 are the expected stats, count..2*count-1 the actual ones
+        stats = np.empty((2 * count, 2), dtype=np.float64)
+        for row, i in enumerate(indices):
+            counterfactuals = results[i].counterfactuals
+            performances = results[i].stat_performances
+            curves[row] = [(tier.kills, tier.deaths) for tier in counterfactuals.tier_counterfactuals.values()]
+            stats[row] = counterfactuals.self_counterfactuals.kills, counterfactuals.self_counterfactuals.deaths
+            stats[count + row] = performances.kills.count, performances.deaths.count
+
+        kill_curves = np.concatenate([curves[:, :, 0], curves[:, :, 0]])
+        death_curves = np.concatenate([curves[:, :, 1], curves[:, :, 1]])
+        tier_values = np.broadcast_to(np.array([TIER_CSR[t] for t in tiers], dtype=np.float64), kill_curves.shape)
+        kills, deaths = stats[:, 0], stats[:, 1]
+
+        tier = estimate_tiers(kills, deaths, kill_curves, death_curves, tier_values)
+        ratings = performance_ratings(tier[:count], tier[count:])
+        tier = tier.tolist()
+        kills_rank = closest_tiers(kills, kill_curves).tolist()
+        deaths_rank = closest_tiers(deaths, death_curves).tolist()
+        for row, i in enumerate(indices):
+            estimates[i] = TierEstimate(
+                expected_tier=_optional_int(tier[row]),
+                performance_tier=_optional_int(tier[count + row]),
+                expected_kills_rank=tiers[kills_rank[row]],
+                expected_deaths_rank=tiers[deaths_rank[row]],
+                kills_rank=tiers[kills_rank[count + row]],
+                deaths_rank=tiers[deaths_rank[count + row]],
+                rating=ratings[row],
+            )
+    return estimates
+
+
+def estimate_match_skills(match_skills: Iterable[MatchSkill]) -> list[dict[str, TierEstimate]]:
+    """Estimate every player of every match in one pass; one ``{player_id: estimate}`` per match."""
+    match_skills = list(match_skills)
+    keys = [(i, value.id) for i, match_skill in enumerate(match_skills) for value in match_skill.value]
+    estimates = estimate_results([value.result for match_skill in match_skills for value in match_skill.value])
+    by_match: list[dict[str, TierEstimate]] = [{} for _ in match_skills]
+    for (i, player_id), estimate in zip(keys, estimates):
+        if estimate is not None:
+            by_match[i][player_id] = estimate
+    return by_match
+
+
+def estimate_tier(self_counterfactuals, tier_counterfactuals) -> Optional[int]:
+    """Estimated tier of one set of counterfactuals, or ``None`` if it cannot be placed."""
+    tiers = tuple(tier_counterfactuals)
+    if not _known_tiers(tiers):
+        return None
+    tier = estimate_tiers(
+        np.array([self_counterfactuals.kills], dtype=np.float64),
+        np.array([self_counterfactuals.deaths], dtype=np.float64),
+        np.array([[tier_counterfactuals[t].kills for t in tiers]], dtype=np.float64),
+        np.array([[tier_counterfactuals[t].deaths for t in tiers]], dtype=np.float64),
+        np.array([[TIER_CSR[t] for t in tiers]], dtype=np.float64),
+    )
+    return _optional_int(tier[0].item())
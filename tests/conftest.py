@@ -0,0 +1,24 @@
+import os
+import pathlib
+import tempfile
+
+import pytest
+
+# app.tokens reads these at import; the tests never authenticate
+for name in ("BOT_TOKEN", "AZURE_CLIENT_ID", "AZURE_CLIENT_SECRET", "REDIRECT_URI", "AZURE_REFRESH_TOKEN"):
+    os.environ.setdefault(name, "test")
+
+# database_app resolves "database.db" against the working directory at import
+os.chdir(tempfile.mkdtemp(prefix="halobotti-tests-"))
+
+
+@pytest.fixture
+def fresh_database(monkeypatch):
+    """Delete the database file and forget that engine_start() ran; yield its path."""
+    from database_app import database
+
+    path = pathlib.Path(database.sqlite_file_name).resolve()
+    for leftover in path.parent.glob(path.name + "*"):
+        leftover.unlink()
+    monkeypatch.setattr(database, "_start_task", None)
+    yield path
@@ -0,0 +1,201 @@
+import asyncio
+import struct
+
+from aiohttp import WSMsgType, web
+
+from app import http_pool
+from app.amqp_service import (
+    _AMQP_DESC_TRANSFER,
+    _AMQP_PROTOCOL_HEADER,
+    AmqpFrameDecoder,
+    LobbySubscriber,
+    TransferAssembler,
+    _encode_uint_amqp,
+    _transfer_entries,
+    parse_playlist_bond,
+)
+from app.lobby_emulator import (
+    _DESC_DISPOSITION,
+    EmulatorConfig,
+    LobbyEmulator,
+    _data_section,
+    _encode_server_attach,
+    _encode_server_begin,
+    _encode_server_open,
+    _encode_transfer_frames,
+    _performative,
+    encode_playlist_response,
+    synthetic_playlists,
+)
+
+
+async def tokens():
+    return "spartan", "clearance"
+
+
+async def take(subscriber: LobbySubscriber, count: int) -> list[list[dict]]:
+    snapshots = []
+    async for entries in subscriber.snapshots():
+        snapshots.append(entries)
+        if len(snapshots) == count:
+            await subscriber.close()
+    return snapshots
+
+
+def test_flow_counts_from_server_sequence_numbers():
+    async def main():
+        config = EmulatorConfig(
+            playlists=5,
+            max_frame_size=128,  # several TRANSFER frames per delivery
+            next_outgoing_id=1000,
+            initial_delivery_count=500,
+        )
+        async with LobbyEmulator(config) as emulator:
+            subscriber = LobbySubscriber(tokens, link_credit=4, url=emulator.url)
+            try:
+                snapshots = await asyncio.wait_for(take(subscriber, 10), 5)
+            finally:
+                await http_pool.close()
+            return snapshots, emulator
+
+    snapshots, emulator = asyncio.run(main())
+    assert len(snapshots) == 10
+    assert all(len(entries) == 5 for entries in snapshots)
+    assert emulator.flow_violations == 0
+    assert emulator.connections == 1
+
+
+def test_max_age_rotation_reconnects_without_backoff():
+    async def main():
+        config = EmulatorConfig(playlists=1, transfer_latency=0.05)
+        async with LobbyEmulator(config) as emulator:
+            subscriber = LobbySubscriber(tokens, max_connection_age=0.2, url=emulator.url)
+            # Backing off after the rotation would take 4s or more
+            try:
+                await asyncio.wait_for(take(subscriber, 8), 2)
+            finally:
+                await http_pool.close()
+            return emulator
+
+    emulator = asyncio.run(main())
+    assert emulator.connections >= 2
+
+
+def test_truncated_payload_yields_only_complete_entries():
+    playlists = synthetic_playlists(3)
+    payload = encode_playlist_response(playlists)
+    full = parse_playlist_bond(payload)
+    assert [entry["asset_id"] for entry in full] == [p["asset_id"] for p in playlists]
+
+    for length in range(len(payload)):
+        entries = parse_playlist_bond(payload[:length])
+        assert entries == full[:len(entries)], length
+
+
+def transfer(delivery_id: int, payload: bytes, *, settled=False, more=False, aborted=False) -> bytes:
+    tag = struct.pack('>I', delivery_id)
+    items = (b'\x43'                              # handle
+             + _encode_uint_amqp(delivery_id)     # delivery-id
+             + b'\xa0' + bytes([len(tag)]) + tag  # delivery-tag
+             + b'\x43'                            # message-format
+             + (b'\x41' if settled else b'\x42')  # settled
+             + (b'\x41' if more else b'\x42')     # more
+             + b'\x40' * 3                        # rcv-settle-mode, state, resume
+             + (b'\x41' if aborted else b'\x42'))  # aborted
+    return _performative(0x14, items, 10, payload=payload)
+
+
+def heartbeat() -> bytes:
+    return struct.pack('>IBBH', 8, 2, 0, 0)
+
+
+def assemble(frames) -> list[list[str]]:
+    """Asset IDs of every message the decoded TRANSFER frames complete."""
+    transfers = TransferAssembler()
+    messages = []
+    for frame in frames:
+        assert frame.descriptor == _AMQP_DESC_TRANSFER
+        message = transfers.add(frame)
+        if message is not None:
+            messages.append([entry["asset_id"] for entry in _transfer_entries(message)])
+    return messages
+
+
+def test_decoder_joins_a_frame_split_across_messages():
+    playlists = synthetic_playlists(4)
+    stream = b"".join(_encode_transfer_frames(1, _data_section(encode_playlist_response(playlists)), 65536))
+    for size in (1, 3, 8, 9, len(stream) - 1):
+        decoder = AmqpFrameDecoder()
+        frames = []
+        for i in range(0, len(stream), size):
+            frames += decoder.feed(stream[i:i + size])
+        assert assemble(frames) == [[p["asset_id"] for p in playlists]], size
+
+
+def test_decoder_returns_every_frame_in_one_message():
+    first, second = synthetic_playlists(2, seed=1), synthetic_playlists(3, seed=2)
+    stream = (_AMQP_PROTOCOL_HEADER
+              + b"".join(_encode_transfer_frames(1, _data_section(encode_playlist_response(first)), 65536))
+              + heartbeat()
+              + b"".join(_encode_transfer_frames(2, _data_section(encode_playlist_response(second)), 65536)))
+    frames = AmqpFrameDecoder().feed(stream)
+    assert [frame.descriptor for frame in frames] == [_AMQP_DESC_TRANSFER, None, _AMQP_DESC_TRANSFER]
+    assert assemble(f for f in frames if f.descriptor) == [
+        [p["asset_id"] for p in first],
+        [p["asset_id"] for p in second],
+    ]
+
+
+def test_multi_transfer_delivery_is_joined_and_aborts_are_dropped():
+    playlists = synthetic_playlists(6)
+    message = _data_section(encode_playlist_response(playlists))
+    parts = _encode_transfer_frames(3, message, 100)
+    assert len(parts) > 2
+    stream = (transfer(2, message[:50], more=True)
+              + transfer(2, b"", aborted=True)
+              + b"".join(parts))
+    assert assemble(AmqpFrameDecoder().feed(stream)) == [[p["asset_id"] for p in playlists]]
+
+
+def test_aborted_delivery_is_not_settled():
+    """A settled delivery after an aborted one must not inherit its delivery-id."""
+    dispositions = []
+
+    async def handle(request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(protocols=("AMQPWSB10",))
+        await ws.prepare(request)
+        decoder = AmqpFrameDecoder()
+        async for msg in ws:
+            if msg.type != WSMsgType.BINARY:
+                continue
+            if msg.data[:8] == _AMQP_PROTOCOL_HEADER:
+                await ws.send_bytes(_AMQP_PROTOCOL_HEADER + _encode_server_open()
+                                    + _encode_server_begin() + _encode_server_attach("link"))
+                message = _data_section(encode_playlist_response(synthetic_playlists(2)))
+                await ws.send_bytes(transfer(7, message[:20], more=True)
+                                    + transfer(7, b"", aborted=True)
+                                    + transfer(8, message, settled=True)
+                                    + transfer(9, message))
+            for frame in decoder.feed(msg.data):
+                if frame.descriptor == _DESC_DISPOSITION:
+                    dispositions.append(frame.fields[1])
+        return ws
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = runner.addresses[0][:2]
+        subscriber = LobbySubscriber(tokens, url=f"ws://{host}:{port}/")
+        try:
+            return await asyncio.wait_for(take(subscriber, 2), 5)
+        finally:
+            await http_pool.close()
+            await runner.cleanup()
+
+    snapshots = asyncio.run(main())
+    assert [len(entries) for entries in snapshots] == [2, 2]
+    assert dispositions == [9]
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from database_app import database
+
+
+async def dispose_engines():
+    await database.engine.dispose()
+    await database.read_engine.dispose()
+
+
+def test_nested_writer_session_raises():
+    async def main():
+        async with database.write_session():
+            with pytest.raises(RuntimeError):
+                async with database.write_session():
+                    pass
+
+            async def spawned():
+                async with database.write_session():
+                    pass
+
+            with pytest.raises(RuntimeError):
+                await asyncio.create_task(spawned())
+
+        # Sequential sessions are fine
+        async with database.write_session():
+            pass
+
+    asyncio.run(main())
+
+
+def test_engine_start_prepares_the_file_for_readers(fresh_database):
+    async def main():
+        try:
+            await asyncio.gather(database.engine_start(), database.engine_start())
+            assert await database.get_all_matches() == []
+            async with database.read_engine.connect() as conn:
+                return (await conn.execute(text("PRAGMA journal_mode"))).scalar()
+        finally:
+            await dispose_engines()
+
+    assert asyncio.run(main()) == "wal"
+    assert fresh_database.exists()
@@ -0,0 +1,52 @@
+import asyncio
+from types import SimpleNamespace as NS
+
+from aiohttp import web
+
+from app import http_pool
+from discord_app.embeds import get_map_image
+
+FALLBACK = "https://img.freepik.com/"
+
+
+async def map_images(behaviour: dict[str, tuple[int, int]]) -> dict[str, str]:
+    """Serve ``/<map>/images/<file>`` with ``(HEAD status, GET status)``; return each map's image URL."""
+
+    async def handle(request: web.Request) -> web.Response:
+        head, get = behaviour.get(f"{request.match_info['map']}/{request.match_info['file']}", (404, 404))
+        return web.Response(status=head if request.method == "HEAD" else get, body=b"image")
+
+    app = web.Application()
+    app.router.add_route("*", "/{map}/images/{file}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    try:
+        maps = {name.split("/")[0] for name in behaviour}
+        return {
+            name: await get_map_image(NS(files=NS(prefix=f"http://{host}:{port}/{name}/")))
+            for name in sorted(maps)
+        }
+    finally:
+        await http_pool.close()
+        await runner.cleanup()
+
+
+def test_only_404_falls_back():
+    images = asyncio.run(map_images({
+        "ok/thumbnail.jpg": (200, 200),
+        "forbidden_head/thumbnail.jpg": (403, 200),
+        "no_head/thumbnail.jpg": (405, 200),
+        "flaky/thumbnail.jpg": (503, 503),
+        "png/thumbnail.jpg": (404, 404),
+        "png/thumbnail.png": (200, 200),
+        "missing/thumbnail.jpg": (405, 404),
+    }))
+    assert images["ok"].endswith("/ok/images/thumbnail.jpg")
+    assert images["forbidden_head"].endswith("/forbidden_head/images/thumbnail.jpg")
+    assert images["no_head"].endswith("/no_head/images/thumbnail.jpg")
+    assert images["flaky"].endswith("/flaky/images/thumbnail.jpg")
+    assert images["png"].endswith("/png/images/thumbnail.png")
+    assert images["missing"].startswith(FALLBACK)
@@ -0,0 +1,50 @@
+import asyncio
+from types import SimpleNamespace as NS
+
+from aiohttp import ClientResponseError
+from spnkr.models.refdata import LifecycleMode
+
+from spnkr_app import ingest
+from spnkr_app.ingest import MatchIngestor
+
+
+def match(match_id: str) -> NS:
+    return NS(
+        match_id=match_id,
+        xuids=["xuid(1)"],
+        match_info=NS(
+            lifecycle_mode=LifecycleMode.CUSTOM,
+            ugc_game_variant=NS(asset_id=f"variant-{match_id}", version_id="v1"),
+        ),
+    )
+
+
+class Assets:
+    async def get(self, client, asset_type, asset_id, version_id):
+        if asset_id == "variant-broken":
+            raise ClientResponseError(None, (), status=500)
+        return NS(public_name="Slayer")
+
+
+class Profiles:
+    async def get_profiles(self, client, xuids):
+        return []
+
+
+def test_failed_asset_lookup_skips_only_its_match(monkeypatch):
+    saved = {}
+
+    async def get_match_stats_many(client, match_ids, view=False):
+        return [match(match_id) for match_id in match_ids]
+
+    async def save_ingested_matches(links, validity):
+        saved.update(validity)
+
+    monkeypatch.setattr(ingest.match_store, "get_match_stats_many", get_match_stats_many)
+    monkeypatch.setattr(ingest.match_validity, "evaluate", lambda stats, gamemodes: [True] * len(stats))
+    monkeypatch.setattr(ingest, "save_ingested_matches", save_ingested_matches)
+
+    ingestor = MatchIngestor(None, Profiles(), Assets())
+    count = asyncio.run(ingestor._ingest_matches(None, ["first", "broken", "last"]))
+    assert count == 2
+    assert saved == {"first": True, "last": True}
@@ -0,0 +1,115 @@
+import datetime
+import itertools
+import random
+from types import SimpleNamespace as NS
+
+from spnkr_app.match_validity import SCORELIMIT, TIMELIMIT, VALID_SINCE, evaluate_matches
+
+
+def baseline_validity(match, date=VALID_SINCE):
+    """The per-match rules as they were before the NumPy rewrite."""
+    match_stats = match.match_stats
+    if not match_stats.match_info.start_time >= date:
+        return False
+    if not match_stats.match_info.teams_enabled:
+        return False
+    gamemode = match.match_gamemode.public_name
+    if gamemode not in SCORELIMIT:
+        return False
+    present = len([player for player in match_stats.players if player.participation_info.present_at_completion])
+    if (
+            match_stats.match_info.playable_duration >= TIMELIMIT[gamemode]
+            and present == 8
+            and [team for team in match_stats.teams
+                 if team.stats.core_stats.rounds_won == SCORELIMIT[gamemode][1]]
+    ):
+        return True
+    return bool(
+        [team for team in match_stats.teams
+         if team.stats.core_stats.score >= SCORELIMIT[gamemode][0]
+         and team.stats.core_stats.rounds_won == SCORELIMIT[gamemode][1]]
+        and present == 8
+    )
+
+
+def make_match(gamemode, start_time=VALID_SINCE, duration=datetime.timedelta(minutes=12),
+               team_sizes=(4, 4), bot_teams=(), absent=0, teams_enabled=True, scores=(50, 30), rounds=(1, 0)):
+    players = []
+    for team_id, size in enumerate(team_sizes):
+        for _ in range(size):
+            players.append(NS(
+                is_human=team_id not in bot_teams,
+                last_team_id=team_id,
+                participation_info=NS(present_at_completion=True),
+            ))
+    for player in players[:absent]:
+        player.participation_info.present_at_completion = False
+    teams = [
+        NS(team_id=team_id, stats=NS(core_stats=NS(score=score, rounds_won=won)))
+        for team_id, (score, won) in enumerate(zip(scores, rounds))
+    ]
+    info = NS(start_time=start_time, teams_enabled=teams_enabled, playable_duration=duration)
+    return NS(
+        match_stats=NS(match_info=info, players=players, teams=teams),
+        match_gamemode=NS(public_name=gamemode),
+    )
+
+
+def assert_same(matches):
+    assert list(evaluate_matches(matches)) == [baseline_validity(match) for match in matches]
+
+
+def test_valid_since_cutoff():
+    just_before = VALID_SINCE - datetime.timedelta(microseconds=1)
+    matches = [make_match("Ranked:Slayer", start_time=t) for t in (just_before, VALID_SINCE)]
+    assert list(evaluate_matches(matches)) == [False, True]
+    assert_same(matches)
+
+
+def test_team_sizes_and_bot_only_teams():
+    matches = [
+        make_match("Ranked:Slayer", team_sizes=sizes, bot_teams=bots, absent=absent)
+        for sizes in ((4, 4), (4, 3), (5, 4), (8,), (2, 2, 2, 2), (4, 4, 1))
+        for bots in ((), (1,), (0, 1))
+        for absent in (0, 1)
+    ]
+    assert_same(matches)
+    # a full lobby counts whether its players are human or not
+    assert evaluate_matches([make_match("Ranked:Slayer", bot_teams=(1,))])[0]
+    assert not evaluate_matches([make_match("Ranked:Slayer", team_sizes=(4, 3))])[0]
+
+
+def test_limits_at_their_boundaries():
+    matches = []
+    for gamemode, (score, rounds) in SCORELIMIT.items():
+        limit = TIMELIMIT[gamemode]
+        for duration, team_score, won in itertools.product(
+            (limit - datetime.timedelta(seconds=1), limit), (score - 1, score), (rounds - 1, rounds, rounds + 1),
+        ):
+            matches.append(make_match(gamemode, duration=duration, scores=(team_score, 0), rounds=(won, 0)))
+    matches.append(make_match("Ranked:Slayer", teams_enabled=False))
+    matches.append(make_match("Unranked:Slayer"))
+    assert_same(matches)
+
+
+def test_randomized_batch_matches_baseline():
+    rng = random.Random(20)
+    gamemodes = [*SCORELIMIT, "Quick Play:Slayer"]
+    matches = []
+    for _ in range(500):
+        gamemode = rng.choice(gamemodes)
+        score, rounds = SCORELIMIT.get(gamemode, (50, 1))
+        limit = TIMELIMIT.get(gamemode, datetime.timedelta(minutes=12))
+        team_count = rng.choice((1, 2, 2, 2, 4))
+        matches.append(make_match(
+            gamemode,
+            start_time=VALID_SINCE + datetime.timedelta(days=rng.randint(-3, 3)),
+            duration=limit + datetime.timedelta(seconds=rng.randint(-60, 60)),
+            team_sizes=[rng.randint(1, 5) for _ in range(team_count)],
+            bot_teams=[team for team in range(team_count) if rng.random() < 0.2],
+            absent=rng.randint(0, 1),
+            teams_enabled=rng.random() < 0.9,
+            scores=[rng.randint(score - 2, score + 1) for _ in range(team_count)],
+            rounds=[rng.randint(max(0, rounds - 1), rounds + 1) for _ in range(team_count)],
+        ))
+    assert_same(matches)
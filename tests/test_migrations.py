@@ -0,0 +1,97 @@
+import asyncio
+import sqlite3
+
+from sqlmodel import SQLModel, create_engine
+
+from database_app import database, migrations
+
+# What the drop-and-recreate startup left behind: SQLModel create_all of the
+# models before versioning, with user_version still 0
+BASELINE_SCHEMA = """
+CREATE TABLE channel (
+    id INTEGER NOT NULL, guild_id INTEGER NOT NULL, log_channel_id INTEGER, leaderboard_channel_id INTEGER,
+    PRIMARY KEY (id), UNIQUE (guild_id)
+);
+CREATE TABLE custommatch (
+    id INTEGER NOT NULL, match_id CHAR(32) NOT NULL, is_valid BOOLEAN NOT NULL,
+    PRIMARY KEY (id), UNIQUE (match_id)
+);
+CREATE TABLE customplayer (
+    id INTEGER NOT NULL, gamertag VARCHAR NOT NULL, xuid INTEGER NOT NULL, is_valid BOOLEAN NOT NULL,
+    validation_message BOOLEAN NOT NULL,
+    PRIMARY KEY (id), UNIQUE (xuid)
+);
+CREATE TABLE linktable (
+    custom_match_id INTEGER NOT NULL, custom_player_id INTEGER NOT NULL,
+    PRIMARY KEY (custom_match_id, custom_player_id),
+    FOREIGN KEY(custom_match_id) REFERENCES custommatch (id),
+    FOREIGN KEY(custom_player_id) REFERENCES customplayer (id)
+);
+CREATE TABLE playlistinfo (
+    asset_id VARCHAR NOT NULL, version_id VARCHAR NOT NULL, playlist_name VARCHAR, last_seen DATETIME NOT NULL,
+    PRIMARY KEY (asset_id)
+);
+CREATE TABLE playlistwaittimerecord (
+    id INTEGER NOT NULL, asset_id VARCHAR NOT NULL, version_id VARCHAR NOT NULL, playlist_name VARCHAR,
+    wait_time_ms INTEGER NOT NULL, recorded_at DATETIME NOT NULL,
+    PRIMARY KEY (id)
+);
+CREATE INDEX ix_playlistwaittimerecord_asset_id ON playlistwaittimerecord (asset_id);
+CREATE INDEX ix_playlistwaittimerecord_recorded_at ON playlistwaittimerecord (recorded_at);
+INSERT INTO customplayer VALUES (1, 'Player', 2533274800000000, 1, 0);
+"""
+
+
+def schema(connection: sqlite3.Connection) -> dict:
+    """Columns, primary keys, indexes and foreign keys of every table."""
+    tables = [name for (name,) in connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    )]
+    result = {}
+    for table in tables:
+        indexes = {
+            name: (unique, [column for _, _, column in connection.execute(f"PRAGMA index_info('{name}')")])
+            for _, name, unique, _, _ in connection.execute(f"PRAGMA index_list('{table}')")
+        }
+        result[table] = {
+            "columns": [row[1:] for row in connection.execute(f"PRAGMA table_info('{table}')")],
+            "indexes": indexes,
+            "foreign_keys": sorted(row[2:5] for row in connection.execute(f"PRAGMA foreign_key_list('{table}')")),
+        }
+    return result
+
+
+def model_schema(tmp_path) -> dict:
+    path = tmp_path / "models.db"
+    SQLModel.metadata.create_all(create_engine(f"sqlite:///{path}"))
+    with sqlite3.connect(path) as connection:
+        return schema(connection)
+
+
+async def start_and_stop():
+    try:
+        await database.engine_start()
+    finally:
+        await database.engine.dispose()
+        await database.read_engine.dispose()
+
+
+def test_baseline_database_migrates_once(fresh_database, monkeypatch, tmp_path):
+    with sqlite3.connect(fresh_database) as connection:
+        connection.executescript(BASELINE_SCHEMA)
+
+    asyncio.run(start_and_stop())
+    with sqlite3.connect(fresh_database) as connection:
+        migrated = schema(connection)
+        connection.execute("INSERT INTO channel (guild_id) VALUES (1)")
+
+    # A second start is a no-op that keeps the data
+    monkeypatch.setattr(database, "_start_task", None)
+    asyncio.run(start_and_stop())
+
+    with sqlite3.connect(fresh_database) as connection:
+        assert connection.execute("PRAGMA user_version").fetchone()[0] == migrations.LATEST_VERSION == 3
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert connection.execute("SELECT guild_id FROM channel").fetchall() == [(1,)]
+        assert schema(connection) == migrated
+    assert migrated == model_schema(tmp_path)
@@ -0,0 +1,74 @@
+import asyncio
+import uuid
+from types import SimpleNamespace as NS
+
+import pytest
+
+from spnkr_app import playlists
+from spnkr_app.playlists import CUSTOM, RANKED, SOCIAL, PlaylistClassifier
+
+ARENA = uuid.UUID("edfef3ac-9cbe-4fa2-b949-8f29deafd483")
+V1 = uuid.UUID("11111111-1111-1111-1111-111111111111")
+V2 = uuid.UUID("22222222-2222-2222-2222-222222222222")
+
+
+class Assets:
+    def __init__(self, names: dict[tuple[str, str], str]) -> None:
+        self.names = names
+        self.lookups = []
+
+    async def get(self, client, asset_type, asset_id, version_id):
+        self.lookups.append((asset_id, version_id))
+        name = self.names.get((asset_id, version_id))
+        return NS(public_name=name) if name else None
+
+
+@pytest.fixture
+def stored(monkeypatch):
+    rows = {}
+
+    async def get_playlist_categories():
+        return {key: category for key, (category, _) in rows.items()}
+
+    async def save_playlist_category(asset_id, version_id, category, playlist_name):
+        rows[asset_id, version_id] = (category, playlist_name)
+
+    monkeypatch.setattr(playlists, "get_playlist_categories", get_playlist_categories)
+    monkeypatch.setattr(playlists, "save_playlist_category", save_playlist_category)
+    return rows
+
+
+def playlist(version):
+    return NS(asset_id=ARENA, version_id=version)
+
+
+def test_new_version_is_classified_again(stored):
+    assets = Assets({
+        (str(ARENA), str(V1)): "Ranked Arena",
+        (str(ARENA), str(V2)): "Ranked Arena (Retired)",
+    })
+
+    async def main():
+        classifier = PlaylistClassifier(assets)
+        first = await classifier.classify_many(None, [playlist(V1), playlist(V1), None])
+        second = await classifier.classify_many(None, [playlist(V1), playlist(V2)])
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first == [RANKED, RANKED, CUSTOM]
+    assert second == [RANKED, SOCIAL]
+    # One lookup per version, however many matches share it
+    assert assets.lookups == [(str(ARENA), str(V1)), (str(ARENA), str(V2))]
+    assert stored[str(ARENA), str(V1)] == (RANKED, "Ranked Arena")
+    assert stored[str(ARENA), str(V2)] == (SOCIAL, "Ranked Arena (Retired)")
+
+
+def test_stored_categories_are_loaded_per_version(stored):
+    stored[str(ARENA), str(V1)] = (RANKED, "Ranked Arena")
+    assets = Assets({(str(ARENA), str(V2)): "Ranked Arena"})
+
+    async def main():
+        return await PlaylistClassifier(assets).classify_many(None, [playlist(V1), playlist(V2)])
+
+    assert asyncio.run(main()) == [RANKED, RANKED]
+    assert assets.lookups == [(str(ARENA), str(V2))]
@@ -0,0 +1,67 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from database_app.models import CustomPlayer
+from spnkr_app import profiles
+from spnkr_app.shared_client import shared_client
+
+XUIDS = [2535400000000001, 2535400000000002]
+
+
+class FakeProfileService:
+    def __init__(self, release: asyncio.Event) -> None:
+        self.release = release
+        self.started = asyncio.Event()
+        self.requests = []
+
+    async def get_users_by_id(self, xuids):
+        self.requests.append(list(xuids))
+        self.started.set()
+        await self.release.wait()
+        users = [SimpleNamespace(xuid=xuid, gamertag=f"player{xuid % 10}") for xuid in xuids]
+
+        async def parse():
+            return users
+
+        return SimpleNamespace(parse=parse)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = FakeProfileService(asyncio.Event())
+
+    async def get():
+        return SimpleNamespace(profile=service)
+
+    async def no_players(xuids):
+        return []
+
+    async def upsert_players(users, refreshed_at=None):
+        return [CustomPlayer(xuid=user.xuid, gamertag=user.gamertag, last_refreshed=refreshed_at) for user in users]
+
+    monkeypatch.setattr(shared_client, "get", get)
+    monkeypatch.setattr(profiles, "get_players_by_xuids", no_players)
+    monkeypatch.setattr(profiles, "upsert_players", upsert_players)
+    return service
+
+
+def test_cancelled_owner_does_not_fail_joined_batch(service):
+    async def main():
+        cache = profiles.ProfileCache()
+        owner_client = object()  # never used: the batch runs on the shared client
+        owner = asyncio.create_task(cache.get_profiles(owner_client, XUIDS))
+        await service.started.wait()
+        other = asyncio.create_task(cache.get_profiles(object(), XUIDS[:1]))
+        await asyncio.sleep(0)
+        owner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+
+        service.release.set()
+        players = await other
+        assert [player.xuid for player in players] == XUIDS[:1]
+        assert service.requests == [XUIDS]
+
+    asyncio.run(main())
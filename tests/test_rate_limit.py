@@ -0,0 +1,120 @@
+import asyncio
+import time
+from types import SimpleNamespace as NS
+
+import pytest
+
+from spnkr_app import rate_limit
+from spnkr_app.rate_limit import BACKGROUND, INTERACTIVE, TokenBucket
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # Only the module's view of time is faked; the event loop keeps its own clock
+    monkeypatch.setattr(rate_limit, "time", NS(monotonic=clock.monotonic, time=time.time,
+                                                perf_counter=time.perf_counter))
+    monkeypatch.setattr(rate_limit, "_buckets", {})
+    return clock
+
+
+async def settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_waiters_are_served_by_priority_then_fifo(clock):
+    async def main():
+        bucket = TokenBucket("test", rate=1.0, burst=1)
+        await bucket.acquire()  # the burst token
+        served = []
+
+        async def request(name, level):
+            await bucket.acquire(level)
+            served.append(name)
+
+        tasks = [
+            asyncio.create_task(request("crawler 1", BACKGROUND)),
+            asyncio.create_task(request("crawler 2", BACKGROUND)),
+            asyncio.create_task(request("command 1", INTERACTIVE)),
+            asyncio.create_task(request("command 2", INTERACTIVE)),
+        ]
+        await settle()
+        assert served == []
+        for _ in tasks:
+            clock.now += 1.0
+            bucket._drain()
+            await settle()
+        await asyncio.gather(*tasks)
+        return served
+
+    assert asyncio.run(main()) == ["command 1", "command 2", "crawler 1", "crawler 2"]
+
+
+def test_retry_after_pauses_the_bucket_and_halves_the_rate(clock):
+    async def main():
+        bucket = TokenBucket("test", rate=4.0, burst=4)
+        bucket.on_throttled(30.0)
+        assert bucket.rate == 2.0
+        assert bucket._try_take() == pytest.approx(30.0)
+
+        waiter = asyncio.create_task(bucket.acquire())
+        clock.now += 29.5
+        await settle()
+        bucket._drain()
+        await settle()
+        assert not waiter.done()
+
+        clock.now += 0.5
+        bucket._drain()
+        await settle()
+        assert waiter.done()
+
+    asyncio.run(main())
+
+
+def test_missing_retry_after_backs_off_exponentially(clock):
+    bucket = TokenBucket("test", rate=1.0, burst=1)
+    pauses = []
+    for _ in range(3):
+        bucket.on_throttled(None)
+        pauses.append(bucket._blocked_until - clock.now)
+        clock.now = bucket._blocked_until
+    assert pauses == [rate_limit._BACKOFF_INITIAL, rate_limit._BACKOFF_INITIAL * 2, rate_limit._BACKOFF_INITIAL * 4]
+
+    # A success resets the backoff, and the rate never drops below the floor
+    bucket.on_success()
+    for _ in range(10):
+        bucket.on_throttled(None)
+        clock.now = bucket._blocked_until
+        assert bucket.rate >= rate_limit._MIN_RATE
+    assert bucket.rate == rate_limit._MIN_RATE
+    assert bucket._backoff == rate_limit._BACKOFF_MAX
+
+
+def test_rate_recovers_per_family(clock):
+    stats = rate_limit.get_bucket("stats")
+    profile = rate_limit.get_bucket("profile")
+    assert rate_limit.get_bucket("stats") is stats
+
+    stats.on_throttled(1.0)
+    assert stats.rate == stats.max_rate / 2
+    assert profile.rate == profile.max_rate
+    assert profile._try_take() == 0.0
+
+    # Each success adds max_rate / _RECOVERY_STEPS, up to the ceiling
+    steps = rate_limit._RECOVERY_STEPS // 2
+    for i in range(steps - 1):
+        stats.on_success()
+        assert stats.rate == pytest.approx(stats.max_rate * (0.5 + (i + 1) / rate_limit._RECOVERY_STEPS))
+    stats.on_success()
+    stats.on_success()
+    assert stats.rate == stats.max_rate
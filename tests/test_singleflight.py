@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from app import metrics
+from spnkr_app import rate_limit
+from spnkr_app.shared_client import shared_client
+from spnkr_app.singleflight import SingleFlight
+
+SHARED = object()
+
+
+@pytest.fixture(autouse=True)
+def fake_shared_client(monkeypatch):
+    async def get():
+        return SHARED
+
+    monkeypatch.setattr(shared_client, "get", get)
+
+
+def test_cancelled_owner_does_not_fail_other_waiters():
+    async def main():
+        flight = SingleFlight("test")
+        started = asyncio.Event()
+        release = asyncio.Event()
+        clients = []
+
+        async def call(client):
+            clients.append(client)
+            started.set()
+            await release.wait()
+            return "result"
+
+        owner = asyncio.create_task(flight.do("key", call))
+        await started.wait()
+        waiter = asyncio.create_task(flight.do("key", call))
+        await asyncio.sleep(0)
+        owner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+
+        release.set()
+        assert await waiter == "result"
+        assert clients == [SHARED]
+        assert len(flight) == 0
+
+    asyncio.run(main())
+
+
+def test_call_does_not_inherit_the_first_callers_context():
+    async def main():
+        flight = SingleFlight("test")
+        seen = []
+
+        async def call(client):
+            seen.append((metrics.current_command(), rate_limit.current_priority()))
+
+        with metrics.command("rank"), rate_limit.background():
+            await flight.do("key", call)
+        await flight.do("key", call)
+
+        assert seen == [("background", rate_limit.BACKGROUND), ("background", rate_limit.INTERACTIVE)]
+
+    asyncio.run(main())
+
+
+def test_interactive_callers_do_not_join_background_calls():
+    async def main():
+        flight = SingleFlight("test")
+        release = asyncio.Event()
+        calls = 0
+
+        async def call(client):
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return calls
+
+        with rate_limit.background():
+            crawl = asyncio.create_task(flight.do("key", call))
+        command = asyncio.create_task(flight.do("key", call))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(crawl, command)
+        assert calls == 2
+
+    asyncio.run(main())
@@ -0,0 +1,150 @@
+import random
+from types import SimpleNamespace as NS
+
+import pytest
+from spnkr.models.refdata import Tier
+
+from spnkr_app.tiers import TIER_CSR, estimate_match_skills
+
+TIERS = (Tier.BRONZE, Tier.SILVER, Tier.GOLD, Tier.PLATINUM, Tier.DIAMOND, Tier.ONYX)
+
+
+# ── The per-player code the vectorized engine replaced ───────────────────────
+
+def loop_estimate_tier(counterfactuals, tier_counterfactuals):
+    kills, deaths = counterfactuals.kills, counterfactuals.deaths
+    tier_names = list(tier_counterfactuals.keys())
+    kill_values = [tier_counterfactuals[t].kills for t in tier_names]
+    death_values = [tier_counterfactuals[t].deaths for t in tier_names]
+    tier_values = [TIER_CSR[t] for t in tier_names]
+    if kills <= kill_values[0]:
+        return TIER_CSR[tier_names[0]]
+    if kills >= kill_values[-1]:
+        return round(tier_values[-1] + (kills - kill_values[-1]) * (tier_values[-1] - tier_values[-2])
+                     / (kill_values[-1] - kill_values[-2]))
+    for i in range(len(tier_names) - 1):
+        if kill_values[i] <= kills <= kill_values[i + 1]:
+            kill_tier = tier_values[i] + (tier_values[i + 1] - tier_values[i]) * (
+                (kills - kill_values[i]) / (kill_values[i + 1] - kill_values[i]))
+            death_tier = tier_values[i] + (tier_values[i + 1] - tier_values[i]) * (
+                (deaths - death_values[i]) / (death_values[i + 1] - death_values[i]))
+            return round((kill_tier + death_tier) / 2)
+    return round(tier_values[-1])
+
+
+def loop_closest_rank(counterfactuals, tier_counterfactuals):
+    def closest_by_stat(stat):
+        return min(tier_counterfactuals,
+                   key=lambda rank: abs(getattr(counterfactuals, stat) - getattr(tier_counterfactuals[rank], stat)))
+    return closest_by_stat("kills"), closest_by_stat("deaths")
+
+
+def loop_rating(estimated_tier, performance_tier):
+    est, perf = float(estimated_tier), float(performance_tier)
+    if est <= 0:
+        est = 1.0
+    percent = (perf - est) / est * 100
+    for bound, letter in ((20.0, "SSS"), (15.0, "SS"), (10.0, "S"), (5.0, "A++")):
+        if percent >= bound:
+            return letter
+    if percent > 0.0:
+        return "A+"
+    if percent == 0.0:
+        return "A"
+    for bound, letter in ((-2.5, "A-"), (-5.0, "B+"), (-7.5, "B"), (-10.0, "B-"), (-12.5, "C+"),
+                          (-15.0, "C"), (-17.5, "C-"), (-20.0, "D")):
+        if percent >= bound:
+            return letter
+    return "F"
+
+
+def loop_estimate(result):
+    counterfactuals = result.counterfactuals
+    actual = NS(kills=result.stat_performances.kills.count, deaths=result.stat_performances.deaths.count)
+    tiers = counterfactuals.tier_counterfactuals
+    estimated = loop_estimate_tier(counterfactuals.self_counterfactuals, tiers)
+    performance = loop_estimate_tier(actual, tiers)
+    return (
+        estimated,
+        performance,
+        *loop_closest_rank(counterfactuals.self_counterfactuals, tiers),
+        *loop_closest_rank(actual, tiers),
+        loop_rating(estimated, performance),
+    )
+
+
+# ── Fixtures ──────────────────────────────────────────────────────────────────
+
+def curves(kills_per_tier=((5, 10), (8, 9), (11, 8), (14, 7), (17, 6), (20, 5))):
+    """1 kill = 100 CSR between tiers, so CSR boundaries are easy to hit."""
+    return {tier: NS(kills=kills, deaths=deaths) for tier, (kills, deaths) in zip(TIERS, kills_per_tier)}
+
+
+def player(player_id, expected, actual, tier_counterfactuals=None):
+    return NS(id=player_id, result=NS(
+        counterfactuals=NS(
+            self_counterfactuals=NS(kills=expected[0], deaths=expected[1]),
+            tier_counterfactuals=tier_counterfactuals or curves(),
+        ),
+        stat_performances=NS(kills=NS(count=actual[0]), deaths=NS(count=actual[1])),
+    ))
+
+
+def assert_matches_loop(players):
+    estimates = estimate_match_skills([NS(value=players)])[0]
+    for p in players:
+        assert tuple(estimates[p.id]) == loop_estimate(p.result), p.id
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("kills, deaths, tier", [
+    (19, 5, 1450),       # kills at 1400, deaths at 1500
+    (20, 5, 1500),       # exactly Onyx
+    (20.5, 5, 1550),     # extrapolated above Onyx
+    (17, 6, 1200),       # exactly Diamond
+    (5, 10, 0),          # exactly Bronze
+    (4, 12, 0),          # below Bronze
+])
+def test_csr_boundaries_match_the_loop(kills, deaths, tier):
+    p = player("xuid(1)", (kills, deaths), (kills, deaths))
+    assert_matches_loop([p])
+    assert estimate_match_skills([NS(value=[p])])[0]["xuid(1)"].expected_tier == tier
+
+
+def test_ratings_at_their_bounds_match_the_loop():
+    # Kills and deaths both at 100 CSR each: expected 1000, performance in 25 CSR (2.5 %) steps
+    linear = curves(tuple((kills, kills) for kills in (5, 8, 11, 14, 17, 20)))
+    players = [
+        player(f"xuid({i})", (15, 15), (15 + step / 4, 15 + step / 4), linear)
+        for i, step in enumerate(range(-9, 10))
+    ]
+    assert_matches_loop(players)
+    ratings = [estimate.rating for estimate in estimate_match_skills([NS(value=players)])[0].values()]
+    assert ratings[8:11] == ["A-", "A", "A+"]
+    assert ratings[0] == "F" and ratings[-1] == "SSS"
+
+
+def test_unranked_players_without_counterfactuals_are_skipped():
+    unplaced = player("xuid(2)", (10, 8), (10, 8))
+    unplaced.result.counterfactuals = None
+    unranked_curve = player("xuid(3)", (10, 8), (10, 8), {Tier.UNRANKED: NS(kills=10, deaths=8), **curves()})
+    ranked = player("xuid(4)", (10, 8), (12, 7))
+    estimates = estimate_match_skills([NS(value=[unplaced, unranked_curve, ranked])])[0]
+    assert set(estimates) == {"xuid(4)"}
+    assert tuple(estimates["xuid(4)"]) == loop_estimate(ranked.result)
+
+
+def test_random_curves_match_the_loop():
+    rng = random.Random(21)
+    players = []
+    for i in range(300):
+        base = sorted(rng.uniform(2, 25) for _ in TIERS)
+        deaths = sorted((rng.uniform(3, 15) for _ in TIERS), reverse=True)
+        players.append(player(
+            f"xuid({i})",
+            (rng.uniform(0, 28), rng.uniform(2, 16)),
+            (rng.randint(0, 30), rng.randint(0, 20)),
+            curves(tuple(zip(base, deaths))),
+        ))
+    assert_matches_loop(players)
@@ -8,6 +8,12 @@ Environment variables
 ---------------------
 WAIT_TIMES_POLL_INTERVAL  Polling interval in seconds (default: 300).
 WAIT_TIMES_RETENTION_DAYS Number of days to keep historical records (default: 30).
+WAIT_TIMES_PURGE_INTERVAL Seconds between purges of expired records (default: 3600).
+WAIT_TIMES_MODE           ``poll`` (default) reconnects every interval; ``stream``
+                          keeps one lobby subscription open and stores pushes.
+WAIT_TIMES_STREAM_MIN_INTERVAL
+                          Minimum seconds between stored snapshots in stream
+                          mode (default: 60).
 """
 
 import asyncio
@@ -18,44 +24,65 @@ from typing import Optional
 
 import discord
 from discord.ext import commands, tasks
+from sqlalchemy import delete, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession as Session
 
 import spnkr_app
-from app.amqp_service import fetch_raw_playlist_entries
-from app.models.playlist import PlaylistInfo, PlaylistWaitTimeRecord
-from database_app.database import engine
+from app.amqp_service import LobbySubscriber, fetch_raw_playlist_entries
+from app.models.playlist import LatestWaitTime, PlaylistInfo, PlaylistWaitTimeRecord
+from database_app.database import engine_start, read_engine, write_session
+from spnkr_app import rate_limit
 
 logger = logging.getLogger(__name__)
 
 _POLL_INTERVAL: int = int(os.environ.get("WAIT_TIMES_POLL_INTERVAL", "300"))
 _RETENTION_DAYS: int = int(os.environ.get("WAIT_TIMES_RETENTION_DAYS", "30"))
+_PURGE_INTERVAL: int = int(os.environ.get("WAIT_TIMES_PURGE_INTERVAL", "3600"))
+_MODE: str = os.environ.get("WAIT_TIMES_MODE", "poll").lower()
+_STREAM_MIN_INTERVAL: int = int(os.environ.get("WAIT_TIMES_STREAM_MIN_INTERVAL", "60"))
 
 
 # ── Database helpers ─────────────────────────────────────────────────────────
 
 async def _save_wait_time_records(entries: list[dict], name_map: dict[str, str]) -> None:
-    """Persist *entries* as :class:`PlaylistWaitTimeRecord` rows."""
+    """Persist *entries* as :class:`PlaylistWaitTimeRecord` rows and update :class:`LatestWaitTime`.
+
+    Both tables are written in one transaction, so readers of the latest
+    wait times never see a snapshot only half stored.
+    """
     now = datetime.utcnow()
-    async with Session(engine, expire_on_commit=False) as session:
-        for entry in entries:
-            asset_id = entry["asset_id"]
-            name = name_map.get(asset_id) or asset_id
-            record = PlaylistWaitTimeRecord(
-                asset_id=asset_id,
-                version_id=entry["version_id"],
-                playlist_name=name,
-                wait_time_ms=entry["wait_time_ms"],
-                recorded_at=now,
-            )
-            session.add(record)
+    rows = [
+        {
+            "asset_id": entry["asset_id"],
+            "version_id": entry["version_id"],
+            "playlist_name": name_map.get(entry["asset_id"]) or entry["asset_id"],
+            "wait_time_ms": entry["wait_time_ms"],
+            "recorded_at": now,
+        }
+        for entry in entries
+    ]
+    latest = sqlite_insert(LatestWaitTime)
+    latest = latest.on_conflict_do_update(
+        index_elements=["asset_id"],
+        set_={
+            "version_id": latest.excluded.version_id,
+            "playlist_name": latest.excluded.playlist_name,
+            "wait_time_ms": latest.excluded.wait_time_ms,
+            "recorded_at": latest.excluded.recorded_at,
+        },
+    )
+    async with write_session() as session:
+        await session.execute(insert(PlaylistWaitTimeRecord), rows)
+        await session.execute(latest, rows)
         await session.commit()
 
 
 async def _upsert_playlist_info(entries: list[dict], name_map: dict[str, str]) -> None:
     """Insert or update :class:`PlaylistInfo` metadata rows."""
     now = datetime.utcnow()
-    async with Session(engine, expire_on_commit=False) as session:
+    async with write_session(expire_on_commit=False) as session:
         for entry in entries:
             asset_id = entry["asset_id"]
             name = name_map.get(asset_id) or asset_id
@@ -76,45 +103,31 @@ async def _upsert_playlist_info(entries: list[dict], name_map: dict[str, str]) -
 
 
 async def _purge_old_records(retention_days: int) -> int:
-    """Delete records older than *retention_days* days; return deleted count."""
+    """Delete records older than *retention_days* days; return deleted count.
+
+    One set-based ``DELETE`` over the ``recorded_at`` index, without
+    loading the expired rows.
+    """
     cutoff = datetime.utcnow() - timedelta(days=retention_days)
-    async with Session(engine, expire_on_commit=False) as session:
-        statement = select(PlaylistWaitTimeRecord).where(
-            PlaylistWaitTimeRecord.recorded_at < cutoff
+    async with write_session() as session:
+        result = await session.execute(
+            delete(PlaylistWaitTimeRecord).where(PlaylistWaitTimeRecord.recorded_at < cutoff)
         )
-        results = await session.exec(statement)
-        old_records = results.all()
-        for record in old_records:
-            await session.delete(record)
+        # Playlists no longer seen within the retention window drop out of the latest wait times
+        await session.execute(delete(LatestWaitTime).where(LatestWaitTime.recorded_at < cutoff))
         await session.commit()
-        return len(old_records)
-
-
-async def _get_latest_wait_times() -> list[PlaylistWaitTimeRecord]:
-    """Return the most recent wait time record for each known playlist."""
-    async with Session(engine) as session:
-        # Fetch all distinct asset_ids
-        info_stmt = select(PlaylistInfo)
-        info_results = await session.exec(info_stmt)
-        playlist_infos = info_results.all()
-
-        latest: list[PlaylistWaitTimeRecord] = []
-        for info in playlist_infos:
-            stmt = (
-                select(PlaylistWaitTimeRecord)
-                .where(PlaylistWaitTimeRecord.asset_id == info.asset_id)
-                .order_by(PlaylistWaitTimeRecord.recorded_at.desc())
-                .limit(1)
-            )
-            results = await session.exec(stmt)
-            record = results.first()
-            if record:
-                latest.append(record)
-        return latest
+        return result.rowcount
+
 
+async def _get_latest_wait_times() -> list[LatestWaitTime]:
+    """Return the most recent wait time of each known playlist."""
+    async with Session(read_engine) as session:
+        results = await session.exec(select(LatestWaitTime))
+        return list(results.all())
 
-async def get_latest_wait_times() -> list[PlaylistWaitTimeRecord]:
-    """Return the most recent :class:`PlaylistWaitTimeRecord` for every known playlist.
+
+async def get_latest_wait_times() -> list[LatestWaitTime]:
+    """Return the most recent wait time (:class:`LatestWaitTime`) for every known playlist.
 
     Public wrapper around :func:`_get_latest_wait_times` intended for use by
     other modules that want read access to the cached wait time data without
@@ -126,7 +139,7 @@ async def get_latest_wait_times() -> list[PlaylistWaitTimeRecord]:
 async def _get_playlist_stats(asset_id: str, hours: int = 24) -> Optional[dict]:
     """Return aggregated wait time statistics for a playlist over the last *hours*."""
     since = datetime.utcnow() - timedelta(hours=hours)
-    async with Session(engine) as session:
+    async with Session(read_engine) as session:
         stmt = (
             select(PlaylistWaitTimeRecord)
             .where(PlaylistWaitTimeRecord.asset_id == asset_id)
@@ -172,26 +185,24 @@ async def _get_playlist_stats(asset_id: str, hours: int = 24) -> Optional[dict]:
 # ── Name resolution ──────────────────────────────────────────────────────────
 
 async def _resolve_names(entries: list[dict]) -> dict[str, str]:
-    """Resolve asset IDs to human-readable playlist names via the spnkr API.
+    """Resolve asset IDs to human-readable playlist names via the asset cache.
 
     Returns a dict mapping asset_id → playlist_name.
     """
     name_map: dict[str, str] = {}
+
+    async def resolve(client, asset_id: str, version_id: str) -> None:
+        try:
+            playlist = await spnkr_app.asset_cache.get(client, "playlists", asset_id, version_id)
+            name_map[asset_id] = getattr(playlist, "public_name", None) or asset_id
+        except Exception as exc:
+            logger.warning("Could not resolve name for %s: %s", asset_id, exc)
+            name_map[asset_id] = asset_id
+
+    unique = {e["asset_id"]: e["version_id"] for e in entries if e["asset_id"]}
     try:
         async with spnkr_app.get_client() as client:
-            for entry in entries:
-                asset_id = entry["asset_id"]
-                version_id = entry["version_id"]
-                if not asset_id or asset_id in name_map:
-                    continue
-                try:
-                    resp = await client.discovery_ugc.get_playlist(asset_id, version_id)
-                    playlist = await resp.parse()
-                    name = getattr(playlist, "public_name", None) or asset_id
-                    name_map[asset_id] = name
-                except Exception as exc:
-                    logger.warning("Could not resolve name for %s: %s", asset_id, exc)
-                    name_map[asset_id] = asset_id
+            await asyncio.gather(*(resolve(client, a, v) for a, v in unique.items()))
     except Exception as exc:
         logger.error("Failed to obtain spnkr client for name resolution: %s", exc)
     return name_map
@@ -216,21 +227,37 @@ class WaitTimesApp(commands.Cog):
         self._retention_days = _RETENTION_DAYS
         self._last_poll: Optional[datetime] = None
         self._poll_error_count: int = 0
+        self._mode = _MODE
+        self._stream_min_interval = _STREAM_MIN_INTERVAL
+        self._subscriber: Optional[LobbySubscriber] = None
+        self._stream_task: Optional[asyncio.Task] = None
 
     # ── Lifecycle ────────────────────────────────────────────────────────────
 
     @commands.Cog.listener()
     async def on_ready(self) -> None:
         logger.info(
-            "WaitTimesApp cog ready (poll_interval=%ds, retention=%d days)",
+            "WaitTimesApp cog ready (mode=%s, poll_interval=%ds, retention=%d days)",
+            self._mode,
             self._poll_interval,
             self._retention_days,
         )
-        if not self._polling_loop.is_running():
+        # The read-only engine needs the database created and in WAL mode first
+        await engine_start()
+        if self._mode == "stream":
+            if self._stream_task is None or self._stream_task.done():
+                self._subscriber = LobbySubscriber(spnkr_app.get_lobby_tokens)
+                self._stream_task = asyncio.create_task(self._consume_stream())
+        elif not self._polling_loop.is_running():
             self._polling_loop.start()
+        if not self._purge_loop.is_running():
+            self._purge_loop.start()
 
     def cog_unload(self) -> None:
         self._polling_loop.cancel()
+        self._purge_loop.cancel()
+        if self._stream_task is not None:
+            self._stream_task.cancel()
 
     # ── Polling task ─────────────────────────────────────────────────────────
 
@@ -247,26 +274,16 @@ class WaitTimesApp(commands.Cog):
         await self.bot.wait_until_ready()
 
     async def _do_poll(self) -> None:
-        """Fetch wait times, persist to DB, and purge old records."""
+        """Fetch wait times and persist them to the DB."""
         logger.info("Polling Halo Infinite playlist wait times…")
         try:
             try:
-                # Ensure tokens are fresh
-                async with spnkr_app.get_client():
-                    pass
+                spartan_token, clearance_token = await spnkr_app.get_lobby_tokens()
             except Exception as exc:
                 logger.error("Token refresh failed during poll: %s", exc)
                 self._poll_error_count += 1
                 return
 
-            if spnkr_app.player_cache is None or not spnkr_app.player_cache.is_valid:
-                logger.error("No valid player tokens available for poll")
-                self._poll_error_count += 1
-                return
-
-            spartan_token = spnkr_app.player_cache.spartan_token.token
-            clearance_token = spnkr_app.player_cache.clearance_token.token
-
             entries = await fetch_raw_playlist_entries(spartan_token, clearance_token)
 
             if not entries:
@@ -274,18 +291,59 @@ class WaitTimesApp(commands.Cog):
                 self._poll_error_count += 1
             else:
                 self._poll_error_count = 0
-                name_map = await _resolve_names(entries)
-                await _save_wait_time_records(entries, name_map)
-                await _upsert_playlist_info(entries, name_map)
-                deleted = await _purge_old_records(self._retention_days)
-                logger.info(
-                    "Poll complete: %d entries stored, %d old records purged",
-                    len(entries),
-                    deleted,
-                )
+                await self._store_snapshot(entries)
         finally:
             self._last_poll = datetime.utcnow()
 
+    async def _store_snapshot(self, entries: list[dict]) -> None:
+        """Resolve names for *entries* and persist them.
+
+        Name lookups run at background priority, behind slash commands.
+        """
+        with rate_limit.background():
+            name_map = await _resolve_names(entries)
+        await _save_wait_time_records(entries, name_map)
+        await _upsert_playlist_info(entries, name_map)
+        logger.info("Snapshot stored: %d entries", len(entries))
+
+    # ── Retention task ───────────────────────────────────────────────────────
+
+    @tasks.loop(seconds=_PURGE_INTERVAL)
+    async def _purge_loop(self) -> None:
+        """Delete records older than the retention period, on its own schedule."""
+        try:
+            deleted = await _purge_old_records(self._retention_days)
+        except Exception as exc:
+            logger.exception("Failed to purge old wait time records: %s", exc)
+            return
+        if deleted:
+            logger.info("Purged %d wait time records older than %d days", deleted, self._retention_days)
+
+    @_purge_loop.before_loop
+    async def _before_purge_loop(self) -> None:
+        await self.bot.wait_until_ready()
+
+    # ── Streaming task ───────────────────────────────────────────────────────
+
+    async def _consume_stream(self) -> None:
+        """Store lobby pushes, at most one snapshot per stream interval."""
+        await self.bot.wait_until_ready()
+        logger.info("Subscribing to lobby wait time stream")
+        try:
+            async for entries in self._subscriber.snapshots():
+                now = datetime.utcnow()
+                if self._last_poll is not None and (
+                    now - self._last_poll
+                ).total_seconds() < self._stream_min_interval:
+                    continue
+                self._last_poll = now
+                try:
+                    await self._store_snapshot(entries)
+                except Exception as exc:
+                    logger.exception("Failed to store streamed snapshot: %s", exc)
+        finally:
+            await self._subscriber.close()
+
     # ── Discord commands ──────────────────────────────────────────────────────
 
     @discord.slash_command(description="Näytä Halo Infinite pelilistausten odotusajat")
@@ -343,7 +401,7 @@ class WaitTimesApp(commands.Cog):
         await ctx.defer(ephemeral=True)
 
         # Resolve partial name to asset_id
-        async with Session(engine) as session:
+        async with Session(read_engine) as session:
             info_stmt = select(PlaylistInfo)
             results = await session.exec(info_stmt)
             all_infos = results.all()